@@ -0,0 +1,17 @@
+-- 复合索引：筛选列 + 排序列，避免 filesort
+-- BDIC-SE Knowledge Base Portal - Composite Indexes
+-- 单列索引 idx_course、idx_stage 是新复合索引的最左前缀，一并删除以减少写入开销
+-- 可用 flask query-plans 检查各接口的执行计划
+
+-- 课程评价：按课程筛选，按时间 / 评分排序
+-- 个人主页与用户评价：按用户筛选，按时间排序
+ALTER TABLE reviews
+ADD INDEX idx_course_created (course_id, created_at),
+ADD INDEX idx_course_rating (course_id, rating),
+ADD INDEX idx_user_created (user_id, created_at),
+DROP INDEX idx_course;
+
+-- 按学期获取课程：按阶段筛选，按标题排序
+ALTER TABLE courses
+ADD INDEX idx_stage_title (stage, title),
+DROP INDEX idx_stage;
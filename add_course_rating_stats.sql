@@ -0,0 +1,65 @@
+-- 课程评分聚合表：随评价写入增量维护
+-- BDIC-SE Knowledge Base Portal - Course Rating Stats
+
+CREATE TABLE course_rating_stats (
+    course_id INT PRIMARY KEY COMMENT '课程ID',
+    total_reviews INT NOT NULL DEFAULT 0 COMMENT '总评价数量',
+    average_rating DECIMAL(3,2) NOT NULL DEFAULT 0.00 COMMENT '平均评分(0.00-5.00)',
+    rating_sum INT NOT NULL DEFAULT 0 COMMENT '综合评分总和',
+    rating_count INT NOT NULL DEFAULT 0 COMMENT '综合评分数量',
+    rating_hist_1 INT NOT NULL DEFAULT 0,
+    rating_hist_2 INT NOT NULL DEFAULT 0,
+    rating_hist_3 INT NOT NULL DEFAULT 0,
+    rating_hist_4 INT NOT NULL DEFAULT 0,
+    rating_hist_5 INT NOT NULL DEFAULT 0,
+    learning_gain_sum INT NOT NULL DEFAULT 0 COMMENT '课程收获评分总和',
+    learning_gain_count INT NOT NULL DEFAULT 0 COMMENT '课程收获评分数量',
+    learning_gain_hist_1 INT NOT NULL DEFAULT 0,
+    learning_gain_hist_2 INT NOT NULL DEFAULT 0,
+    learning_gain_hist_3 INT NOT NULL DEFAULT 0,
+    learning_gain_hist_4 INT NOT NULL DEFAULT 0,
+    learning_gain_hist_5 INT NOT NULL DEFAULT 0,
+    workload_sum INT NOT NULL DEFAULT 0 COMMENT '繁忙程度评分总和',
+    workload_count INT NOT NULL DEFAULT 0 COMMENT '繁忙程度评分数量',
+    workload_hist_1 INT NOT NULL DEFAULT 0,
+    workload_hist_2 INT NOT NULL DEFAULT 0,
+    workload_hist_3 INT NOT NULL DEFAULT 0,
+    workload_hist_4 INT NOT NULL DEFAULT 0,
+    workload_hist_5 INT NOT NULL DEFAULT 0,
+    difficulty_sum INT NOT NULL DEFAULT 0 COMMENT '课程难度评分总和',
+    difficulty_count INT NOT NULL DEFAULT 0 COMMENT '课程难度评分数量',
+    difficulty_hist_1 INT NOT NULL DEFAULT 0,
+    difficulty_hist_2 INT NOT NULL DEFAULT 0,
+    difficulty_hist_3 INT NOT NULL DEFAULT 0,
+    difficulty_hist_4 INT NOT NULL DEFAULT 0,
+    difficulty_hist_5 INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    INDEX idx_average_rating (average_rating)
+) ENGINE=InnoDB COMMENT='课程评分聚合表';
+
+-- 按现有评价一次性回填
+INSERT INTO course_rating_stats (
+    course_id, total_reviews, average_rating,
+    rating_sum, rating_count,
+    rating_hist_1, rating_hist_2, rating_hist_3, rating_hist_4, rating_hist_5,
+    learning_gain_sum, learning_gain_count,
+    learning_gain_hist_1, learning_gain_hist_2, learning_gain_hist_3, learning_gain_hist_4, learning_gain_hist_5,
+    workload_sum, workload_count,
+    workload_hist_1, workload_hist_2, workload_hist_3, workload_hist_4, workload_hist_5,
+    difficulty_sum, difficulty_count,
+    difficulty_hist_1, difficulty_hist_2, difficulty_hist_3, difficulty_hist_4, difficulty_hist_5
+)
+SELECT
+    c.id, COUNT(r.id), COALESCE(ROUND(AVG(r.rating), 2), 0),
+    COALESCE(SUM(r.rating), 0), COUNT(r.rating),
+    COALESCE(SUM(r.rating = 1), 0), COALESCE(SUM(r.rating = 2), 0), COALESCE(SUM(r.rating = 3), 0), COALESCE(SUM(r.rating = 4), 0), COALESCE(SUM(r.rating = 5), 0),
+    COALESCE(SUM(r.learning_gain), 0), COUNT(r.learning_gain),
+    COALESCE(SUM(r.learning_gain = 1), 0), COALESCE(SUM(r.learning_gain = 2), 0), COALESCE(SUM(r.learning_gain = 3), 0), COALESCE(SUM(r.learning_gain = 4), 0), COALESCE(SUM(r.learning_gain = 5), 0),
+    COALESCE(SUM(r.workload), 0), COUNT(r.workload),
+    COALESCE(SUM(r.workload = 1), 0), COALESCE(SUM(r.workload = 2), 0), COALESCE(SUM(r.workload = 3), 0), COALESCE(SUM(r.workload = 4), 0), COALESCE(SUM(r.workload = 5), 0),
+    COALESCE(SUM(r.difficulty), 0), COUNT(r.difficulty),
+    COALESCE(SUM(r.difficulty = 1), 0), COALESCE(SUM(r.difficulty = 2), 0), COALESCE(SUM(r.difficulty = 3), 0), COALESCE(SUM(r.difficulty = 4), 0), COALESCE(SUM(r.difficulty = 5), 0)
+FROM courses c
+LEFT JOIN reviews r ON r.course_id = c.id
+GROUP BY c.id;
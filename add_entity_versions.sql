@@ -0,0 +1,13 @@
+-- 表级增删计数：条件请求的整表范围用 MAX(updated_at) 加计数校验，不再 COUNT(*) 整张表
+-- BDIC-SE Knowledge Base Portal - Entity Versions
+
+CREATE TABLE entity_versions (
+    entity VARCHAR(50) PRIMARY KEY COMMENT '表名',
+    version BIGINT NOT NULL DEFAULT 0 COMMENT '增删次数'
+) ENGINE=InnoDB COMMENT='表级增删计数表';
+
+INSERT INTO entity_versions (entity, version) VALUES
+    ('courses', 0),
+    ('instructors', 0),
+    ('reviews', 0),
+    ('users', 0);
@@ -0,0 +1,43 @@
+-- 讲师评分聚合表：随课程聚合增量维护，供讲师详情和讲师排行榜读取
+-- BDIC-SE Knowledge Base Portal - Instructor Rating Stats
+-- 需先执行 add_course_rating_stats.sql；之后可用 flask recompute-stats 校验
+
+CREATE TABLE instructor_rating_stats (
+    instructor_id INT PRIMARY KEY COMMENT '讲师ID',
+    course_count INT NOT NULL DEFAULT 0 COMMENT '课程数量',
+    total_reviews INT NOT NULL DEFAULT 0 COMMENT '总评价数量',
+    average_rating DECIMAL(3,2) NOT NULL DEFAULT 0.00 COMMENT '平均评分(0.00-5.00)',
+    rating_sum INT NOT NULL DEFAULT 0 COMMENT '综合评分总和',
+    rating_count INT NOT NULL DEFAULT 0 COMMENT '综合评分数量',
+    learning_gain_sum INT NOT NULL DEFAULT 0 COMMENT '课程收获评分总和',
+    learning_gain_count INT NOT NULL DEFAULT 0 COMMENT '课程收获评分数量',
+    workload_sum INT NOT NULL DEFAULT 0 COMMENT '繁忙程度评分总和',
+    workload_count INT NOT NULL DEFAULT 0 COMMENT '繁忙程度评分数量',
+    difficulty_sum INT NOT NULL DEFAULT 0 COMMENT '课程难度评分总和',
+    difficulty_count INT NOT NULL DEFAULT 0 COMMENT '课程难度评分数量',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    FOREIGN KEY (instructor_id) REFERENCES instructors(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    INDEX idx_average_rating (average_rating),
+    INDEX idx_total_reviews (total_reviews),
+    INDEX idx_course_count (course_count)
+) ENGINE=InnoDB COMMENT='讲师评分聚合表';
+
+-- 按课程聚合表一次性回填（没有课程的讲师也创建空行）
+INSERT INTO instructor_rating_stats (
+    instructor_id, course_count, total_reviews, average_rating,
+    rating_sum, rating_count,
+    learning_gain_sum, learning_gain_count,
+    workload_sum, workload_count,
+    difficulty_sum, difficulty_count
+)
+SELECT
+    i.id, COUNT(c.id), COALESCE(SUM(s.total_reviews), 0),
+    COALESCE(ROUND(SUM(s.rating_sum) / NULLIF(SUM(s.rating_count), 0), 2), 0),
+    COALESCE(SUM(s.rating_sum), 0), COALESCE(SUM(s.rating_count), 0),
+    COALESCE(SUM(s.learning_gain_sum), 0), COALESCE(SUM(s.learning_gain_count), 0),
+    COALESCE(SUM(s.workload_sum), 0), COALESCE(SUM(s.workload_count), 0),
+    COALESCE(SUM(s.difficulty_sum), 0), COALESCE(SUM(s.difficulty_count), 0)
+FROM instructors i
+LEFT JOIN courses c ON c.instructor_id = i.id
+LEFT JOIN course_rating_stats s ON s.course_id = c.id
+GROUP BY i.id;
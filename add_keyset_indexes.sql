@@ -0,0 +1,12 @@
+-- 游标分页索引：按 (排序列, id) 定位
+-- BDIC-SE Knowledge Base Portal - Keyset Pagination
+-- InnoDB 二级索引隐含主键，因此单列索引即等价于 (排序列, id)
+
+-- 课程列表：按创建时间 / 标题排序
+ALTER TABLE courses
+ADD INDEX idx_created (created_at),
+ADD INDEX idx_title (title);
+
+-- 用户列表：按注册时间排序（username、email 已有唯一索引）
+ALTER TABLE users
+ADD INDEX idx_created (created_at);
@@ -0,0 +1,11 @@
+-- 条件请求校验索引：MAX(updated_at) 直接读取索引末端
+-- BDIC-SE Knowledge Base Portal - ETag / Last-Modified
+
+ALTER TABLE courses
+ADD INDEX idx_updated (updated_at);
+
+ALTER TABLE reviews
+ADD INDEX idx_updated (updated_at);
+
+ALTER TABLE instructors
+ADD INDEX idx_updated (updated_at);
@@ -0,0 +1,18 @@
+-- 每日注册计数表与用户活跃度索引：/users/stats 不再对用户表和评价表做全量聚合
+-- BDIC-SE Knowledge Base Portal - User Signup Daily
+-- 需先执行 add_user_stats.sql；之后可用 flask recompute-stats 校验
+
+CREATE TABLE user_signup_daily (
+    day DATE PRIMARY KEY COMMENT '注册日期(UTC)',
+    signups INT NOT NULL DEFAULT 0 COMMENT '注册用户数'
+) ENGINE=InnoDB COMMENT='每日注册计数表';
+
+-- 按注册日期一次性回填
+INSERT INTO user_signup_daily (day, signups)
+SELECT DATE(created_at), COUNT(*)
+FROM users
+WHERE created_at IS NOT NULL
+GROUP BY DATE(created_at);
+
+-- 最活跃用户排行沿此索引倒序读取前K行
+ALTER TABLE user_stats ADD INDEX idx_total_reviews_user (total_reviews, user_id);
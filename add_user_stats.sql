@@ -0,0 +1,36 @@
+-- 用户评价统计表：随评价写入增量维护，个人资料页和用户详情只需一次主键读取
+-- BDIC-SE Knowledge Base Portal - User Stats
+-- 之后可用 flask recompute-stats 校验
+
+CREATE TABLE user_stats (
+    user_id INT PRIMARY KEY COMMENT '用户ID',
+    total_reviews INT NOT NULL DEFAULT 0 COMMENT '评价数量',
+    rating_sum INT NOT NULL DEFAULT 0 COMMENT '综合评分总和',
+    rating_count INT NOT NULL DEFAULT 0 COMMENT '综合评分数量',
+    learning_gain_sum INT NOT NULL DEFAULT 0 COMMENT '课程收获评分总和',
+    learning_gain_count INT NOT NULL DEFAULT 0 COMMENT '课程收获评分数量',
+    workload_sum INT NOT NULL DEFAULT 0 COMMENT '繁忙程度评分总和',
+    workload_count INT NOT NULL DEFAULT 0 COMMENT '繁忙程度评分数量',
+    difficulty_sum INT NOT NULL DEFAULT 0 COMMENT '课程难度评分总和',
+    difficulty_count INT NOT NULL DEFAULT 0 COMMENT '课程难度评分数量',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB COMMENT='用户评价统计表';
+
+-- 按评价表一次性回填（没有评价的用户也创建空行）
+INSERT INTO user_stats (
+    user_id, total_reviews,
+    rating_sum, rating_count,
+    learning_gain_sum, learning_gain_count,
+    workload_sum, workload_count,
+    difficulty_sum, difficulty_count
+)
+SELECT
+    u.id, COUNT(r.id),
+    COALESCE(SUM(r.rating), 0), COUNT(r.rating),
+    COALESCE(SUM(r.learning_gain), 0), COUNT(r.learning_gain),
+    COALESCE(SUM(r.workload), 0), COUNT(r.workload),
+    COALESCE(SUM(r.difficulty), 0), COUNT(r.difficulty)
+FROM users u
+LEFT JOIN reviews r ON r.user_id = u.id
+GROUP BY u.id;
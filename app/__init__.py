@@ -37,10 +37,41 @@ def create_app(config_name='development'):
     login_manager.login_message = '请先登录以访问此页面。'
     login_manager.login_message_category = 'info'
     
+    # 课程搜索索引
+    from app.services.search import course_search
+    course_search.init_app(app)
+    
+    # API响应缓存
+    from app.services.cache import response_cache
+    response_cache.init_app(app)
+    
+    # 课程表评分冗余列同步（立即或后台合并写入）
+    from app.services.rating_sync import rating_sync
+    rating_sync.init_app(app)
+    
+    # 用户已评价课程集合缓存
+    from app.services.reviewed_courses import reviewed_courses
+    reviewed_courses.init_app(app)
+    
+    # 热门课程（按时间衰减的评价计数）
+    from app.services.trending import trending_courses
+    trending_courses.init_app(app)
+    
+    # 用户名/邮箱可用性索引
+    from app.services.user_directory import user_directory
+    user_directory.init_app(app)
+    
+    # 密码哈希准入控制（跨 worker 限制同时进行的哈希数）
+    from app.services.password_hasher import password_hasher
+    password_hasher.init_app(app)
+    
+    # 当前用户快照缓存（避免每个已登录请求都查询用户表）
+    from app.services.user_loader import user_loader
+    user_loader.init_app(app)
+    
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.user import User
-        return User.query.get(int(user_id))
+        return user_loader.load(int(user_id))
     
     # 注册蓝图
     from app.api import api_bp
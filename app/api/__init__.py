@@ -8,6 +8,6 @@ from flask import Blueprint
 api_bp = Blueprint('api', __name__)
 
 # 导入路由
-from app.api import courses, instructors, reviews, users
+from app.api import courses, instructors, reviews, users, cache, export, home, batch
 
 __all__ = ['api_bp']
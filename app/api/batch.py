@@ -0,0 +1,98 @@
+"""
+Batch endpoint running several GET sub-requests in one round trip
+"""
+
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+from app.api import api_bp
+
+
+# 单次批量请求允许的子请求数量
+MAX_BATCH_REQUESTS = 20
+
+# 流式接口（相对于API前缀）：整个导出会被读入内存再写进JSON，不允许批量分派
+STREAMING_PATHS = ('/export/',)
+
+
+def _run_subrequest(path):
+    """在当前应用上下文中分派一个GET子请求
+
+    子请求的请求上下文复用外层的应用上下文，因此共享同一个数据库会话（及其
+    identity map）和已加载的当前用户；缓存、条件请求等装饰器照常生效。
+    """
+    headers = {}
+    if request.headers.get('Cookie'):
+        headers['Cookie'] = request.headers['Cookie']
+    with current_app.test_request_context(path, method='GET', headers=headers):
+        response = current_app.full_dispatch_request()
+    if response.is_streamed:
+        # 未在前缀检查中列出的流式响应：不读取响应体，直接关闭生成器
+        response.close()
+        return 400, {'success': False, 'message': '批量请求不支持流式接口'}
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return response.status_code, body
+
+
+@api_bp.route('/batch', methods=['POST'])
+def batch():
+    """批量执行只读子请求
+
+    请求体：{"requests": ["/api/v1/courses/1", {"id": "reviews", "path": "/api/v1/courses/1/reviews"}]}
+    每个子请求单独返回状态码和响应体，某个子请求失败不影响其他子请求。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('requests')
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'message': 'requests必须是非空数组'
+            }), 400
+        if len(items) > MAX_BATCH_REQUESTS:
+            return jsonify({
+                'success': False,
+                'message': f'单次最多包含{MAX_BATCH_REQUESTS}个子请求'
+            }), 400
+
+        # 只允许分派到本API前缀（/api/v1）下的接口
+        prefix = request.path[:-len('/batch')]
+        results = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {'path': item}
+            if not isinstance(item, dict):
+                item = {}
+            path = item.get('path')
+            result = {'id': item.get('id', index), 'path': path}
+
+            if not isinstance(path, str) or not path.startswith(prefix + '/') \
+                    or path.split('?', 1)[0] == request.path:
+                result.update({'status': 400, 'body': {
+                    'success': False,
+                    'message': f'path必须是 {prefix} 下的GET接口'
+                }})
+            elif path[len(prefix):].startswith(STREAMING_PATHS):
+                result.update({'status': 400, 'body': {
+                    'success': False,
+                    'message': '批量请求不支持流式接口'
+                }})
+            else:
+                try:
+                    result['status'], result['body'] = _run_subrequest(path)
+                except HTTPException as e:
+                    result.update({'status': e.code, 'body': {'success': False, 'message': e.description}})
+            results.append(result)
+
+        return jsonify({
+            'success': True,
+            'data': results,
+            'count': len(results)
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'批量请求失败: {str(e)}'
+        }), 500
@@ -0,0 +1,25 @@
+"""
+Response cache statistics endpoint
+"""
+
+from flask import jsonify
+from app.api import api_bp
+from app.services.cache import response_cache
+from app.services.reviewed_courses import reviewed_courses
+from app.services.password_hasher import password_hasher
+from app.services.user_directory import user_directory
+from app.services.user_loader import user_loader
+
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取API响应缓存的命中统计，用于评估缓存容量"""
+    data = response_cache.stats()
+    data['reviewed_courses'] = reviewed_courses.stats()
+    data['user_directory'] = user_directory.stats()
+    data['password_hasher'] = password_hasher.stats()
+    data['user_loader'] = user_loader.stats()
+    return jsonify({
+        'success': True,
+        'data': data
+    })
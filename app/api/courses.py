@@ -3,17 +3,100 @@ Courses API endpoints matching the database schema
 """
 
 from flask import jsonify, request
-from sqlalchemy import or_
 from app.api import api_bp
 from app.models.course import Course
 from app.models.instructor import Instructor
+from app.models.review import Review
+from app.models.course_rating_stats import CourseRatingStats
+from app.models.instructor_rating_stats import InstructorRatingStats
+from app.models.user import User
+from app.services.cache import response_cache
+from app.services.search import course_search
+from app.services.trending import trending_courses
+from app.utils.conditional import conditional
+from app.utils.pagination import CursorError, keyset_paginate, wants_cursor
+from app.utils.params import ordered_by_ids, parse_fields, parse_ids
+from app.utils.serializers import course_shape, json_response
 from app import db
 
 
+# 课程列表可通过 ?fields= 选择的字段（instructor 为嵌套的讲师信息）
+COURSE_LIST_FIELDS = tuple(Course.FIELD_GETTERS) + ('instructor',)
+
+# 带筛选条件的相关度排序最多考虑的搜索结果数（筛选用一条 IN 查询）
+MAX_RANKED_CANDIDATES = 1000
+
+
+def _ranked_page(shape, query, ranked_ids, page, per_page, filtered=False):
+    """按搜索排名分页：排名列表在内存中切片，只查询当前页的课程
+
+    有阶段或讲师筛选时，先用一条查询从排名前 MAX_RANKED_CANDIDATES 的课程中
+    取出满足条件的ID，再按排名切片。
+    """
+    if filtered:
+        candidates = ranked_ids[:MAX_RANKED_CANDIDATES]
+        allowed = {row.id for row in query.with_entities(Course.id).filter(Course.id.in_(candidates))}
+        ranked_ids = [course_id for course_id in candidates if course_id in allowed]
+    page, per_page = max(page, 1), max(per_page, 1)
+    page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+    rows = []
+    if page_ids:
+        rows, _ = ordered_by_ids(shape.query(Course.id).filter(Course.id.in_(page_ids)).all(), page_ids)
+    total = len(ranked_ids)
+    pages = -(-total // per_page)
+    return json_response({
+        'success': True,
+        'data': shape.encode_rows(rows),
+        'pagination': {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': pages,
+            'has_prev': page > 1,
+            'has_next': page < pages,
+            'prev_num': page - 1 if page > 1 else None,
+            'next_num': page + 1 if page < pages else None
+        }
+    })
+
+
 @api_bp.route('/courses', methods=['GET'])
+@conditional(lambda: [(Course,), (Instructor,), (CourseRatingStats,)])
 def get_courses():
-    """获取课程列表，支持搜索、筛选和分页"""
+    """获取课程列表，支持搜索、筛选和分页；传入 ids 时按ID批量获取
+
+    使用列查询和编译好的行序列化器（app.utils.serializers），不构造ORM对象；
+    fields 指定输出字段时，未请求的列（如 description、cover_images）不会从数据库取回。
+    """
     try:
+        try:
+            fields = parse_fields(COURSE_LIST_FIELDS)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        shape = course_shape(fields, include_instructor=fields is None or 'instructor' in fields)
+        
+        # 多ID查询：一条 IN 查询，按请求顺序返回
+        if 'ids' in request.args:
+            try:
+                ids = parse_ids()
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            rows, missing = ordered_by_ids(
+                shape.query(Course.id).filter(Course.id.in_(ids)).all(), ids
+            )
+            return json_response({
+                'success': True,
+                'data': shape.encode_rows(rows),
+                'count': len(rows),
+                'missing': missing
+            })
+        
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 100)  # 最大100条
@@ -23,18 +106,19 @@ def get_courses():
         sort_by = request.args.get('sort_by', 'created_at')  # created_at, title, rating
         order = request.args.get('order', 'desc')  # asc, desc
         
-        # 构建查询
-        query = Course.query
+        # 排序列（按评分排序时直接读取评分聚合表）；排序列和ID总是选取，供游标分页取键值
+        sort_column = {
+            'title': Course.title,
+            'rating': CourseRatingStats.average_rating
+        }.get(sort_by, Course.created_at)
+        query = shape.query(sort_column, Course.id)
         
-        # 搜索条件
+        # 搜索条件（倒排索引命中的课程ID）
+        ranked_ids = None
         if search:
-            query = query.join(Instructor).filter(
-                or_(
-                    Course.title.contains(search),
-                    Course.description.contains(search),
-                    Instructor.name.contains(search)
-                )
-            )
+            ranked_ids = [course_id for course_id, _ in course_search.search(search)]
+            if 'sort_by' in request.args or wants_cursor():
+                query = query.filter(Course.id.in_(ranked_ids))
         
         # 筛选条件
         if stage and stage in ['S1', 'S2', 'S3', 'S4']:
@@ -42,15 +126,28 @@ def get_courses():
         if instructor_id:
             query = query.filter(Course.instructor_id == instructor_id)
         
-        # 排序
-        if sort_by == 'title':
-            order_by = Course.title.asc() if order == 'asc' else Course.title.desc()
-        elif sort_by == 'rating':
-            order_by = Course.average_rating.asc() if order == 'asc' else Course.average_rating.desc()
-        else:  # created_at
-            order_by = Course.created_at.asc() if order == 'asc' else Course.created_at.desc()
+        # 游标分页：按 (排序列, id) 定位，不使用 OFFSET
+        if wants_cursor():
+            page_result = keyset_paginate(
+                query,
+                [sort_column, Course.id],
+                per_page,
+                request.args.get('cursor'),
+                descending=order != 'asc',
+                sort_key=f'{sort_column.key}:{order}'
+            )
+            return json_response({
+                'success': True,
+                'data': shape.encode_rows(page_result.items),
+                'pagination': page_result.pagination_dict(per_page)
+            })
+        
+        # 搜索时未指定排序方式则按相关度：在内存中按排名切出当前页，只查询这一页的课程
+        if ranked_ids is not None and 'sort_by' not in request.args:
+            return _ranked_page(shape, query, ranked_ids, page, per_page,
+                                filtered=bool(stage in ['S1', 'S2', 'S3', 'S4'] or instructor_id))
         
-        query = query.order_by(order_by)
+        query = query.order_by(sort_column.asc() if order == 'asc' else sort_column.desc())
         
         # 分页
         pagination = query.paginate(
@@ -59,11 +156,9 @@ def get_courses():
             error_out=False
         )
         
-        courses = pagination.items
-        
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [course.to_dict(include_instructor=True) for course in courses],
+            'data': shape.encode_rows(pagination.items),
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -76,6 +171,11 @@ def get_courses():
             }
         })
         
+    except CursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -84,10 +184,19 @@ def get_courses():
 
 
 @api_bp.route('/courses/<int:course_id>', methods=['GET'])
+@conditional(lambda course_id: [
+    (Course, Course.id == course_id),
+    (Instructor,),
+    (Review, Review.course_id == course_id),
+    # 评价中带有评价者的用户名
+    (User, User.id.in_(db.select(Review.user_id).where(Review.course_id == course_id)))
+])
+@response_cache.cached('course', 'instructor', 'review', 'user')
 def get_course(course_id):
     """获取单个课程详情"""
     try:
-        course = Course.query.get_or_404(course_id)
+        course = Course.query.options(*Course.eager_options(include_instructor=True))\
+            .filter_by(id=course_id).first_or_404()
         
         return jsonify({
             'success': True,
@@ -234,6 +343,8 @@ def delete_course(course_id):
 
 
 @api_bp.route('/courses/by-stage/<stage>', methods=['GET'])
+@conditional(lambda stage: [(Course, Course.stage == stage), (Instructor,), (CourseRatingStats,)])
+@response_cache.cached('course', 'instructor', 'review')
 def get_courses_by_stage(stage):
     """按学期阶段获取课程"""
     try:
@@ -243,7 +354,8 @@ def get_courses_by_stage(stage):
                 'message': 'stage必须是S1、S2、S3或S4之一'
             }), 400
         
-        courses = Course.query.filter_by(stage=stage).order_by(Course.title).all()
+        courses = Course.query.options(*Course.eager_options(include_instructor=True))\
+            .filter_by(stage=stage).order_by(Course.title).all()
         
         return jsonify({
             'success': True,
@@ -259,7 +371,50 @@ def get_courses_by_stage(stage):
         }), 500
 
 
+@api_bp.route('/courses/trending', methods=['GET'])
+def get_trending_courses():
+    """获取近期最活跃的课程（评价数按时间指数衰减）
+
+    热度由内存中的前K名计数器给出，不扫描评价表；课程信息按ID一次取回。
+    """
+    try:
+        limit = min(max(request.args.get('limit', 10, type=int), 1), trending_courses.top_k)
+        ranked = trending_courses.top(limit)
+        
+        courses = {
+            course.id: course
+            for course in Course.query.options(*Course.eager_options(include_instructor=True))
+            .filter(Course.id.in_([course_id for course_id, _, _ in ranked])).all()
+        } if ranked else {}
+        
+        data = []
+        for course_id, score, recent_rating in ranked:
+            course = courses.get(course_id)
+            if course is None:
+                continue
+            item = course.to_dict(include_instructor=True)
+            item['trending'] = {
+                'score': round(score, 3),
+                'recent_average_rating': round(recent_rating, 2) if recent_rating is not None else None
+            }
+            data.append(item)
+        
+        return jsonify({
+            'success': True,
+            'data': data,
+            'count': len(data),
+            'half_life_hours': trending_courses.half_life_hours
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取热门课程失败: {str(e)}'
+        }), 500
+
+
 @api_bp.route('/courses/search', methods=['GET'])
+@conditional(lambda: [(Course,), (Instructor,), (CourseRatingStats,)])
 def search_courses():
     """搜索课程"""
     try:
@@ -271,14 +426,14 @@ def search_courses():
                 'message': '搜索关键词不能为空'
             }), 400
         
-        # 在标题、描述、讲师姓名中搜索
-        courses = Course.query.join(Instructor).filter(
-            or_(
-                Course.title.contains(query_text),
-                Course.description.contains(query_text),
-                Instructor.name.contains(query_text)
-            )
-        ).order_by(Course.average_rating.desc()).limit(20).all()
+        # 在标题、描述、讲师姓名中搜索，按BM25相关度排序
+        ranked_ids = [course_id for course_id, _ in course_search.search(query_text, limit=20)]
+        courses_by_id = {
+            course.id: course
+            for course in Course.query.options(*Course.eager_options(include_instructor=True))
+                                      .filter(Course.id.in_(ranked_ids)).all()
+        }
+        courses = [courses_by_id[course_id] for course_id in ranked_ids if course_id in courses_by_id]
         
         return jsonify({
             'success': True,
@@ -295,6 +450,8 @@ def search_courses():
 
 
 @api_bp.route('/courses/stats', methods=['GET'])
+@conditional(lambda: [(Course,), (Instructor,)])
+@response_cache.cached('course', 'instructor')
 def get_course_stats():
     """获取课程统计信息"""
     try:
@@ -306,11 +463,12 @@ def get_course_stats():
             db.func.count(Course.id).label('count')
         ).group_by(Course.stage).all()
         
-        # 按讲师统计
+        # 按讲师统计：课程数直接读取讲师聚合表，不再连接课程表分组
         instructor_stats = db.session.query(
             Instructor.name,
-            db.func.count(Course.id).label('count')
-        ).join(Course).group_by(Instructor.id, Instructor.name).all()
+            InstructorRatingStats.course_count
+        ).join(InstructorRatingStats, InstructorRatingStats.instructor_id == Instructor.id)\
+            .filter(InstructorRatingStats.course_count > 0).order_by(Instructor.id).all()
         
         return jsonify({
             'success': True,
@@ -0,0 +1,157 @@
+"""
+Streaming NDJSON/CSV export endpoints
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import select
+from app.api import api_bp
+from app.models.course import Course
+from app.models.course_rating_stats import CourseRatingStats
+from app.models.instructor import Instructor
+from app.models.review import Review
+from app.models.user import User
+from app import db
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+# 服务端游标每次从数据库取回的行数，也是每次写出的行数
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return '' if value is None else value
+
+
+def _export_rows(statement, fields, fmt):
+    """按主键顺序流式读取并逐批编码，内存占用与表大小无关"""
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for rows in result.partitions():
+            writer.writerows([_csv_value(_export_value(value)) for value in row] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for rows in result.partitions():
+            yield ''.join(
+                json.dumps(dict(zip(fields, map(_export_value, row))), ensure_ascii=False) + '\n'
+                for row in rows
+            )
+
+
+def _export_response(name, statement, fields, id_column):
+    """解析格式和游标参数，返回流式响应
+
+    导出按主键升序进行；游标为已收到的最后一条记录的id，中断后带上
+    cursor 参数重新请求即可从该记录之后继续导出。
+    """
+    fmt = request.args.get('format', 'ndjson').strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': 'format必须是ndjson或csv'
+        }), 400
+
+    cursor = request.args.get('cursor', '').strip()
+    if cursor:
+        if not cursor.isdigit():
+            return jsonify({
+                'success': False,
+                'message': '无效的导出游标'
+            }), 400
+        statement = statement.where(id_column > int(cursor))
+    statement = statement.order_by(id_column.asc())
+
+    response = Response(
+        stream_with_context(_export_rows(statement, fields, fmt)),
+        mimetype=EXPORT_FORMATS[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{fmt}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_bp.route('/export/reviews', methods=['GET'])
+def export_reviews():
+    """流式导出评价（附带用户名和课程名），支持按课程、用户筛选"""
+    try:
+        fields = ['id', 'course_id', 'course_title', 'user_id', 'username',
+                  'rating', 'learning_gain', 'workload', 'difficulty', 'content',
+                  'created_at', 'updated_at']
+        statement = select(
+            Review.id, Review.course_id, Course.title, Review.user_id, User.username,
+            Review.rating, Review.learning_gain, Review.workload, Review.difficulty, Review.content,
+            Review.created_at, Review.updated_at
+        ).join(Course, Review.course_id == Course.id).join(User, Review.user_id == User.id)
+
+        course_id = request.args.get('course_id', type=int)
+        user_id = request.args.get('user_id', type=int)
+        if course_id:
+            statement = statement.where(Review.course_id == course_id)
+        if user_id:
+            statement = statement.where(Review.user_id == user_id)
+
+        return _export_response('reviews', statement, fields, Review.id)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'导出评价失败: {str(e)}'
+        }), 500
+
+
+@api_bp.route('/export/courses', methods=['GET'])
+def export_courses():
+    """流式导出课程（附带讲师姓名和评分统计），支持按阶段、讲师筛选"""
+    try:
+        fields = ['id', 'title', 'description', 'cover_images', 'stage',
+                  'instructor_id', 'instructor_name', 'average_rating', 'total_reviews',
+                  'created_at', 'updated_at']
+        statement = select(
+            Course.id, Course.title, Course.description, Course.cover_images, Course.stage,
+            Course.instructor_id, Instructor.name,
+            CourseRatingStats.average_rating, CourseRatingStats.total_reviews,
+            Course.created_at, Course.updated_at
+        ).join(Instructor, Course.instructor_id == Instructor.id)\
+            .outerjoin(CourseRatingStats, CourseRatingStats.course_id == Course.id)
+
+        stage = request.args.get('stage', '').strip()
+        instructor_id = request.args.get('instructor_id', type=int)
+        if stage:
+            statement = statement.where(Course.stage == stage)
+        if instructor_id:
+            statement = statement.where(Course.instructor_id == instructor_id)
+
+        return _export_response('courses', statement, fields, Course.id)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'导出课程失败: {str(e)}'
+        }), 500
@@ -0,0 +1,80 @@
+"""
+Bundled home page data endpoint
+"""
+
+from flask import jsonify, request
+from app.api import api_bp
+from app.models.course import Course
+from app.models.instructor import Instructor
+from app.models.review import Review
+from app.models.instructor_rating_stats import InstructorRatingStats
+from app.services.cache import response_cache
+from app.utils.conditional import conditional
+from app import db
+
+
+STAGES = ['S1', 'S2', 'S3', 'S4']
+
+
+@api_bp.route('/home', methods=['GET'])
+@conditional(lambda: [(Course,), (Instructor,), (Review,)])
+@response_cache.cached('course', 'instructor', 'review')
+def get_home():
+    """首页所需的全部数据：总览统计、各学期课程、讲师概要和高分课程
+
+    课程（含讲师和评分统计）与讲师课程数各一条查询，其余统计在内存中由课程列表
+    汇总得出；整个响应按课程、讲师、评价的版本号缓存。
+    """
+    try:
+        top_limit = min(request.args.get('top', 6, type=int), 20)
+
+        courses = Course.query.options(*Course.eager_options(include_instructor=True))\
+            .order_by(Course.title).all()
+        instructor_rows = db.session.query(
+            Instructor.id, Instructor.name, Instructor.avatar_url,
+            db.func.coalesce(InstructorRatingStats.course_count, 0).label('course_count')
+        ).outerjoin(InstructorRatingStats, InstructorRatingStats.instructor_id == Instructor.id)\
+            .order_by(Instructor.name).all()
+
+        course_dicts = [course.to_dict(include_instructor=True) for course in courses]
+        stages = {stage: [] for stage in STAGES}
+        for data in course_dicts:
+            stages.setdefault(data['stage'], []).append(data)
+
+        rated = [data for data in course_dicts if data['average_rating'] > 0]
+        top_rated = sorted(rated, key=lambda data: (-data['average_rating'], -data['total_reviews'], data['id']))
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'totals': {
+                    'total_courses': len(course_dicts),
+                    'total_instructors': len(instructor_rows),
+                    'total_reviews': sum(data['total_reviews'] for data in course_dicts),
+                    'average_rating': round(
+                        sum(data['average_rating'] for data in rated) / len(rated), 1
+                    ) if rated else 0.0
+                },
+                'by_stage': [
+                    {'stage': stage, 'count': len(items)}
+                    for stage, items in stages.items()
+                ],
+                'instructors': [
+                    {
+                        'id': instructor_id,
+                        'name': name,
+                        'avatar_url': avatar_url,
+                        'course_count': course_count
+                    }
+                    for instructor_id, name, avatar_url, course_count in instructor_rows
+                ],
+                'top_rated': top_rated[:top_limit],
+                'stages': stages
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取首页数据失败: {str(e)}'
+        }), 500
@@ -6,18 +6,56 @@ from flask import jsonify, request
 from app.api import api_bp
 from app.models.instructor import Instructor
 from app.models.course import Course
+from app.models.review import Review
+from app.models.course_rating_stats import CourseRatingStats
+from app.models.instructor_rating_stats import InstructorRatingStats
+from app.services.cache import response_cache
+from app.utils.conditional import conditional
+from app.utils.pagination import CursorError, keyset_paginate, wants_cursor
+from app.utils.params import ordered_by_ids, parse_fields, parse_ids
+from app.utils.serializers import instructor_shape, json_response
 from app import db
 
 
 @api_bp.route('/instructors', methods=['GET'])
+@conditional(lambda: [(Instructor,), (Course,), (Review,)])
+@response_cache.cached('instructor', 'course', 'review')
 def get_instructors():
-    """获取所有讲师"""
+    """获取所有讲师；传入 ids 时按ID批量获取，传入 fields 时只取回并输出这些字段"""
     try:
-        instructors = Instructor.query.all()
-        return jsonify({
+        try:
+            fields = parse_fields(tuple(Instructor.FIELD_GETTERS))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        shape = instructor_shape(fields)
+        query = shape.query(Instructor.id)
+        
+        if 'ids' in request.args:
+            try:
+                ids = parse_ids()
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            rows, missing = ordered_by_ids(
+                query.filter(Instructor.id.in_(ids)).all(), ids
+            )
+            return json_response({
+                'success': True,
+                'data': shape.encode_rows(rows),
+                'count': len(rows),
+                'missing': missing
+            })
+        
+        rows = query.all()
+        return json_response({
             'success': True,
-            'data': [instructor.to_dict() for instructor in instructors],
-            'count': len(instructors)
+            'data': shape.encode_rows(rows),
+            'count': len(rows)
         })
     except Exception as e:
         return jsonify({
@@ -26,7 +64,81 @@ def get_instructors():
         }), 500
 
 
+# 排行榜可用的排序字段（均在 instructor_rating_stats 上有索引）
+LEADERBOARD_SORTS = {
+    'average_rating': InstructorRatingStats.average_rating,
+    'total_reviews': InstructorRatingStats.total_reviews,
+    'course_count': InstructorRatingStats.course_count,
+}
+
+
+@api_bp.route('/instructors/leaderboard', methods=['GET'])
+@conditional(lambda: [(Instructor,), (Course,), (Review,)])
+@response_cache.cached('instructor', 'course', 'review')
+def get_instructor_leaderboard():
+    """讲师排行榜：直接按聚合表索引排序，读取时不做任何连接或分组"""
+    try:
+        sort_by = request.args.get('sort_by', 'average_rating')
+        order = request.args.get('order', 'desc')
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        # 按平均分排序时至少需要的评价数，避免少量评价的讲师排在前面
+        min_reviews = max(request.args.get('min_reviews', 0, type=int), 0)
+        
+        if sort_by not in LEADERBOARD_SORTS or order not in ('asc', 'desc'):
+            return jsonify({
+                'success': False,
+                'message': f'sort_by 只能为 {", ".join(LEADERBOARD_SORTS)}，order 只能为 asc 或 desc'
+            }), 400
+        
+        column = LEADERBOARD_SORTS[sort_by]
+        key = InstructorRatingStats.instructor_id
+        query = InstructorRatingStats.query
+        if min_reviews:
+            query = query.filter(InstructorRatingStats.total_reviews >= min_reviews)
+        if order == 'desc':
+            query = query.order_by(column.desc(), key.desc())
+        else:
+            query = query.order_by(column.asc(), key.asc())
+        stats = query.limit(limit).all()
+        
+        # 讲师资料按主键一次取回，聚合行已在上一条查询中读取
+        instructors = {
+            instructor.id: instructor
+            for instructor in Instructor.query.filter(
+                Instructor.id.in_([row.instructor_id for row in stats])
+            ).all()
+        } if stats else {}
+        
+        data = []
+        for rank, row in enumerate(stats, start=1):
+            instructor = instructors.get(row.instructor_id)
+            if instructor is None:
+                continue
+            item = instructor.to_dict()
+            item['rank'] = rank
+            data.append(item)
+        
+        return jsonify({
+            'success': True,
+            'data': data,
+            'count': len(data),
+            'sort_by': sort_by,
+            'order': order
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取讲师排行榜失败: {str(e)}'
+        }), 500
+
+
 @api_bp.route('/instructors/<int:instructor_id>', methods=['GET'])
+@conditional(lambda instructor_id: [
+    (Instructor, Instructor.id == instructor_id),
+    (Course, Course.instructor_id == instructor_id),
+    (Review,)
+])
+@response_cache.cached('instructor', 'course', 'review')
 def get_instructor(instructor_id):
     """获取单个讲师详情"""
     try:
@@ -149,6 +261,14 @@ def delete_instructor(instructor_id):
 
 
 @api_bp.route('/instructors/<int:instructor_id>/courses', methods=['GET'])
+@conditional(lambda instructor_id: [
+    (Instructor, Instructor.id == instructor_id),
+    (Course, Course.instructor_id == instructor_id),
+    # 课程的评分和评价数来自评分聚合行，合并同步模式下先于课程行变化
+    (CourseRatingStats, CourseRatingStats.course_id.in_(
+        db.select(Course.id).where(Course.instructor_id == instructor_id)
+    ))
+])
 def get_instructor_courses(instructor_id):
     """获取指定讲师的课程列表"""
     try:
@@ -161,6 +281,22 @@ def get_instructor_courses(instructor_id):
         # 查询讲师的课程
         courses_query = Course.query.filter_by(instructor_id=instructor_id)
         
+        # 游标分页：按课程ID顺序定位
+        if wants_cursor():
+            page_result = keyset_paginate(
+                courses_query,
+                [Course.id],
+                per_page,
+                request.args.get('cursor'),
+                descending=False,
+                sort_key='id:asc'
+            )
+            return jsonify({
+                'success': True,
+                'data': [course.to_dict() for course in page_result.items],
+                'pagination': page_result.pagination_dict(per_page)
+            })
+        
         # 执行分页查询
         pagination = courses_query.paginate(
             page=page, 
@@ -181,6 +317,11 @@ def get_instructor_courses(instructor_id):
             }
         })
         
+    except CursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -2,81 +2,135 @@
 Reviews API endpoints matching the database schema
 """
 
+from datetime import datetime
+
 from flask import jsonify, request
 from flask_login import login_required, current_user
-from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from app.api import api_bp
 from app.models.review import Review
 from app.models.course import Course
 from app.models.user import User
+from app.models.instructor import Instructor
+from app.models.course_rating_stats import CourseRatingStats, apply_review_inserts
+from app.models.entity_version import bump_entity_versions
+from app.models.user_stats import apply_user_review_inserts
+from app.services.cache import response_cache
+from app.services.rating_sync import schedule_course_sync
+from app.services.reviewed_courses import reviewed_courses
+from app.services.trending import trending_courses
+from app.utils.conditional import conditional
+from app.utils.pagination import CursorError, keyset_paginate, wants_cursor
+from app.utils.params import MAX_IDS, field_options, parse_fields, parse_snippet
+from app.utils.serializers import json_response, review_shape
 from app import db
 
 
+# 评价列表可通过 ?fields= 选择的字段（user、course 为嵌套的用户、课程信息）
+REVIEW_LIST_FIELDS = tuple(Review.FIELD_GETTERS) + ('user', 'course')
+
+
+def review_load_options(fields, snippet, *always):
+    """评价ORM查询的加载选项：按 fields 只取回需要的列，片段模式下由 SQL 截取内容"""
+    if not snippet:
+        return field_options(Review, fields, *always)
+    if fields is not None:
+        fields = [name for name in fields if name != 'content']
+    return field_options(Review, fields, *always) + Review.snippet_options(snippet)
+
+
+def parse_review_list_params():
+    """解析评价列表的 fields 和 snippet 参数，格式错误时抛出 ValueError"""
+    return parse_fields(REVIEW_LIST_FIELDS), parse_snippet()
+
+
 @api_bp.route('/courses/<int:course_id>/reviews', methods=['GET'])
+@conditional(lambda course_id: [
+    (Course, Course.id == course_id),
+    (Instructor,),
+    (Review, Review.course_id == course_id),
+    # 评价中带有评价者的用户名
+    (User, User.id.in_(db.select(Review.user_id).where(Review.course_id == course_id)))
+])
 def get_course_reviews(course_id):
-    """获取课程的所有评价"""
+    """获取课程的所有评价
+
+    最多两条查询：课程（连同讲师和评分聚合行）一条；评价分页一条，只取响应
+    需要的列并连接用户名，由编译好的行序列化器直接编码。总数、各维度平均分和
+    评分分布都来自聚合表，不再单独 COUNT 或 GROUP BY。fields 和 snippet 进一步
+    限定评价查询取回的列。
+    """
     try:
-        # 验证课程是否存在
-        course = Course.query.get_or_404(course_id)
+        try:
+            fields, snippet = parse_review_list_params()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        # 验证课程是否存在（评分聚合随课程一起加载）
+        course = Course.query.options(*Course.eager_options(include_instructor=True))\
+            .filter_by(id=course_id).first_or_404()
+        stats = course.rating_stats or CourseRatingStats(course_id=course_id)
+        total = stats.total_reviews or 0
         
         # 获取分页参数
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 50)
         
-        # 获取评价列表
-        pagination = Review.query.filter_by(course_id=course_id)\
-            .order_by(Review.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
-        
-        reviews = pagination.items
-        
-        # 计算统计信息
-        stats = db.session.query(
-            func.avg(Review.rating).label('avg_rating'),
-            func.avg(Review.learning_gain).label('avg_learning_gain'),
-            func.avg(Review.workload).label('avg_workload'),
-            func.avg(Review.difficulty).label('avg_difficulty'),
-            func.count(Review.id).label('total_reviews'),
-            func.count(Review.rating).label('rated_reviews')
-        ).filter_by(course_id=course_id).first()
-        
-        # 评分分布
-        rating_distribution = db.session.query(
-            Review.rating,
-            func.count(Review.id).label('count')
-        ).filter(
-            Review.course_id == course_id,
-            Review.rating.isnot(None)
-        ).group_by(Review.rating).all()
+        # 获取评价列表（列查询，不构造ORM对象）
+        shape = review_shape(fields, include_user=fields is None or 'user' in fields, snippet=snippet)
+        review_query = shape.query(Review.created_at, Review.id).filter(Review.course_id == course_id)
+        if wants_cursor():
+            pagination = keyset_paginate(
+                review_query,
+                [Review.created_at, Review.id],
+                per_page,
+                request.args.get('cursor'),
+                sort_key='created_at:desc',
+                total=total
+            )
+            rows = pagination.items
+            pagination_data = pagination.pagination_dict(per_page)
+        else:
+            page = max(page, 1)
+            rows = review_query.order_by(Review.created_at.desc(), Review.id.desc())\
+                .offset((page - 1) * per_page).limit(per_page).all()
+            pages = (total + per_page - 1) // per_page if per_page > 0 else 0
+            pagination_data = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': pages,
+                'has_prev': page > 1,
+                'has_next': page < pages
+            }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'data': {
                 'course': course.to_dict(include_instructor=True),
-                'reviews': [review.to_dict(include_user=True) for review in reviews],
+                'reviews': shape.encode_rows(rows),
                 'statistics': {
-                    'average_rating': round(float(stats.avg_rating), 1) if stats.avg_rating else 0.0,
-                    'average_learning_gain': round(float(stats.avg_learning_gain), 1) if stats.avg_learning_gain else 0.0,
-                    'average_workload': round(float(stats.avg_workload), 1) if stats.avg_workload else 0.0,
-                    'average_difficulty': round(float(stats.avg_difficulty), 1) if stats.avg_difficulty else 0.0,
-                    'total_reviews': stats.total_reviews or 0,
-                    'rated_reviews': stats.rated_reviews or 0
+                    'average_rating': stats.average('rating'),
+                    'average_learning_gain': stats.average('learning_gain'),
+                    'average_workload': stats.average('workload'),
+                    'average_difficulty': stats.average('difficulty'),
+                    'total_reviews': total,
+                    'rated_reviews': stats.rating_count or 0
                 },
-                'rating_distribution': [
-                    {'rating': rating, 'count': count}
-                    for rating, count in rating_distribution
-                ]
+                'rating_distribution': stats.histogram('rating')
             },
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_prev': pagination.has_prev,
-                'has_next': pagination.has_next
-            }
+            'pagination': pagination_data
         })
         
+    except CursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -139,12 +193,10 @@ def create_review(course_id):
             content=data.get('content', '').strip() or None if data else None
         )
         
+        # 评价、评分聚合与课程评分列在同一事务中提交
         db.session.add(review)
         db.session.commit()
         
-        # 更新课程的评分统计
-        course.update_rating_stats()
-        
         return jsonify({
             'success': True,
             'message': '评价提交成功',
@@ -160,10 +212,16 @@ def create_review(course_id):
 
 
 @api_bp.route('/reviews/<int:review_id>', methods=['GET'])
+@conditional(lambda review_id: [
+    (Review, Review.id == review_id),
+    (Course,),
+    (User, User.id.in_(db.select(Review.user_id).where(Review.id == review_id)))
+])
 def get_review(review_id):
     """获取单个评价详情"""
     try:
-        review = Review.query.get_or_404(review_id)
+        review = Review.query.options(*Review.eager_options(include_user=True, include_course=True))\
+            .filter_by(id=review_id).first_or_404()
         return jsonify({
             'success': True,
             'data': review.to_dict(include_user=True, include_course=True)
@@ -180,9 +238,23 @@ def get_review(review_id):
 
 
 @api_bp.route('/users/<int:user_id>/reviews', methods=['GET'])
+@conditional(lambda user_id: [
+    (User, User.id == user_id),
+    (Review, Review.user_id == user_id),
+    (Course,)
+])
 def get_user_reviews(user_id):
     """获取用户的所有评价"""
     try:
+        try:
+            fields, snippet = parse_review_list_params()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        include_course = fields is None or 'course' in fields
+        
         # 验证用户是否存在
         user = User.query.get_or_404(user_id)
         
@@ -191,9 +263,30 @@ def get_user_reviews(user_id):
         per_page = min(request.args.get('per_page', 10, type=int), 50)
         
         # 获取用户评价列表
-        pagination = Review.query.filter_by(user_id=user_id)\
-            .order_by(Review.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        review_query = Review.query.options(
+            *Review.eager_options(include_course=include_course),
+            *review_load_options(fields, snippet, Review.created_at)
+        ).filter_by(user_id=user_id)
+        if wants_cursor():
+            pagination = keyset_paginate(
+                review_query,
+                [Review.created_at, Review.id],
+                per_page,
+                request.args.get('cursor'),
+                sort_key='created_at:desc'
+            )
+            pagination_data = pagination.pagination_dict(per_page)
+        else:
+            pagination = review_query.order_by(Review.created_at.desc())\
+                .paginate(page=page, per_page=per_page, error_out=False)
+            pagination_data = {
+                'page': page,
+                'per_page': per_page,
+                'total': pagination.total,
+                'pages': pagination.pages,
+                'has_prev': pagination.has_prev,
+                'has_next': pagination.has_next
+            }
         
         reviews = pagination.items
         
@@ -201,18 +294,19 @@ def get_user_reviews(user_id):
             'success': True,
             'data': {
                 'user': user.to_dict(),
-                'reviews': [review.to_dict(include_course=True) for review in reviews]
+                'reviews': [
+                    review.to_dict(include_course=include_course, fields=fields, snippet=snippet)
+                    for review in reviews
+                ]
             },
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_prev': pagination.has_prev,
-                'has_next': pagination.has_next
-            }
+            'pagination': pagination_data
         })
         
+    except CursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -221,9 +315,20 @@ def get_user_reviews(user_id):
 
 
 @api_bp.route('/reviews', methods=['GET'])
+@conditional(lambda: [(Review,), (Course,), (User,)])
 def get_reviews():
-    """获取评价列表，支持按课程、教师、用户筛选"""
+    """获取评价列表，支持按课程、教师、用户筛选；fields 和 snippet 限定取回的列"""
     try:
+        try:
+            fields, snippet = parse_review_list_params()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        include_user = fields is None or 'user' in fields
+        include_course = fields is None or 'course' in fields
+        
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 50)
@@ -232,8 +337,9 @@ def get_reviews():
         user_id = request.args.get('user_id', type=int)
         sort_by = request.args.get('sort', 'newest')  # newest, oldest, highest, lowest
         
-        # 构建查询
-        query = Review.query.join(Course)
+        # 构建列查询（用户名、课程标题按需连接；按讲师筛选时连接课程表）
+        shape = review_shape(fields, include_user=include_user, include_course=include_course, snippet=snippet)
+        query = shape.query(Review.created_at, Review.id, tables=(Course,) if instructor_id else ())
         
         # 筛选条件
         if course_id:
@@ -243,15 +349,34 @@ def get_reviews():
         if user_id:
             query = query.filter(Review.user_id == user_id)
         
-        # 排序
+        # 游标分页：仅支持按创建时间排序
+        if wants_cursor():
+            if sort_by not in ('newest', 'oldest'):
+                raise CursorError('游标分页仅支持 newest/oldest 排序')
+            page_result = keyset_paginate(
+                query,
+                [Review.created_at, Review.id],
+                per_page,
+                request.args.get('cursor'),
+                descending=sort_by == 'newest',
+                sort_key=f'created_at:{sort_by}'
+            )
+            return json_response({
+                'success': True,
+                'data': shape.encode_rows(page_result.items),
+                'pagination': page_result.pagination_dict(per_page)
+            })
+        
+        # 排序（按课程筛选时走 (course_id, created_at) / (course_id, rating) 复合索引）
+        # MySQL 不支持 NULLS LAST：降序时空值本就排在最后，升序时先按是否为空排序
         if sort_by == 'oldest':
-            query = query.order_by(Review.created_at.asc())
+            query = query.order_by(Review.created_at.asc(), Review.id.asc())
         elif sort_by == 'highest':
-            query = query.order_by(Review.rating.desc().nulls_last())
+            query = query.order_by(Review.rating.desc(), Review.id.desc())
         elif sort_by == 'lowest':
-            query = query.order_by(Review.rating.asc().nulls_last())
+            query = query.order_by(Review.rating.is_(None), Review.rating.asc(), Review.id.asc())
         else:  # newest
-            query = query.order_by(Review.created_at.desc())
+            query = query.order_by(Review.created_at.desc(), Review.id.desc())
         
         # 分页
         pagination = query.paginate(
@@ -260,11 +385,9 @@ def get_reviews():
             error_out=False
         )
         
-        reviews = pagination.items
-        
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [review.to_dict(include_user=True, include_course=True) for review in reviews],
+            'data': shape.encode_rows(pagination.items),
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -277,6 +400,11 @@ def get_reviews():
             }
         })
         
+    except CursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -344,12 +472,10 @@ def create_review_general():
             content=data.get('content', '').strip() or None
         )
         
+        # 评价、评分聚合与课程评分列在同一事务中提交
         db.session.add(review)
         db.session.commit()
         
-        # 更新课程的评分统计
-        course.update_rating_stats()
-        
         return jsonify({
             'success': True,
             'data': review.to_dict(include_user=True, include_course=True),
@@ -364,6 +490,182 @@ def create_review_general():
         }), 500
 
 
+# 单次批量提交的最大评价数
+MAX_BULK_REVIEWS = 50
+
+# 批量插入遇到并发冲突时的最多尝试次数（每次重试前剔除冲突的评价）
+BULK_INSERT_ATTEMPTS = 3
+
+RATING_FIELD_NAMES = {
+    'rating': '综合评分',
+    'learning_gain': '课程收获',
+    'workload': '繁忙程度',
+    'difficulty': '课程难度'
+}
+
+
+def _validate_bulk_item(item):
+    """校验单条批量评价，返回 (列值, 错误信息)"""
+    if not isinstance(item, dict):
+        return None, '格式不正确'
+    course_id = item.get('course_id')
+    if not isinstance(course_id, int) or isinstance(course_id, bool):
+        return None, 'course_id 不能为空'
+    values = {'course_id': course_id}
+    for field, field_name in RATING_FIELD_NAMES.items():
+        rating_value = item.get(field)
+        if rating_value is not None and (
+                not isinstance(rating_value, int) or rating_value < 1 or rating_value > 5):
+            return None, f'{field_name}必须是1-5之间的整数'
+        values[field] = rating_value
+    content = item.get('content')
+    values['content'] = content.strip() or None if isinstance(content, str) else None
+    return values, None
+
+
+def _bulk_conflicts(user_id, course_ids):
+    """(存在的课程ID集合, 该用户已评价的课程ID集合)，各一条 IN 查询"""
+    if not course_ids:
+        return set(), set()
+    existing_courses = set(db.session.execute(
+        db.select(Course.id).where(Course.id.in_(course_ids))
+    ).scalars())
+    reviewed = set(db.session.execute(
+        db.select(Review.course_id).where(
+            Review.user_id == user_id, Review.course_id.in_(course_ids)
+        )
+    ).scalars())
+    return existing_courses, reviewed
+
+
+@api_bp.route('/reviews/bulk', methods=['POST'])
+@login_required
+def create_reviews_bulk():
+    """当前用户批量提交评价
+
+    课程存在性和 unique_user_course 重复检查各用一条 IN 查询，合法的评价一次批量
+    插入，每门课程的评分聚合只更新一次，全部在同一事务中提交。逐条返回结果，
+    某条不合法不影响其他评价；检查之后才出现的并发冲突由唯一约束拦截，回滚后
+    逐条报告并重试其余评价。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('reviews')
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'message': 'reviews必须是非空数组'
+            }), 400
+        if len(items) > MAX_BULK_REVIEWS:
+            return jsonify({
+                'success': False,
+                'message': f'单次最多提交{MAX_BULK_REVIEWS}条评价'
+            }), 400
+        
+        user_id = current_user.id
+        results = []
+        candidates = []
+        for index, item in enumerate(items):
+            values, error = _validate_bulk_item(item)
+            result = {
+                'index': index,
+                'course_id': item.get('course_id') if isinstance(item, dict) else None,
+                'success': False
+            }
+            if error:
+                result['message'] = error
+            else:
+                candidates.append((result, values))
+            results.append(result)
+        
+        course_ids = {values['course_id'] for _, values in candidates}
+        existing_courses, reviewed = _bulk_conflicts(user_id, course_ids)
+        
+        now = datetime.utcnow()
+        pending = []
+        for result, values in candidates:
+            course_id = values['course_id']
+            if course_id not in existing_courses:
+                result['message'] = '课程不存在'
+            elif course_id in reviewed:
+                result['message'] = '您已经对此课程评价过了'
+            else:
+                reviewed.add(course_id)
+                pending.append((result, dict(values, user_id=user_id, created_at=now, updated_at=now)))
+        
+        accepted = []
+        for attempt in range(BULK_INSERT_ATTEMPTS):
+            if not pending:
+                break
+            rows = [row for _, row in pending]
+            try:
+                # 批量插入绕过ORM事件，需手动更新评分聚合、同步课程表并使缓存失效
+                connection = db.session.connection()
+                db.session.execute(insert(Review.__table__), rows)
+                bump_entity_versions(connection, 'reviews')
+                touched = apply_review_inserts(connection, rows)
+                apply_user_review_inserts(connection, rows)
+                schedule_course_sync(db.session, touched)
+                db.session.commit()
+            except IntegrityError:
+                # 预检查之后其他请求提交了同一课程的评价或删除了课程：重新检查，
+                # 冲突的评价逐条报告，其余的重试
+                db.session.rollback()
+                existing_courses, reviewed = _bulk_conflicts(user_id, {row['course_id'] for row in rows})
+                remaining = []
+                for result, row in pending:
+                    if row['course_id'] not in existing_courses:
+                        result['message'] = '课程不存在'
+                    elif row['course_id'] in reviewed:
+                        result['message'] = '您已经对此课程评价过了'
+                    else:
+                        remaining.append((result, row))
+                if len(remaining) == len(pending):
+                    # 冲突不来自评价重复或课程删除，重试也不会成功
+                    raise
+                pending = remaining
+                continue
+            accepted = pending
+            break
+        else:
+            for result, _ in pending:
+                result['message'] = '提交冲突，请重试'
+        
+        if accepted:
+            rows = [row for _, row in accepted]
+            response_cache.bump('review', 'course')
+            reviewed_courses.invalidate(user_id)
+            trending_courses.apply([(row['course_id'], row['rating'], now, 1) for row in rows])
+            
+            review_ids = dict(db.session.execute(
+                db.select(Review.course_id, Review.id).where(
+                    Review.user_id == user_id,
+                    Review.course_id.in_([row['course_id'] for row in rows])
+                )
+            ).all())
+            for result, _ in accepted:
+                result.update({
+                    'success': True,
+                    'review_id': review_ids.get(result['course_id']),
+                    'message': '评价提交成功'
+                })
+        
+        created = len(accepted)
+        return jsonify({
+            'success': created > 0,
+            'message': f'成功提交{created}条评价，失败{len(results) - created}条',
+            'data': results,
+            'created': created
+        }), 201 if created else 400
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'批量提交评价失败: {str(e)}'
+        }), 500
+
+
 @api_bp.route('/reviews/<int:review_id>', methods=['PUT'])
 @login_required
 def update_review(review_id):
@@ -413,11 +715,9 @@ def update_review(review_id):
         # 更新修改时间
         review.updated_at = db.func.now()
         
+        # 评价、评分聚合与课程评分列在同一事务中提交
         db.session.commit()
         
-        # 更新课程的评分统计
-        review.course.update_rating_stats()
-        
         return jsonify({
             'success': True,
             'message': '评价更新成功',
@@ -447,16 +747,10 @@ def delete_review(review_id):
                 'message': '您只能删除自己的评价'
             }), 403
         
-        # 获取关联的课程（用于更新统计）
-        course = review.course
-        
-        # 删除评价
+        # 删除评价（评分聚合与课程评分列在同一事务中更新）
         db.session.delete(review)
         db.session.commit()
         
-        # 更新课程的评分统计
-        course.update_rating_stats()
-        
         return jsonify({
             'success': True,
             'message': '评价删除成功'
@@ -520,3 +814,50 @@ def check_review_eligibility():
             'success': False,
             'message': f'检查评价资格失败: {str(e)}'
         }), 500
+
+
+@api_bp.route('/reviews/check/bulk', methods=['POST'])
+@login_required
+def check_review_eligibility_bulk():
+    """批量检查当前用户对一组课程的评价资格
+
+    请求体：{"course_ids": [1, 2, 3]}；已评价集合来自按用户缓存的课程ID集合，
+    缓存命中时不访问数据库，未命中时只需一条按用户的索引查询。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        course_ids = data.get('course_ids')
+        if not isinstance(course_ids, list) or not course_ids:
+            return jsonify({
+                'success': False,
+                'message': 'course_ids必须是非空数组'
+            }), 400
+        if len(course_ids) > MAX_IDS:
+            return jsonify({
+                'success': False,
+                'message': f'course_ids最多包含{MAX_IDS}个ID'
+            }), 400
+        if not all(isinstance(course_id, int) and not isinstance(course_id, bool)
+                   for course_id in course_ids):
+            return jsonify({
+                'success': False,
+                'message': 'course_ids必须是整数数组'
+            }), 400
+        
+        course_ids = list(dict.fromkeys(course_ids))
+        reviewed, not_reviewed = reviewed_courses.check(current_user.id, course_ids)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'user_id': current_user.id,
+                'reviewed': reviewed,
+                'not_reviewed': not_reviewed
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'检查评价资格失败: {str(e)}'
+        }), 500
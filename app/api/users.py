@@ -3,15 +3,28 @@ Users API endpoints matching the database schema
 """
 
 from flask import jsonify, request
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from app.api import api_bp
 from app.models.user import User
-from app.models.review import Review
+from app.models.user_signup_daily import signup_totals
+from app.models.user_stats import most_active_users
+from app.services.password_hasher import PasswordHasherBusy
+from app.services.user_directory import user_directory
+from app.utils.pagination import CursorError, keyset_paginate, wants_cursor
+from app.utils.params import parse_fields
+from app.utils.serializers import json_response, user_shape
 from app import db
 import re
 
 
+# 批量检查用户名时的最大候选数量
+MAX_CANDIDATES = 20
+
+# 唯一约束冲突时按字段返回的提示
+CONFLICT_MESSAGES = {'username': '用户名已存在', 'email': '邮箱已存在'}
+
+
 def validate_email(email):
     """验证邮箱格式"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -29,8 +42,19 @@ def validate_password(password):
 
 @api_bp.route('/users', methods=['GET'])
 def get_users():
-    """获取用户列表，支持搜索和分页"""
+    """获取用户列表，支持搜索和分页；传入 fields 时只取回并输出这些字段
+
+    使用列查询和编译好的行序列化器，不构造ORM对象。
+    """
     try:
+        try:
+            fields = parse_fields(tuple(User.FIELD_GETTERS))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 100)  # 最大100条
@@ -38,8 +62,9 @@ def get_users():
         sort_by = request.args.get('sort_by', 'created_at')  # created_at, username, email
         order = request.args.get('order', 'desc')  # asc, desc
         
-        # 构建查询
-        query = User.query
+        # 构建列查询（指定 fields 时只取回这些列；排序列总是选取，供游标分页取键值）
+        shape = user_shape(fields)
+        query = shape.query(User.created_at, User.username, User.email, User.id)
         
         # 搜索条件
         if search:
@@ -50,6 +75,26 @@ def get_users():
                 )
             )
         
+        # 游标分页：按 (排序列, id) 定位，不使用 OFFSET
+        if wants_cursor():
+            sort_column = {
+                'username': User.username,
+                'email': User.email
+            }.get(sort_by, User.created_at)
+            page_result = keyset_paginate(
+                query,
+                [sort_column, User.id],
+                per_page,
+                request.args.get('cursor'),
+                descending=order != 'asc',
+                sort_key=f'{sort_column.key}:{order}'
+            )
+            return json_response({
+                'success': True,
+                'data': shape.encode_rows(page_result.items),
+                'pagination': page_result.pagination_dict(per_page)
+            })
+        
         # 排序
         if sort_by == 'username':
             order_by = User.username.asc() if order == 'asc' else User.username.desc()
@@ -67,11 +112,9 @@ def get_users():
             error_out=False
         )
         
-        users = pagination.items
-        
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [user.to_dict() for user in users],
+            'data': shape.encode_rows(pagination.items),
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -84,6 +127,11 @@ def get_users():
             }
         })
         
+    except CursorError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -97,16 +145,12 @@ def get_user(user_id):
     try:
         user = User.query.get_or_404(user_id)
         
-        # 获取用户的评价统计
-        review_stats = db.session.query(
-            db.func.count(Review.id).label('total_reviews'),
-            db.func.avg(Review.rating).label('avg_rating_given')
-        ).filter_by(user_id=user_id).first()
-        
-        user_data = user.to_dict(include_reviews=True)
+        # 评价统计取自增量维护的统计行
+        stats = user.get_stats()
+        user_data = user.to_dict()
         user_data['statistics'] = {
-            'total_reviews': review_stats.total_reviews or 0,
-            'avg_rating_given': round(float(review_stats.avg_rating_given), 1) if review_stats.avg_rating_given else 0.0
+            'total_reviews': stats['total_reviews'],
+            'avg_rating_given': round(stats['avg_rating'], 1)
         }
         
         return jsonify({
@@ -162,14 +206,14 @@ def create_user():
             }), 400
         
         # 检查用户名是否已存在
-        if User.query.filter_by(username=username).first():
+        if user_directory.taken('username', username):
             return jsonify({
                 'success': False,
                 'message': '用户名已存在'
             }), 400
         
         # 检查邮箱是否已存在
-        if User.query.filter_by(email=email).first():
+        if user_directory.taken('email', email):
             return jsonify({
                 'success': False,
                 'message': '邮箱已存在'
@@ -179,7 +223,7 @@ def create_user():
         user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password)
+            password=password
         )
         
         db.session.add(user)
@@ -191,6 +235,25 @@ def create_user():
             'data': user.to_dict()
         }), 201
         
+    except IntegrityError as e:
+        # 检查之后才提交的并发注册由唯一约束拦截，回滚后确认是哪个字段
+        db.session.rollback()
+        field = user_directory.conflict({'username': username, 'email': email})
+        if field:
+            return jsonify({
+                'success': False,
+                'message': CONFLICT_MESSAGES[field]
+            }), 400
+        return jsonify({
+            'success': False,
+            'message': f'创建用户失败: {str(e)}'
+        }), 500
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -212,6 +275,8 @@ def update_user(user_id):
                 'message': '请提供更新数据'
             }), 400
         
+        changes = {}
+
         # 更新用户名
         if 'username' in data:
             new_username = data['username'].strip()
@@ -228,14 +293,13 @@ def update_user(user_id):
                 }), 400
             
             # 检查用户名是否已被其他用户使用
-            existing_user = User.query.filter_by(username=new_username).first()
-            if existing_user and existing_user.id != user_id:
+            if user_directory.taken('username', new_username, exclude_id=user_id):
                 return jsonify({
                     'success': False,
                     'message': '用户名已存在'
                 }), 400
             
-            user.username = new_username
+            user.username = changes['username'] = new_username
         
         # 更新邮箱
         if 'email' in data:
@@ -253,14 +317,13 @@ def update_user(user_id):
                 }), 400
             
             # 检查邮箱是否已被其他用户使用
-            existing_user = User.query.filter_by(email=new_email).first()
-            if existing_user and existing_user.id != user_id:
+            if user_directory.taken('email', new_email, exclude_id=user_id):
                 return jsonify({
                     'success': False,
                     'message': '邮箱已存在'
                 }), 400
             
-            user.email = new_email
+            user.email = changes['email'] = new_email
         
         db.session.commit()
         
@@ -270,6 +333,18 @@ def update_user(user_id):
             'data': user.to_dict()
         })
         
+    except IntegrityError as e:
+        db.session.rollback()
+        field = user_directory.conflict(changes, exclude_id=user_id)
+        if field:
+            return jsonify({
+                'success': False,
+                'message': CONFLICT_MESSAGES[field]
+            }), 400
+        return jsonify({
+            'success': False,
+            'message': f'更新用户失败: {str(e)}'
+        }), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -302,7 +377,7 @@ def change_password(user_id):
         new_password = data['new_password']
         
         # 验证旧密码
-        if not check_password_hash(user.password_hash, old_password):
+        if not user.check_password(old_password):
             return jsonify({
                 'success': False,
                 'message': '旧密码不正确'
@@ -316,14 +391,14 @@ def change_password(user_id):
             }), 400
         
         # 检查新密码与旧密码是否相同
-        if check_password_hash(user.password_hash, new_password):
+        if user.check_password(new_password):
             return jsonify({
                 'success': False,
                 'message': '新密码不能与旧密码相同'
             }), 400
         
         # 更新密码
-        user.password_hash = generate_password_hash(new_password)
+        user.set_password(new_password)
         db.session.commit()
         
         return jsonify({
@@ -331,6 +406,12 @@ def change_password(user_id):
             'message': '密码修改成功'
         })
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -346,7 +427,7 @@ def delete_user(user_id):
         user = User.query.get_or_404(user_id)
         
         # 检查用户是否有评价
-        review_count = user.reviews.count()
+        review_count = user.get_reviews_count()
         if review_count > 0:
             return jsonify({
                 'success': False,
@@ -387,18 +468,27 @@ def login():
         # 查找用户
         user = User.query.filter_by(email=email).first()
         
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not user.check_password(password):
             return jsonify({
                 'success': False,
                 'message': '邮箱或密码错误'
             }), 401
         
+        # 保存登录时可能发生的重新哈希
+        db.session.commit()
+        
         return jsonify({
             'success': True,
             'message': '登录成功',
             'data': user.to_dict()
         })
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
@@ -419,12 +509,63 @@ def check_username(username):
                 'message': '用户名长度必须在3-50个字符之间'
             })
         
-        existing_user = User.query.filter_by(username=username).first()
+        taken = user_directory.contains('username', username)
+        
+        return jsonify({
+            'success': True,
+            'available': not taken,
+            'message': '用户名已存在' if taken else '用户名可用'
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'检查用户名失败: {str(e)}'
+        }), 500
+
+
+@api_bp.route('/users/check-usernames', methods=['GET'])
+def check_usernames():
+    """批量检查候选用户名是否可用（?usernames=a,b,c）"""
+    try:
+        usernames = []
+        for part in request.args.get('usernames', '').split(','):
+            part = part.strip()
+            if part and part not in usernames:
+                usernames.append(part)
+        if not usernames:
+            return jsonify({
+                'success': False,
+                'message': 'usernames不能为空'
+            }), 400
+        if len(usernames) > MAX_CANDIDATES:
+            return jsonify({
+                'success': False,
+                'message': f'usernames最多包含{MAX_CANDIDATES}个用户名'
+            }), 400
+        
+        valid = [username for username in usernames if 3 <= len(username) <= 50]
+        taken_names = user_directory.check_many('username', valid) if valid else {}
+        
+        results = []
+        for username in usernames:
+            if username not in taken_names:
+                results.append({
+                    'username': username,
+                    'available': False,
+                    'message': '用户名长度必须在3-50个字符之间'
+                })
+                continue
+            taken = taken_names[username]
+            results.append({
+                'username': username,
+                'available': not taken,
+                'message': '用户名已存在' if taken else '用户名可用'
+            })
         
         return jsonify({
             'success': True,
-            'available': existing_user is None,
-            'message': '用户名可用' if existing_user is None else '用户名已存在'
+            'data': results
         })
         
     except Exception as e:
@@ -447,12 +588,12 @@ def check_email(email):
                 'message': '邮箱格式不正确'
             })
         
-        existing_user = User.query.filter_by(email=email).first()
+        taken = user_directory.contains('email', email)
         
         return jsonify({
             'success': True,
-            'available': existing_user is None,
-            'message': '邮箱可用' if existing_user is None else '邮箱已存在'
+            'available': not taken,
+            'message': '邮箱已存在' if taken else '邮箱可用'
         })
         
     except Exception as e:
@@ -466,19 +607,11 @@ def check_email(email):
 def get_user_stats():
     """获取用户统计信息"""
     try:
-        total_users = User.query.count()
-        
-        # 最活跃用户（评价最多）
-        active_users = db.session.query(
-            User.username,
-            db.func.count(Review.id).label('review_count')
-        ).join(Review).group_by(User.id, User.username)\
-         .order_by(db.func.count(Review.id).desc()).limit(10).all()
-        
-        # 新注册用户（最近7天）
-        from datetime import datetime, timedelta
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        new_users_count = User.query.filter(User.created_at >= week_ago).count()
+        # 用户总数和最近7天（按UTC自然日）的新注册数取自每日注册计数
+        total_users, new_users_count = signup_totals(days=7)
+        
+        # 最活跃用户（评价最多）：沿用户统计表的评价数索引读取前10行
+        active_users = most_active_users(limit=10)
         
         return jsonify({
             'success': True,
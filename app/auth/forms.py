@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional
-from app.models.user import User
+from app.services.user_directory import user_directory
 
 class LoginForm(FlaskForm):
     """登录表单"""
@@ -44,14 +44,12 @@ class RegistrationForm(FlaskForm):
     
     def validate_username(self, username):
         """验证用户名是否已存在"""
-        user = User.query.filter_by(username=username.data).first()
-        if user:
+        if user_directory.taken('username', username.data):
             raise ValidationError('用户名已存在，请选择其他用户名。')
     
     def validate_email(self, email):
         """验证邮箱是否已存在"""
-        user = User.query.filter_by(email=email.data).first()
-        if user:
+        if user_directory.taken('email', email.data):
             raise ValidationError('邮箱已被注册，请使用其他邮箱。')
 
 class ChangePasswordForm(FlaskForm):
@@ -89,13 +87,11 @@ class EditProfileForm(FlaskForm):
     def validate_username(self, username):
         """验证用户名是否已存在（排除当前用户）"""
         if username.data != self.original_username:
-            user = User.query.filter_by(username=username.data).first()
-            if user:
+            if user_directory.taken('username', username.data):
                 raise ValidationError('用户名已存在，请选择其他用户名。')
     
     def validate_email(self, email):
         """验证邮箱是否已存在（排除当前用户）"""
         if email.data != self.original_email:
-            user = User.query.filter_by(email=email.data).first()
-            if user:
+            if user_directory.taken('email', email.data):
                 raise ValidationError('邮箱已被注册，请使用其他邮箱。')
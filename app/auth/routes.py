@@ -5,6 +5,9 @@ from app import db
 from app.models.user import User
 from app.auth import auth_bp
 from app.auth.forms import LoginForm, RegistrationForm
+from app.services.password_hasher import PasswordHasherBusy
+from app.services.user_directory import user_directory
+from sqlalchemy.exc import IntegrityError
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -19,7 +22,13 @@ def login():
             (User.email == form.username.data)
         ).first()
         
-        if user and user.check_password(form.password.data):
+        try:
+            authenticated = user is not None and user.check_password(form.password.data)
+        except PasswordHasherBusy as e:
+            flash(str(e), 'error')
+            return render_template('auth/login.html', title='登录', form=form)
+        
+        if authenticated:
             login_user(user, remember=form.remember_me.data)
             user.update_updated_at()
             
@@ -51,18 +60,20 @@ def register():
                 return render_template('auth/register.html', form=form)
 
 
-        user = User(
-            username=form.username.data,
-            email=form.email.data,
-            password=form.password.data,
-            ucd_student_id=ucd_id
-        )
-        
         try:
+            user = User(
+                username=form.username.data,
+                email=form.email.data,
+                password=form.password.data,
+                ucd_student_id=ucd_id
+            )
             db.session.add(user)
             db.session.commit()
             flash('注册成功！请登录。', 'success')
             return redirect(url_for('auth.login'))
+        except PasswordHasherBusy as e:
+            db.session.rollback()
+            flash(str(e), 'error')
         except Exception as e:
             db.session.rollback()
             flash('注册失败，请检查信息后重试。', 'error')
@@ -85,18 +96,23 @@ def profile():
     page = request.args.get('page', 1, type=int)
     per_page = 10  # 每页显示10条评价
     
-    # 获取用户统计信息
+    # 获取用户统计信息（统计行的一次主键读取）
     user_stats = current_user.get_stats()
     
-    # 获取用户的评价（分页）
+    # 获取用户的评价（分页）；总数取自统计行，不再执行 COUNT 查询
     from app.models.review import Review
-    reviews = Review.query.filter(Review.user_id == current_user.id)\
+    from app.models.course import Course
+    from sqlalchemy.orm import joinedload
+    reviews = Review.query.options(joinedload(Review.course).joinedload(Course.instructor))\
+        .filter(Review.user_id == current_user.id)\
         .order_by(Review.created_at.desc())\
         .paginate(
             page=page, 
             per_page=per_page, 
-            error_out=False
+            error_out=False,
+            count=False
         )
+    reviews.total = user_stats['total_reviews']
     
     return render_template(
         'auth/profile.html', 
@@ -128,7 +144,12 @@ def api_login():
         (User.email == data['username'])
     ).first()
     
-    if user and user.check_password(data['password']):
+    try:
+        authenticated = user is not None and user.check_password(data['password'])
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
+    
+    if authenticated:
         login_user(user, remember=data.get('remember', False))
         user.update_updated_at()
         
@@ -151,11 +172,11 @@ def api_register():
             return jsonify({'error': f'{field} 不能为空'}), 400
     
     # 检查用户名是否已存在
-    if User.query.filter_by(username=data['username']).first():
+    if user_directory.taken('username', data['username']):
         return jsonify({'error': '用户名已存在'}), 400
     
     # 检查邮箱是否已存在
-    if User.query.filter_by(email=data['email']).first():
+    if user_directory.taken('email', data['email']):
         return jsonify({'error': '邮箱已被注册'}), 400
     
     try:
@@ -174,6 +195,18 @@ def api_register():
             'user': user.to_dict()
         }), 201
         
+    except IntegrityError:
+        # 检查之后才提交的并发注册由唯一约束拦截，回滚后确认是哪个字段
+        db.session.rollback()
+        field = user_directory.conflict({'username': data['username'], 'email': data['email']})
+        if field == 'username':
+            return jsonify({'error': '用户名已存在'}), 400
+        if field == 'email':
+            return jsonify({'error': '邮箱已被注册'}), 400
+        return jsonify({'error': '注册失败，请稍后重试'}), 500
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': '注册失败，请稍后重试'}), 500
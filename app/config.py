@@ -22,6 +22,56 @@ class Config:
     # 其他配置
     JSON_AS_ASCII = False  # 支持中文JSON响应
     
+    # 课程搜索索引最长存活时间（秒），超时后从数据库重建
+    SEARCH_INDEX_MAX_AGE = int(os.environ.get('SEARCH_INDEX_MAX_AGE', 300))
+    
+    # 游标分页总数缓存时间（秒）
+    PAGINATION_COUNT_TTL = int(os.environ.get('PAGINATION_COUNT_TTL', 60))
+    
+    # API响应缓存（进程内LRU，写入课程/讲师/评价时按版本号失效）
+    API_CACHE_ENABLED = os.environ.get('API_CACHE_ENABLED', 'true').lower() == 'true'
+    API_CACHE_TTL = int(os.environ.get('API_CACHE_TTL', 300))
+    API_CACHE_MAX_ENTRIES = int(os.environ.get('API_CACHE_MAX_ENTRIES', 1024))
+    
+    # 条件请求（ETag/Last-Modified，校验命中时返回304）
+    CONDITIONAL_GET_ENABLED = os.environ.get('CONDITIONAL_GET_ENABLED', 'true').lower() == 'true'
+    
+    # 课程表评分冗余列同步方式：immediate（与评价同一事务）或 coalesce（后台合并写入）
+    RATING_SYNC_MODE = os.environ.get('RATING_SYNC_MODE', 'immediate')
+    RATING_SYNC_DEBOUNCE = float(os.environ.get('RATING_SYNC_DEBOUNCE', 1.0))
+    RATING_SYNC_MAX_DELAY = float(os.environ.get('RATING_SYNC_MAX_DELAY', 5.0))
+    
+    # 用户已评价课程集合缓存（进程内，其他进程的写入按TTL过期）
+    REVIEWED_CACHE_ENABLED = os.environ.get('REVIEWED_CACHE_ENABLED', 'true').lower() == 'true'
+    REVIEWED_CACHE_TTL = int(os.environ.get('REVIEWED_CACHE_TTL', 60))
+    REVIEWED_CACHE_MAX_USERS = int(os.environ.get('REVIEWED_CACHE_MAX_USERS', 10000))
+    
+    # 热门课程：评价热度半衰期（小时）、保留的前K名数量、重建间隔（秒）
+    TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 72))
+    TRENDING_TOP_K = int(os.environ.get('TRENDING_TOP_K', 50))
+    TRENDING_REBUILD_INTERVAL = int(os.environ.get('TRENDING_REBUILD_INTERVAL', 300))
+    
+    # 用户名/邮箱可用性索引：布隆过滤器误判率、重建间隔（秒，用于纳入其他进程的写入）
+    USER_DIRECTORY_ENABLED = os.environ.get('USER_DIRECTORY_ENABLED', 'true').lower() == 'true'
+    USER_DIRECTORY_ERROR_RATE = float(os.environ.get('USER_DIRECTORY_ERROR_RATE', 0.01))
+    USER_DIRECTORY_REBUILD_INTERVAL = int(os.environ.get('USER_DIRECTORY_REBUILD_INTERVAL', 600))
+    
+    # 密码哈希准入：整台主机同时进行哈希的请求数（跨所有 worker，用锁文件计数）、名额占满时
+    # 允许等待的请求数（sync worker 下应为 0）、等待超时（秒）、锁文件目录，以及每个请求进程的
+    # 哈希子进程数（0 表示在请求进程内计算，只有 gthread/gevent worker 才需要子进程）
+    PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 1))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 0))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    PASSWORD_HASH_LOCK_DIR = os.environ.get('PASSWORD_HASH_LOCK_DIR')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    # 哈希方法；调整方法或迭代次数后，旧哈希在用户下次登录时按新参数重新生成
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    
+    # 当前用户快照缓存（进程内，其他进程的用户修改按TTL过期）
+    USER_CACHE_ENABLED = os.environ.get('USER_CACHE_ENABLED', 'true').lower() == 'true'
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_MAX_USERS = int(os.environ.get('USER_CACHE_MAX_USERS', 10000))
+    
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -6,5 +6,10 @@ from .instructor import Instructor
 from .course import Course
 from .user import User
 from .review import Review
+from .course_rating_stats import CourseRatingStats
+from .instructor_rating_stats import InstructorRatingStats
+from .user_stats import UserStats
+from .user_signup_daily import UserSignupDaily
+from .entity_version import EntityVersion
 
-__all__ = ['Instructor', 'Course', 'User', 'Review']
+__all__ = ['Instructor', 'Course', 'User', 'Review', 'CourseRatingStats', 'InstructorRatingStats', 'UserStats', 'UserSignupDaily', 'EntityVersion']
@@ -4,7 +4,7 @@ Course model matching the database schema
 
 from app import db
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 from app.models.review import Review
 
@@ -29,45 +29,70 @@ class Course(db.Model):
     
     # 关系
     reviews = db.relationship('Review', backref='course', lazy='dynamic', cascade='all, delete-orphan')
+    # 评分聚合与课程一起加载（一对一）
+    rating_stats = db.relationship('CourseRatingStats', uselist=False, lazy='joined', viewonly=True)
     
     # 添加索引
     __table_args__ = (
-        db.Index('idx_stage', 'stage'),
+        db.Index('idx_stage_title', 'stage', 'title'),
         db.Index('idx_instructor', 'instructor_id'),
         db.Index('idx_rating', 'average_rating'),
+        db.Index('idx_created', 'created_at'),
+        db.Index('idx_title', 'title'),
+        db.Index('idx_updated', 'updated_at'),
     )
     
+    # 可通过 ?fields= 选择的输出字段及取值方式（顺序即输出顺序）
+    FIELD_GETTERS = {
+        'id': lambda course: course.id,
+        'title': lambda course: course.title,
+        'description': lambda course: course.description,
+        'cover_images': lambda course: course.cover_images,
+        'stage': lambda course: course.stage,
+        'instructor_id': lambda course: course.instructor_id,
+        'average_rating': lambda course: float(course.rating_stats.average_rating)
+        if course.rating_stats and course.rating_stats.average_rating else 0.0,
+        'total_reviews': lambda course: course.rating_stats.total_reviews if course.rating_stats else 0,
+        'created_at': lambda course: course.created_at.isoformat() if course.created_at else None,
+        'updated_at': lambda course: course.updated_at.isoformat() if course.updated_at else None,
+    }
+    # 来自评分聚合关系（而非课程表自身列）的字段
+    FIELD_RELATIONSHIPS = {'average_rating': 'rating_stats', 'total_reviews': 'rating_stats'}
+    
     def __repr__(self):
         return f'<Course {self.title}>'
     
     def update_rating_stats(self):
-        """更新平均评分和评价数量"""
-        # 计算平均评分
-        avg_result = db.session.query(func.avg(Review.rating)).filter(
-            Review.course_id == self.id,
-            Review.rating.isnot(None)
-        ).scalar()
-        
-        self.average_rating = round(float(avg_result), 2) if avg_result else 0.00
+        """将评分聚合表中的平均评分和评价数量同步到课程表
+
+        评价写入时已由 app.services.rating_sync 自动同步，这里仅用于手动修复单门课程。
+        """
+        from app.models.course_rating_stats import rebuild_course_stats
+        from app.services.rating_sync import sync_course_columns
         
-        # 计算总评价数
-        self.total_reviews = self.reviews.count()
+        # 聚合表随评价写入增量维护，这里只需读取，不再扫描评价表
+        if self.rating_stats is None:
+            rebuild_course_stats(db.session.connection(), self.id)
+            db.session.expire(self, ['rating_stats'])
         
+        sync_course_columns(db.session.connection(), [self.id])
+        db.session.expire(self, ['average_rating', 'total_reviews', 'updated_at'])
         db.session.commit()
     
-    def to_dict(self, include_instructor=False, include_reviews=False):
-        """转换为字典格式"""
+    @classmethod
+    def eager_options(cls, include_instructor=False, include_reviews=False):
+        """与 to_dict 参数对应的预加载选项，列表查询据此避免N+1查询"""
+        options = []
+        if include_instructor:
+            options.append(joinedload(cls.instructor))
+        # reviews 为动态关系，无法预加载，由 to_dict 内单条查询取回
+        return options
+    
+    def to_dict(self, include_instructor=False, include_reviews=False, fields=None):
+        """转换为字典格式；指定 fields 时只输出（也只读取）这些字段"""
         data = {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'cover_images': self.cover_images,
-            'stage': self.stage,
-            'instructor_id': self.instructor_id,
-            'average_rating': float(self.average_rating) if self.average_rating else 0.0,
-            'total_reviews': self.total_reviews,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            name: getter(self) for name, getter in self.FIELD_GETTERS.items()
+            if fields is None or name in fields
         }
         
         if include_instructor and self.instructor:
@@ -79,6 +104,7 @@ class Course(db.Model):
             }
         
         if include_reviews:
-            data['reviews'] = [review.to_dict(include_user=True) for review in self.reviews]
+            reviews = self.reviews.options(*Review.eager_options(include_user=True))
+            data['reviews'] = [review.to_dict(include_user=True) for review in reviews]
         
         return data
@@ -0,0 +1,272 @@
+"""
+Per-course rating aggregates maintained incrementally from review writes
+"""
+
+from app import db
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select, case, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.models.course import Course
+from app.models.review import Review
+
+
+# 评分维度（均为1-5分，可为空）
+RATING_DIMENSIONS = ('rating', 'learning_gain', 'workload', 'difficulty')
+
+
+class CourseRatingStats(db.Model):
+    """课程评分聚合（各维度总分、计数与1-5分直方图）"""
+    __tablename__ = 'course_rating_stats'
+
+    course_id = db.Column(db.Integer,
+                          db.ForeignKey('courses.id', ondelete='CASCADE', onupdate='CASCADE'),
+                          primary_key=True, comment='课程ID')
+    total_reviews = db.Column(db.Integer, nullable=False, default=0, comment='总评价数量')
+    average_rating = db.Column(db.DECIMAL(3, 2), nullable=False, default=0.00, comment='平均评分(0.00-5.00)')
+
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, comment='综合评分总和')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, comment='综合评分数量')
+    rating_hist_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_hist_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_hist_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_hist_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_hist_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    learning_gain_sum = db.Column(db.Integer, nullable=False, default=0, comment='课程收获评分总和')
+    learning_gain_count = db.Column(db.Integer, nullable=False, default=0, comment='课程收获评分数量')
+    learning_gain_hist_1 = db.Column(db.Integer, nullable=False, default=0)
+    learning_gain_hist_2 = db.Column(db.Integer, nullable=False, default=0)
+    learning_gain_hist_3 = db.Column(db.Integer, nullable=False, default=0)
+    learning_gain_hist_4 = db.Column(db.Integer, nullable=False, default=0)
+    learning_gain_hist_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    workload_sum = db.Column(db.Integer, nullable=False, default=0, comment='繁忙程度评分总和')
+    workload_count = db.Column(db.Integer, nullable=False, default=0, comment='繁忙程度评分数量')
+    workload_hist_1 = db.Column(db.Integer, nullable=False, default=0)
+    workload_hist_2 = db.Column(db.Integer, nullable=False, default=0)
+    workload_hist_3 = db.Column(db.Integer, nullable=False, default=0)
+    workload_hist_4 = db.Column(db.Integer, nullable=False, default=0)
+    workload_hist_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    difficulty_sum = db.Column(db.Integer, nullable=False, default=0, comment='课程难度评分总和')
+    difficulty_count = db.Column(db.Integer, nullable=False, default=0, comment='课程难度评分数量')
+    difficulty_hist_1 = db.Column(db.Integer, nullable=False, default=0)
+    difficulty_hist_2 = db.Column(db.Integer, nullable=False, default=0)
+    difficulty_hist_3 = db.Column(db.Integer, nullable=False, default=0)
+    difficulty_hist_4 = db.Column(db.Integer, nullable=False, default=0)
+    difficulty_hist_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    # 添加索引
+    __table_args__ = (
+        db.Index('idx_average_rating', 'average_rating'),
+    )
+
+    def __repr__(self):
+        return f'<CourseRatingStats course={self.course_id} {self.average_rating}/{self.total_reviews}>'
+
+    def average(self, dimension, digits=1):
+        """某维度的平均分，无评分时为0.0"""
+        count = getattr(self, f'{dimension}_count')
+        if not count:
+            return 0.0
+        return round(getattr(self, f'{dimension}_sum') / count, digits)
+
+    def histogram(self, dimension='rating'):
+        """某维度的评分分布，只包含出现过的分值"""
+        return [
+            {'rating': value, 'count': getattr(self, f'{dimension}_hist_{value}')}
+            for value in range(1, 6)
+            if getattr(self, f'{dimension}_hist_{value}')
+        ]
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'course_id': self.course_id,
+            'total_reviews': self.total_reviews,
+            'average_rating': float(self.average_rating) if self.average_rating else 0.0,
+            'averages': {dimension: self.average(dimension, 2) for dimension in RATING_DIMENSIONS},
+            'counts': {dimension: getattr(self, f'{dimension}_count') for dimension in RATING_DIMENSIONS},
+            'histograms': {
+                dimension: [getattr(self, f'{dimension}_hist_{value}') for value in range(1, 6)]
+                for dimension in RATING_DIMENSIONS
+            }
+        }
+
+
+def average_expression(total, count):
+    """平均分（两位小数）的SQL表达式，无评分时为0
+
+    增量更新、全量补建和批量重算都用它由数据库计算平均分，舍入方式处处一致
+    （Python 的 round() 对浮点数按银行家舍入，与SQL的 ROUND 在 .xx5 处不同）。
+    """
+    return func.coalesce(func.round(total * 1.0 / func.nullif(count, 0), 2), 0)
+
+
+def aggregate_columns():
+    """从 reviews 表聚合出与 CourseRatingStats 各列同名的表达式（不含 course_id）"""
+    columns = [
+        func.count(Review.id).label('total_reviews'),
+        average_expression(func.sum(Review.rating), func.count(Review.rating)).label('average_rating')
+    ]
+    for dimension in RATING_DIMENSIONS:
+        column = getattr(Review, dimension)
+        columns.append(func.coalesce(func.sum(column), 0).label(f'{dimension}_sum'))
+        columns.append(func.count(column).label(f'{dimension}_count'))
+        for value in range(1, 6):
+            columns.append(func.coalesce(func.sum(case((column == value, 1), else_=0)), 0)
+                           .label(f'{dimension}_hist_{value}'))
+    return columns
+
+
+def aggregate_values(row):
+    """将聚合结果行转换为 CourseRatingStats 列值（平均分由SQL算好）"""
+    values = {key: int(row._mapping[key] or 0) for key in row._mapping.keys()
+              if key not in ('course_id', 'average_rating')}
+    values['average_rating'] = row._mapping['average_rating'] or 0
+    return values
+
+
+# ---------------------------- 增量维护 ----------------------------
+def _review_delta(old, new):
+    """根据评价写入前后的各维度分值计算列增量"""
+    delta = {}
+    for dimension in RATING_DIMENSIONS:
+        before, after = old.get(dimension), new.get(dimension)
+        if before == after:
+            continue
+        delta[f'{dimension}_sum'] = (after or 0) - (before or 0)
+        delta[f'{dimension}_count'] = (after is not None) - (before is not None)
+        if before is not None:
+            delta[f'{dimension}_hist_{before}'] = delta.get(f'{dimension}_hist_{before}', 0) - 1
+        if after is not None:
+            delta[f'{dimension}_hist_{after}'] = delta.get(f'{dimension}_hist_{after}', 0) + 1
+    return {key: value for key, value in delta.items() if value}
+
+
+def apply_review_delta(connection, course_id, delta, create_missing=True):
+    """以一条 UPDATE 对聚合行做增量运算，与评价写入处于同一事务
+
+    average_rating 放在 SET 子句最前面，保证在MySQL（按顺序求值）和标准SQL
+    中都基于旧值计算。
+    """
+    if not delta:
+        return
+    table = CourseRatingStats.__table__
+    rating_sum = table.c.rating_sum + delta.get('rating_sum', 0)
+    rating_count = table.c.rating_count + delta.get('rating_count', 0)
+    values = [(table.c.average_rating, average_expression(rating_sum, rating_count))]
+    values += [(table.c[key], table.c[key] + value) for key, value in delta.items()]
+    values.append((table.c.updated_at, datetime.utcnow()))
+    result = connection.execute(
+        update(table).where(table.c.course_id == course_id).ordered_values(*values)
+    )
+    if result.rowcount == 0 and create_missing:
+        # 聚合行缺失（如迁移前创建的课程）：按当前数据全量聚合补建，已包含本次写入
+        rebuild_course_stats(connection, course_id)
+
+    # 讲师聚合随课程聚合同步增量更新
+    from app.models.instructor_rating_stats import apply_course_delta
+    apply_course_delta(connection, course_id, delta)
+
+
+def apply_review_inserts(connection, reviews):
+    """批量插入评价后按课程合并增量，每门课程只执行一条 UPDATE
+
+    reviews 为已插入评价的列值字典（至少包含 course_id 和各评分维度）。
+    """
+    deltas = {}
+    for values in reviews:
+        delta = deltas.setdefault(values['course_id'], {'total_reviews': 0})
+        delta['total_reviews'] += 1
+        for key, value in _review_delta({}, values).items():
+            delta[key] = delta.get(key, 0) + value
+    for course_id, delta in deltas.items():
+        apply_review_delta(connection, course_id, delta)
+    return set(deltas)
+
+
+def rebuild_course_stats(connection, course_id):
+    """全量聚合单门课程并写入聚合行"""
+    row = connection.execute(
+        select(*aggregate_columns()).where(Review.course_id == course_id)
+    ).one()
+    values = aggregate_values(row)
+    table = CourseRatingStats.__table__
+    connection.execute(table.delete().where(table.c.course_id == course_id))
+    connection.execute(insert(table).values(course_id=course_id, updated_at=datetime.utcnow(), **values))
+
+
+def _current_values(target):
+    return {dimension: getattr(target, dimension) for dimension in RATING_DIMENSIONS}
+
+
+def _previous_values(target):
+    state = inspect(target)
+    values = {}
+    for dimension in RATING_DIMENSIONS:
+        history = state.attrs[dimension].history
+        values[dimension] = history.deleted[0] if history.deleted else getattr(target, dimension)
+    return values
+
+
+def _mark_touched(target, course_id):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('rating_stats_touched', set()).add(course_id)
+        # 课程表冗余列由 app.services.rating_sync 同步
+        session.info.setdefault('rating_sync_touched', set()).add(course_id)
+
+
+@event.listens_for(Course, 'after_insert')
+def _course_inserted(mapper, connection, target):
+    """新课程同时创建空的聚合行"""
+    connection.execute(insert(CourseRatingStats.__table__).values(
+        course_id=target.id, updated_at=datetime.utcnow()
+    ))
+
+
+@event.listens_for(Review, 'after_insert')
+def _review_inserted(mapper, connection, target):
+    apply_review_delta(connection, target.course_id,
+                       dict(_review_delta({}, _current_values(target)), total_reviews=1))
+    _mark_touched(target, target.course_id)
+
+
+@event.listens_for(Review, 'after_update')
+def _review_updated(mapper, connection, target):
+    history = inspect(target).attrs.course_id.history
+    if history.deleted and history.deleted[0] != target.course_id:
+        # 评价被移到另一门课程：从旧课程减去，再加到新课程
+        old_course_id = history.deleted[0]
+        previous = _previous_values(target)
+        apply_review_delta(connection, old_course_id,
+                           dict(_review_delta(previous, {}), total_reviews=-1), create_missing=False)
+        apply_review_delta(connection, target.course_id,
+                           dict(_review_delta({}, _current_values(target)), total_reviews=1))
+        _mark_touched(target, old_course_id)
+    else:
+        apply_review_delta(connection, target.course_id,
+                           _review_delta(_previous_values(target), _current_values(target)))
+    _mark_touched(target, target.course_id)
+
+
+@event.listens_for(Review, 'after_delete')
+def _review_deleted(mapper, connection, target):
+    apply_review_delta(connection, target.course_id,
+                       dict(_review_delta(_previous_values(target), {}), total_reviews=-1),
+                       create_missing=False)
+    _mark_touched(target, target.course_id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_touched_stats(session, flush_context):
+    """聚合行由SQL直接更新，使会话中已加载的聚合对象过期以便重新读取"""
+    for course_id in session.info.pop('rating_stats_touched', ()):
+        stats = session.identity_map.get(identity_key(CourseRatingStats, course_id))
+        if stats is not None:
+            session.expire(stats)
@@ -0,0 +1,71 @@
+"""
+Per-table insert/delete counters backing conditional GET validators
+"""
+
+from app import db
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+
+class EntityVersion(db.Model):
+    """表级增删计数
+
+    条件请求对不带条件的整表范围用 max(updated_at) 加这个计数代替 COUNT(*)：
+    新增和修改会推进 updated_at，删除（以及同一秒内的多次新增）只能由计数发现。
+    计数在写入所在的事务中递增，所有 worker 都能看到。
+    """
+    __tablename__ = 'entity_versions'
+
+    entity = db.Column(db.String(50), primary_key=True, comment='表名')
+    version = db.Column(db.BigInteger, nullable=False, default=0, comment='增删次数')
+
+    def __repr__(self):
+        return f'<EntityVersion {self.entity}={self.version}>'
+
+
+# 维护计数的表；聚合行随所属的课程一起增删，共用课程的计数
+VERSIONED_TABLES = {
+    'courses': 'courses',
+    'course_rating_stats': 'courses',
+    'instructors': 'instructors',
+    'reviews': 'reviews',
+    'users': 'users',
+}
+
+
+def version_key(table_name):
+    """表对应的计数名；不维护计数的表返回 None"""
+    return VERSIONED_TABLES.get(table_name)
+
+
+def bump_entity_versions(connection, *entities):
+    """在当前事务中把各计数加一（计数行不存在时插入）"""
+    table = EntityVersion.__table__
+    for entity in sorted(set(entities)):
+        if connection.dialect.name == 'mysql':
+            statement = mysql.insert(table).values(entity=entity, version=1)
+            statement = statement.on_duplicate_key_update(version=table.c.version + 1)
+        else:
+            # 开发环境的 SQLite
+            statement = sqlite.insert(table).values(entity=entity, version=1)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.entity], set_={'version': table.c.version + 1}
+            )
+        connection.execute(statement)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed(session, flush_context):
+    """ORM 新增或删除了计数表的行时，每个表每次flush只递增一次
+
+    批量 INSERT（批量评价、导入命令）不经过这里，由调用方自行调用 bump_entity_versions。
+    """
+    entities = {
+        version_key(obj.__table__.name)
+        for obj in list(session.new) + list(session.deleted)
+        if hasattr(obj, '__table__')
+    }
+    entities.discard(None)
+    if entities:
+        bump_entity_versions(session.connection(), *entities)
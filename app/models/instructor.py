@@ -20,24 +20,43 @@ class Instructor(db.Model):
     
     # 与课程的关系
     courses = db.relationship('Course', backref='instructor', lazy='dynamic')
+    # 评分聚合与讲师一起加载（一对一）
+    rating_stats = db.relationship('InstructorRatingStats', uselist=False, lazy='joined', viewonly=True)
+    
+    # 添加索引
+    __table_args__ = (
+        db.Index('idx_email', 'email'),
+        db.Index('idx_updated', 'updated_at'),
+    )
+    
+    # 可通过 ?fields= 选择的输出字段及取值方式（顺序即输出顺序）
+    FIELD_GETTERS = {
+        'id': lambda instructor: instructor.id,
+        'name': lambda instructor: instructor.name,
+        'avatar_url': lambda instructor: instructor.avatar_url,
+        'bio': lambda instructor: instructor.bio,
+        'email': lambda instructor: instructor.email,
+        'created_at': lambda instructor: instructor.created_at.isoformat() if instructor.created_at else None,
+        'updated_at': lambda instructor: instructor.updated_at.isoformat() if instructor.updated_at else None,
+        'stats': lambda instructor: instructor.rating_stats.to_dict() if instructor.rating_stats else None,
+    }
+    # 来自评分聚合关系（而非讲师表自身列）的字段
+    FIELD_RELATIONSHIPS = {'stats': 'rating_stats'}
     
     def __repr__(self):
         return f'<Instructor {self.name}>'
     
-    def to_dict(self, include_courses=False):
-        """转换为字典格式"""
+    def to_dict(self, include_courses=False, fields=None):
+        """转换为字典格式；指定 fields 时只输出（也只读取）这些字段"""
         data = {
-            'id': self.id,
-            'name': self.name,
-            'avatar_url': self.avatar_url,
-            'bio': self.bio,
-            'email': self.email,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            name: getter(self) for name, getter in self.FIELD_GETTERS.items()
+            if fields is None or name in fields
         }
         
         if include_courses:
-            data['courses'] = [course.to_dict() for course in self.courses]
-            data['course_count'] = self.courses.count()
+            # 一次取回课程列表，数量直接取长度，不再额外 count()
+            courses = self.courses.all()
+            data['courses'] = [course.to_dict() for course in courses]
+            data['course_count'] = len(courses)
         
         return data
@@ -0,0 +1,208 @@
+"""
+Per-instructor rating aggregates maintained incrementally from course aggregates
+"""
+
+from app import db
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.models.course import Course
+from app.models.instructor import Instructor
+from app.models.course_rating_stats import CourseRatingStats, RATING_DIMENSIONS, average_expression
+
+
+# 讲师聚合只累加总分与计数，不含直方图
+SUMMED_COLUMNS = ('total_reviews',) + tuple(
+    f'{dimension}_{suffix}' for dimension in RATING_DIMENSIONS for suffix in ('sum', 'count')
+)
+
+
+class InstructorRatingStats(db.Model):
+    """讲师评分聚合（课程数、评价数与各维度总分、计数）"""
+    __tablename__ = 'instructor_rating_stats'
+
+    instructor_id = db.Column(db.Integer,
+                              db.ForeignKey('instructors.id', ondelete='CASCADE', onupdate='CASCADE'),
+                              primary_key=True, comment='讲师ID')
+    course_count = db.Column(db.Integer, nullable=False, default=0, comment='课程数量')
+    total_reviews = db.Column(db.Integer, nullable=False, default=0, comment='总评价数量')
+    average_rating = db.Column(db.DECIMAL(3, 2), nullable=False, default=0.00, comment='平均评分(0.00-5.00)')
+
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, comment='综合评分总和')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, comment='综合评分数量')
+    learning_gain_sum = db.Column(db.Integer, nullable=False, default=0, comment='课程收获评分总和')
+    learning_gain_count = db.Column(db.Integer, nullable=False, default=0, comment='课程收获评分数量')
+    workload_sum = db.Column(db.Integer, nullable=False, default=0, comment='繁忙程度评分总和')
+    workload_count = db.Column(db.Integer, nullable=False, default=0, comment='繁忙程度评分数量')
+    difficulty_sum = db.Column(db.Integer, nullable=False, default=0, comment='课程难度评分总和')
+    difficulty_count = db.Column(db.Integer, nullable=False, default=0, comment='课程难度评分数量')
+
+    updated_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    # 排行榜排序索引（InnoDB 二级索引隐含主键，相同值按讲师ID排序）
+    __table_args__ = (
+        db.Index('idx_average_rating', 'average_rating'),
+        db.Index('idx_total_reviews', 'total_reviews'),
+        db.Index('idx_course_count', 'course_count'),
+    )
+
+    def __repr__(self):
+        return f'<InstructorRatingStats instructor={self.instructor_id} {self.average_rating}/{self.total_reviews}>'
+
+    def average(self, dimension, digits=1):
+        """某维度的平均分，无评分时为0.0"""
+        count = getattr(self, f'{dimension}_count')
+        if not count:
+            return 0.0
+        return round(getattr(self, f'{dimension}_sum') / count, digits)
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return stats_dict({name: getattr(self, name) for name in STATS_DICT_COLUMNS})
+
+
+# stats_dict 需要的列
+STATS_DICT_COLUMNS = ('course_count', 'average_rating') + SUMMED_COLUMNS
+
+
+def stats_dict(values):
+    """由聚合列值（STATS_DICT_COLUMNS）构造 to_dict 输出，列查询的序列化器也使用它"""
+    return {
+        'course_count': values['course_count'] or 0,
+        'total_reviews': values['total_reviews'] or 0,
+        'average_rating': float(values['average_rating']) if values['average_rating'] else 0.0,
+        'averages': {
+            dimension: round(values[f'{dimension}_sum'] / values[f'{dimension}_count'], 2)
+            if values[f'{dimension}_count'] else 0.0
+            for dimension in RATING_DIMENSIONS
+        },
+        'counts': {dimension: values[f'{dimension}_count'] or 0 for dimension in RATING_DIMENSIONS}
+    }
+
+
+# ---------------------------- 增量维护 ----------------------------
+def _instructor_of(connection, course_id):
+    return connection.execute(select(Course.instructor_id).where(Course.id == course_id)).scalar()
+
+
+def apply_instructor_delta(connection, instructor_id, delta):
+    """以一条 UPDATE 对讲师聚合行做增量运算；聚合行缺失时按课程聚合补建
+
+    delta 可包含 course_count 和 SUMMED_COLUMNS 中的列（课程聚合的直方图增量会被忽略）。
+    """
+    delta = {key: value for key, value in delta.items()
+             if value and (key == 'course_count' or key in SUMMED_COLUMNS)}
+    if not delta or instructor_id is None:
+        return
+    table = InstructorRatingStats.__table__
+    rating_sum = table.c.rating_sum + delta.get('rating_sum', 0)
+    rating_count = table.c.rating_count + delta.get('rating_count', 0)
+    # average_rating 放在最前面，保证基于旧值计算（见 apply_review_delta）
+    values = [(table.c.average_rating, average_expression(rating_sum, rating_count))]
+    values += [(table.c[key], table.c[key] + value) for key, value in delta.items()]
+    values.append((table.c.updated_at, datetime.utcnow()))
+    result = connection.execute(
+        update(table).where(table.c.instructor_id == instructor_id).ordered_values(*values)
+    )
+    if result.rowcount == 0:
+        rebuild_instructor_stats(connection, instructor_id)
+
+
+def apply_course_delta(connection, course_id, delta):
+    """课程聚合变化时同步到其讲师（由 apply_review_delta 调用）"""
+    apply_instructor_delta(connection, _instructor_of(connection, course_id), delta)
+
+
+def aggregate_columns():
+    """从课程聚合表汇总出与 InstructorRatingStats 各列同名的表达式"""
+    stats = CourseRatingStats.__table__
+    columns = [func.count(Course.id).label('course_count')]
+    columns += [func.coalesce(func.sum(stats.c[name]), 0).label(name) for name in SUMMED_COLUMNS]
+    columns.append(
+        average_expression(func.sum(stats.c.rating_sum), func.sum(stats.c.rating_count)).label('average_rating')
+    )
+    return columns
+
+
+def aggregate_values(row):
+    """将汇总结果行转换为 InstructorRatingStats 列值（平均分由SQL算好，与增量更新一致）"""
+    values = {key: int(row._mapping[key] or 0) for key in row._mapping.keys()
+              if key not in ('instructor_id', 'average_rating')}
+    values['average_rating'] = row._mapping['average_rating'] or 0
+    return values
+
+
+def rebuild_instructor_stats(connection, instructor_id):
+    """按课程聚合表全量汇总单个讲师并写入聚合行"""
+    stats = CourseRatingStats.__table__
+    row = connection.execute(
+        select(*aggregate_columns())
+        .select_from(Course.__table__.outerjoin(stats, stats.c.course_id == Course.id))
+        .where(Course.instructor_id == instructor_id)
+    ).one()
+    values = aggregate_values(row)
+    table = InstructorRatingStats.__table__
+    connection.execute(table.delete().where(table.c.instructor_id == instructor_id))
+    connection.execute(insert(table).values(instructor_id=instructor_id, updated_at=datetime.utcnow(), **values))
+
+
+def _course_totals(connection, course_id):
+    """课程当前的聚合值（用于课程换讲师时整体迁移）"""
+    table = CourseRatingStats.__table__
+    row = connection.execute(
+        select(*[table.c[name] for name in SUMMED_COLUMNS]).where(table.c.course_id == course_id)
+    ).first()
+    return dict(row._mapping) if row is not None else {}
+
+
+def _mark_touched(target, instructor_id):
+    session = Session.object_session(target)
+    if session is not None and instructor_id is not None:
+        session.info.setdefault('instructor_stats_touched', set()).add(instructor_id)
+
+
+@event.listens_for(Instructor, 'after_insert')
+def _instructor_inserted(mapper, connection, target):
+    """新讲师同时创建空的聚合行"""
+    connection.execute(insert(InstructorRatingStats.__table__).values(
+        instructor_id=target.id, updated_at=datetime.utcnow()
+    ))
+
+
+@event.listens_for(Course, 'after_insert')
+def _course_inserted(mapper, connection, target):
+    apply_instructor_delta(connection, target.instructor_id, {'course_count': 1})
+    _mark_touched(target, target.instructor_id)
+
+
+@event.listens_for(Course, 'after_update')
+def _course_updated(mapper, connection, target):
+    history = inspect(target).attrs.instructor_id.history
+    if not history.deleted or history.deleted[0] == target.instructor_id:
+        return
+    # 课程换讲师：课程数和全部评分从旧讲师迁移到新讲师
+    old_instructor_id = history.deleted[0]
+    totals = _course_totals(connection, target.id)
+    apply_instructor_delta(connection, old_instructor_id,
+                           dict({key: -value for key, value in totals.items()}, course_count=-1))
+    apply_instructor_delta(connection, target.instructor_id, dict(totals, course_count=1))
+    _mark_touched(target, old_instructor_id)
+    _mark_touched(target, target.instructor_id)
+
+
+@event.listens_for(Course, 'after_delete')
+def _course_deleted(mapper, connection, target):
+    # 课程的评价已随ORM级联删除并逐条扣减，这里只需扣减课程数
+    apply_instructor_delta(connection, target.instructor_id, {'course_count': -1})
+    _mark_touched(target, target.instructor_id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_touched_stats(session, flush_context):
+    """聚合行由SQL直接更新，使会话中已加载的聚合对象过期以便重新读取"""
+    for instructor_id in session.info.pop('instructor_stats_touched', ()):
+        stats = session.identity_map.get(identity_key(InstructorRatingStats, instructor_id))
+        if stats is not None:
+            session.expire(stats)
@@ -4,6 +4,15 @@ Review model matching the database schema
 
 from app import db
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import defer, joinedload, query_expression, with_expression
+
+
+def content_snippet(text, length):
+    """截取评论内容片段，返回 (片段, 是否被截断)"""
+    if text is None or len(text) <= length:
+        return text, False
+    return text[:length].rstrip() + '…', True
 
 
 class Review(db.Model):
@@ -22,6 +31,8 @@ class Review(db.Model):
     content = db.Column(db.Text, default=None, comment='评论内容')
     created_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+    # 片段模式下由 SQL 截取的评论内容（见 snippet_options）
+    content_prefix = query_expression()
     
     # 添加检查约束
     __table_args__ = (
@@ -30,31 +41,70 @@ class Review(db.Model):
         db.CheckConstraint('workload >= 1 AND workload <= 5', name='check_workload_range'),
         db.CheckConstraint('difficulty >= 1 AND difficulty <= 5', name='check_difficulty_range'),
         db.UniqueConstraint('user_id', 'course_id', name='unique_user_course'),
-        db.Index('idx_course', 'course_id'),
+        db.Index('idx_course_created', 'course_id', 'created_at'),
+        db.Index('idx_course_rating', 'course_id', 'rating'),
+        db.Index('idx_user_created', 'user_id', 'created_at'),
         db.Index('idx_rating', 'rating'),
         db.Index('idx_learning_gain', 'learning_gain'),
         db.Index('idx_workload', 'workload'),
         db.Index('idx_difficulty', 'difficulty'),
         db.Index('idx_created', 'created_at'),
+        db.Index('idx_updated', 'updated_at'),
     )
     
+    # 可通过 ?fields= 选择的输出字段及取值方式（顺序即输出顺序）
+    FIELD_GETTERS = {
+        'id': lambda review: review.id,
+        'user_id': lambda review: review.user_id,
+        'course_id': lambda review: review.course_id,
+        'rating': lambda review: review.rating,
+        'learning_gain': lambda review: review.learning_gain,
+        'workload': lambda review: review.workload,
+        'difficulty': lambda review: review.difficulty,
+        'content': lambda review: review.content,
+        'created_at': lambda review: review.created_at.isoformat() if review.created_at else None,
+        'updated_at': lambda review: review.updated_at.isoformat() if review.updated_at else None,
+    }
+    
     def __repr__(self):
         return f'<Review {self.user.username if self.user else "Unknown"} -> {self.course.title if self.course else "Unknown"}: {self.rating}/5>'
     
-    def to_dict(self, include_user=False, include_course=False):
-        """转换为字典格式"""
-        data = {
-            'id': self.id,
-            'user_id': self.user_id,
-            'course_id': self.course_id,
-            'rating': self.rating,
-            'learning_gain': self.learning_gain,
-            'workload': self.workload,
-            'difficulty': self.difficulty,
-            'content': self.content,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    @classmethod
+    def eager_options(cls, include_user=False, include_course=False):
+        """与 to_dict 参数对应的预加载选项，列表查询据此避免N+1查询
+
+        关联的用户和课程只加载 to_dict 用到的列。
+        """
+        from app.models.course import Course
+        from app.models.user import User
+        
+        options = []
+        if include_user:
+            options.append(joinedload(cls.user).load_only(User.id, User.username))
+        if include_course:
+            options.append(joinedload(cls.course).load_only(Course.id, Course.title).lazyload(Course.rating_stats))
+        return options
+    
+    @classmethod
+    def snippet_options(cls, length):
+        """片段模式的加载选项：完整内容不再取回，只由 SQL 截取前 length+1 个字符"""
+        return [
+            defer(cls.content),
+            with_expression(cls.content_prefix, func.substr(cls.content, 1, length + 1))
+        ]
+    
+    def to_dict(self, include_user=False, include_course=False, fields=None, snippet=None):
+        """转换为字典格式；指定 fields 时只输出（也只读取）这些字段，指定 snippet 时截取评论内容"""
+        data = {}
+        for name, getter in self.FIELD_GETTERS.items():
+            if fields is not None and name not in fields:
+                continue
+            if name == 'content' and snippet:
+                # 完整内容已加载时直接截取，否则使用 snippet_options 取回的前缀
+                text = self.content if 'content' in self.__dict__ else self.content_prefix
+                data['content'], data['content_truncated'] = content_snippet(text, snippet)
+            else:
+                data[name] = getter(self)
         
         if include_user and self.user:
             data['user'] = {
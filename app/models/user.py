@@ -1,8 +1,7 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from sqlalchemy import func
 from app import db
+from app.services.password_hasher import password_hasher, PasswordHasherBusy
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -17,13 +16,26 @@ class User(UserMixin, db.Model):
     
     # 关系
     reviews = db.relationship('Review', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    # 增量维护的评价统计行（一次主键读取），由评价写入事件更新
+    stats = db.relationship('UserStats', uselist=False, viewonly=True)
     
     # 添加索引
     __table_args__ = (
         db.Index('idx_username', 'username'),
         db.Index('idx_email', 'email'),
+        db.Index('idx_created', 'created_at'),
     )
     
+    # 可通过 ?fields= 选择的输出字段及取值方式（顺序即输出顺序）
+    FIELD_GETTERS = {
+        'id': lambda user: user.id,
+        'username': lambda user: user.username,
+        'email': lambda user: user.email,
+        'ucd_student_id': lambda user: user.ucd_student_id,
+        'created_at': lambda user: user.created_at.isoformat() if user.created_at else None,
+        'updated_at': lambda user: user.updated_at.isoformat() if user.updated_at else None,
+    }
+    
     def __init__(self, username, email, password, ucd_student_id=None):
         self.username = username
         self.email = email
@@ -31,12 +43,20 @@ class User(UserMixin, db.Model):
         self.set_password(password)
     
     def set_password(self, password):
-        """设置密码哈希"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码哈希（在哈希进程池中计算，繁忙时抛出 PasswordHasherBusy）"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """验证密码"""
-        return check_password_hash(self.password_hash, password)
+        """验证密码；哈希参数与当前配置不同时顺带重新哈希（由调用方提交）"""
+        if not password_hasher.check(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            try:
+                self.password_hash = password_hasher.hash(password)
+            except PasswordHasherBusy:
+                # 繁忙时不影响本次登录，下次登录再重新哈希
+                pass
+        return True
     
     def get_id(self):
         """Flask-Login 要求的方法"""
@@ -48,16 +68,11 @@ class User(UserMixin, db.Model):
     
     def get_reviews_count(self):
         """获取用户评价总数"""
-        return self.reviews.count()
+        return self.get_stats()['total_reviews']
     
     def get_average_rating_given(self):
         """获取用户给出的平均评分"""
-        from app.models.review import Review
-        avg_result = db.session.query(func.avg(Review.rating)).filter(
-            Review.user_id == self.id,
-            Review.rating.isnot(None)
-        ).scalar()
-        return round(float(avg_result), 2) if avg_result else 0.0
+        return self.get_stats()['avg_rating']
     
     def get_recent_reviews(self, limit=5):
         """获取用户最近的评价"""
@@ -65,45 +80,15 @@ class User(UserMixin, db.Model):
         return Review.query.filter(Review.user_id == self.id).order_by(Review.created_at.desc()).limit(limit).all()
     
     def get_stats(self):
-        """获取用户统计信息"""
-        from app.models.review import Review
-        
-        # 获取评价统计
-        total_reviews = self.reviews.count()
-        
-        # 获取平均评分
-        avg_rating = db.session.query(func.avg(Review.rating)).filter(
-            Review.user_id == self.id,
-            Review.rating.isnot(None)
-        ).scalar()
-        avg_rating = round(float(avg_rating), 2) if avg_rating else 0.0
-        
-        # 获取各维度平均分
-        avg_learning_gain = db.session.query(func.avg(Review.learning_gain)).filter(
-            Review.user_id == self.id,
-            Review.learning_gain.isnot(None)
-        ).scalar()
-        avg_learning_gain = round(float(avg_learning_gain), 2) if avg_learning_gain else 0.0
-        
-        avg_workload = db.session.query(func.avg(Review.workload)).filter(
-            Review.user_id == self.id,
-            Review.workload.isnot(None)
-        ).scalar()
-        avg_workload = round(float(avg_workload), 2) if avg_workload else 0.0
-        
-        avg_difficulty = db.session.query(func.avg(Review.difficulty)).filter(
-            Review.user_id == self.id,
-            Review.difficulty.isnot(None)
-        ).scalar()
-        avg_difficulty = round(float(avg_difficulty), 2) if avg_difficulty else 0.0
-        
-        return {
-            'total_reviews': total_reviews,
-            'avg_rating': avg_rating,
-            'avg_learning_gain': avg_learning_gain,
-            'avg_workload': avg_workload,
-            'avg_difficulty': avg_difficulty
-        }
+        """获取用户统计信息：读取增量维护的统计行（一次主键读取）
+
+        统计行缺失（如迁移前注册的用户）时按评价表单次聚合计算，由 flask recompute-stats 补建。
+        """
+        stats = self.stats
+        if stats is None:
+            from app.models.user_stats import compute_user_stats
+            stats = compute_user_stats(self.id)
+        return stats.to_dict()
     
     def get_full_name(self):
         """获取用户全名，如果没有名字则返回用户名"""
@@ -120,15 +105,11 @@ class User(UserMixin, db.Model):
         self.updated_at = datetime.utcnow()
         db.session.commit()
     
-    def to_dict(self):
-        """转换为字典"""
+    def to_dict(self, fields=None):
+        """转换为字典；指定 fields 时只输出（也只读取）这些字段"""
         return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'ucd_student_id': self.ucd_student_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            name: getter(self) for name, getter in self.FIELD_GETTERS.items()
+            if fields is None or name in fields
         }
     
     def __repr__(self):
@@ -0,0 +1,64 @@
+"""
+Daily user signup buckets maintained incrementally from user writes
+"""
+
+from app import db
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.models.user import User
+
+
+class UserSignupDaily(db.Model):
+    """按天（UTC）统计的注册用户数"""
+    __tablename__ = 'user_signup_daily'
+
+    day = db.Column(db.Date, primary_key=True, comment='注册日期(UTC)')
+    signups = db.Column(db.Integer, nullable=False, default=0, comment='注册用户数')
+
+    def __repr__(self):
+        return f'<UserSignupDaily {self.day}: {self.signups}>'
+
+
+def apply_signup_delta(connection, day, delta):
+    """对某天的注册数做增量运算，与用户写入处于同一事务
+
+    用单条 upsert 完成"没有则插入、已有则累加"：先 UPDATE 再按 rowcount 补
+    INSERT 时，两个并发的当天首个注册会都走到 INSERT，后者主键冲突。
+    """
+    table = UserSignupDaily.__table__
+    if connection.dialect.name == 'mysql':
+        statement = mysql.insert(table).values(day=day, signups=delta)
+        statement = statement.on_duplicate_key_update(signups=table.c.signups + statement.inserted.signups)
+    else:
+        # 开发环境的 SQLite
+        statement = sqlite.insert(table).values(day=day, signups=delta)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.day], set_={'signups': table.c.signups + statement.excluded.signups}
+        )
+    connection.execute(statement)
+
+
+def signup_totals(days=7):
+    """(用户总数, 最近 days 天含今天的注册数)，只读取每天一行的计数"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    total, recent = db.session.query(
+        func.coalesce(func.sum(UserSignupDaily.signups), 0),
+        func.coalesce(func.sum(db.case((UserSignupDaily.day >= since, UserSignupDaily.signups), else_=0)), 0)
+    ).one()
+    return int(total), int(recent)
+
+
+def _day(target):
+    return (target.created_at or datetime.utcnow()).date()
+
+
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    apply_signup_delta(connection, _day(target), 1)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    apply_signup_delta(connection, _day(target), -1)
@@ -0,0 +1,196 @@
+"""
+Per-user review statistics maintained incrementally from review writes
+"""
+
+from app import db
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.models.review import Review
+from app.models.user import User
+from app.models.course_rating_stats import RATING_DIMENSIONS
+
+
+class UserStats(db.Model):
+    """用户评价统计（评价数与各维度总分、计数）"""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer,
+                        db.ForeignKey('users.id', ondelete='CASCADE', onupdate='CASCADE'),
+                        primary_key=True, comment='用户ID')
+    total_reviews = db.Column(db.Integer, nullable=False, default=0, comment='评价数量')
+
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, comment='综合评分总和')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, comment='综合评分数量')
+    learning_gain_sum = db.Column(db.Integer, nullable=False, default=0, comment='课程收获评分总和')
+    learning_gain_count = db.Column(db.Integer, nullable=False, default=0, comment='课程收获评分数量')
+    workload_sum = db.Column(db.Integer, nullable=False, default=0, comment='繁忙程度评分总和')
+    workload_count = db.Column(db.Integer, nullable=False, default=0, comment='繁忙程度评分数量')
+    difficulty_sum = db.Column(db.Integer, nullable=False, default=0, comment='课程难度评分总和')
+    difficulty_count = db.Column(db.Integer, nullable=False, default=0, comment='课程难度评分数量')
+
+    updated_at = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    # 评价数即活跃度：按索引倒序读取前 K 行就是最活跃用户排行，无需分组聚合
+    __table_args__ = (
+        db.Index('idx_total_reviews_user', 'total_reviews', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f'<UserStats user={self.user_id} reviews={self.total_reviews}>'
+
+    def average(self, dimension, digits=2):
+        """某维度给出的平均分，无评分时为0.0"""
+        count = getattr(self, f'{dimension}_count')
+        if not count:
+            return 0.0
+        return round(getattr(self, f'{dimension}_sum') / count, digits)
+
+    def to_dict(self):
+        """转换为字典格式（与 User.get_stats 一致）"""
+        total_reviews = self.total_reviews or 0
+        return {
+            'total_reviews': total_reviews,
+            # 每位用户对每门课程只能评价一次
+            'courses_reviewed': total_reviews,
+            'avg_rating': self.average('rating'),
+            'avg_learning_gain': self.average('learning_gain'),
+            'avg_workload': self.average('workload'),
+            'avg_difficulty': self.average('difficulty')
+        }
+
+
+def most_active_users(limit=10):
+    """评价最多的前 limit 位用户 [(username, 评价数)]，沿索引读取 limit 行"""
+    return db.session.query(User.username, UserStats.total_reviews)\
+        .join(User, User.id == UserStats.user_id)\
+        .filter(UserStats.total_reviews > 0)\
+        .order_by(UserStats.total_reviews.desc(), UserStats.user_id.desc())\
+        .limit(limit).all()
+
+
+# 与列同名的累加字段
+SUMMED_COLUMNS = ('total_reviews',) + tuple(
+    f'{dimension}_{suffix}' for dimension in RATING_DIMENSIONS for suffix in ('sum', 'count')
+)
+
+
+def aggregate_columns():
+    """从 reviews 表聚合出与 UserStats 各列同名的表达式（不含 user_id）"""
+    columns = [func.count(Review.id).label('total_reviews')]
+    for dimension in RATING_DIMENSIONS:
+        column = getattr(Review, dimension)
+        columns.append(func.coalesce(func.sum(column), 0).label(f'{dimension}_sum'))
+        columns.append(func.count(column).label(f'{dimension}_count'))
+    return columns
+
+
+# ---------------------------- 增量维护 ----------------------------
+def _review_delta(old, new, sign):
+    """评价写入前后的各维度分值对应的列增量；sign 为评价数的变化"""
+    delta = {'total_reviews': sign} if sign else {}
+    for dimension in RATING_DIMENSIONS:
+        before, after = old.get(dimension), new.get(dimension)
+        if before == after:
+            continue
+        delta[f'{dimension}_sum'] = (after or 0) - (before or 0)
+        delta[f'{dimension}_count'] = (after is not None) - (before is not None)
+    return {key: value for key, value in delta.items() if value}
+
+
+def apply_user_delta(connection, user_id, delta):
+    """以一条 UPDATE 对用户统计行做增量运算，与评价写入处于同一事务；统计行缺失时全量补建"""
+    if not delta or user_id is None:
+        return
+    table = UserStats.__table__
+    values = {key: table.c[key] + value for key, value in delta.items()}
+    values['updated_at'] = datetime.utcnow()
+    result = connection.execute(update(table).where(table.c.user_id == user_id).values(**values))
+    if result.rowcount == 0:
+        rebuild_user_stats(connection, user_id)
+
+
+def apply_user_review_inserts(connection, reviews):
+    """批量插入评价后按用户合并增量，每位用户只执行一条 UPDATE"""
+    deltas = {}
+    for values in reviews:
+        delta = deltas.setdefault(values['user_id'], {})
+        for key, value in _review_delta({}, values, 1).items():
+            delta[key] = delta.get(key, 0) + value
+    for user_id, delta in deltas.items():
+        apply_user_delta(connection, user_id, delta)
+    return set(deltas)
+
+
+def compute_user_stats(user_id):
+    """单次聚合计算用户统计，返回不加入会话的 UserStats 对象"""
+    row = db.session.execute(select(*aggregate_columns()).where(Review.user_id == user_id)).one()
+    return UserStats(user_id=user_id, **{key: int(value or 0) for key, value in row._mapping.items()})
+
+
+def rebuild_user_stats(connection, user_id):
+    """全量聚合单个用户的评价并写入统计行"""
+    row = connection.execute(select(*aggregate_columns()).where(Review.user_id == user_id)).one()
+    values = {key: int(value or 0) for key, value in row._mapping.items()}
+    table = UserStats.__table__
+    connection.execute(table.delete().where(table.c.user_id == user_id))
+    connection.execute(insert(table).values(user_id=user_id, updated_at=datetime.utcnow(), **values))
+
+
+def _values(target, previous=False):
+    state = inspect(target)
+    values = {}
+    for dimension in RATING_DIMENSIONS:
+        history = state.attrs[dimension].history
+        values[dimension] = history.deleted[0] if previous and history.deleted else getattr(target, dimension)
+    return values
+
+
+def _mark_touched(target, user_id):
+    session = Session.object_session(target)
+    if session is not None and user_id is not None:
+        session.info.setdefault('user_stats_touched', set()).add(user_id)
+
+
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    """新用户同时创建空的统计行"""
+    connection.execute(insert(UserStats.__table__).values(user_id=target.id, updated_at=datetime.utcnow()))
+
+
+@event.listens_for(Review, 'after_insert')
+def _review_inserted(mapper, connection, target):
+    apply_user_delta(connection, target.user_id, _review_delta({}, _values(target), 1))
+    _mark_touched(target, target.user_id)
+
+
+@event.listens_for(Review, 'after_update')
+def _review_updated(mapper, connection, target):
+    history = inspect(target).attrs.user_id.history
+    if history.deleted and history.deleted[0] != target.user_id:
+        # 评价被转给另一位用户：从旧用户减去，再加到新用户
+        old_user_id = history.deleted[0]
+        apply_user_delta(connection, old_user_id, _review_delta(_values(target, previous=True), {}, -1))
+        apply_user_delta(connection, target.user_id, _review_delta({}, _values(target), 1))
+        _mark_touched(target, old_user_id)
+    else:
+        apply_user_delta(connection, target.user_id,
+                         _review_delta(_values(target, previous=True), _values(target), 0))
+    _mark_touched(target, target.user_id)
+
+
+@event.listens_for(Review, 'after_delete')
+def _review_deleted(mapper, connection, target):
+    apply_user_delta(connection, target.user_id, _review_delta(_values(target, previous=True), {}, -1))
+    _mark_touched(target, target.user_id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_touched_stats(session, flush_context):
+    """统计行由SQL直接更新，使会话中已加载的统计对象过期以便重新读取"""
+    for user_id in session.info.pop('user_stats_touched', ()):
+        stats = session.identity_map.get(identity_key(UserStats, user_id))
+        if stats is not None:
+            session.expire(stats)
@@ -0,0 +1,248 @@
+"""
+Versioned response cache for read-heavy API endpoints
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+class CacheBackend:
+    """缓存后端接口
+
+    除键值读写外，后端还负责保存各实体的版本号；自定义后端（如多进程共享的
+    存储）只需实现这些方法即可替换默认的进程内LRU。
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_version(self, entity):
+        raise NotImplementedError
+
+    def bump_version(self, entity):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class LRUCache(CacheBackend):
+    """进程内LRU缓存，条目带过期时间"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_version(self, entity):
+        return self._versions.get(entity, 0)
+
+    def bump_version(self, entity):
+        with self._lock:
+            self._versions[entity] = self._versions.get(entity, 0) + 1
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'versions': dict(self._versions)
+        }
+
+
+class ResponseCache:
+    """API响应缓存
+
+    缓存键 = 路由 + 路径参数 + 查询参数 + 所依赖实体的版本号。课程、讲师或评价
+    写入时版本号递增，旧条目不再被命中，随LRU淘汰或过期自然清除。
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.ttl = 300
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('API_CACHE_ENABLED', True)
+        self.ttl = app.config.get('API_CACHE_TTL', self.ttl)
+        if self.backend is None:
+            self.backend = app.config.get('API_CACHE_BACKEND') or \
+                LRUCache(app.config.get('API_CACHE_MAX_ENTRIES', 1024))
+        track_session_writes('response_cache_touched', _touched_entities, self.bump)
+
+    def make_key(self, entities):
+        args = sorted(request.args.items(multi=True))
+        versions = [(entity, self.backend.get_version(entity)) for entity in entities]
+        return (request.endpoint, tuple(sorted((request.view_args or {}).items())),
+                tuple(args), tuple(versions))
+
+    def bump(self, *entities):
+        if self.backend is None:
+            return
+        for entity in entities:
+            self.backend.bump_version(entity)
+
+    def cached(self, *entities):
+        """缓存GET接口的200响应，entities 为响应所依赖的实体名"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                key = self.make_key(entities)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    body, status, mimetype = entry
+                    response = current_app.response_class(body, status=status, mimetype=mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    self.backend.set(key, (response.get_data(), response.status_code, response.mimetype), self.ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        data = {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.backend is not None:
+            data.update(self.backend.stats())
+        return data
+
+
+response_cache = ResponseCache()
+
+
+# 各 worker 进程内缓存的最长存活时间（配置项, 默认值）
+WORKER_CACHE_LIFETIMES = (
+    ('API_CACHE_TTL', 300),
+    ('SEARCH_INDEX_MAX_AGE', 300),
+    ('REVIEWED_CACHE_TTL', 60),
+    ('TRENDING_REBUILD_INTERVAL', 300),
+    ('USER_DIRECTORY_REBUILD_INTERVAL', 600),
+    ('USER_CACHE_TTL', 60),
+)
+
+
+def worker_cache_notice(config):
+    """命令行写库后的提示文字
+
+    缓存版本号、搜索索引等都保存在各进程内存中，命令行进程里的失效操作对正在运行
+    的 gunicorn worker 不可见；worker 只能等各缓存按TTL或重建间隔过期，或重启。
+    """
+    seconds = max(config.get(name, default) or 0 for name, default in WORKER_CACHE_LIFETIMES)
+    return (f"注意：运行中的 worker 进程内缓存不受本命令影响，最长 {seconds} 秒后才会读到新数据；"
+            f"需要立即生效请重启应用（systemctl restart se-knowledgebase）")
+
+
+# ---------------------------- 会话事件 ----------------------------
+# 已注册的会话事件：{session.info 键名: 监听函数}
+_session_trackers = {}
+
+
+def track_session_writes(key, collect, invalidate):
+    """为进程内缓存注册会话事件：flush时立即失效，并记下涉及的键，提交后再失效一次
+
+    collect(session) 返回本次flush涉及的键集合，invalidate(*keys) 使其失效；
+    第二次失效用于淘汰在flush与commit之间由其他请求按旧数据写入的缓存。回滚时
+    丢弃记下的键。key 为 session.info 中的键名，同一 key 只注册一次。
+    """
+    def collect_writes(session, flush_context):
+        touched = collect(session)
+        if touched:
+            invalidate(*touched)
+            session.info.setdefault(key, set()).update(touched)
+
+    def invalidate_committed(session):
+        touched = session.info.pop(key, None)
+        if touched:
+            invalidate(*touched)
+
+    def discard_writes(session, previous_transaction):
+        session.info.pop(key, None)
+
+    if key in _session_trackers:
+        return
+    _session_trackers[key] = (collect_writes, invalidate_committed, discard_writes)
+    event.listen(Session, 'after_flush', collect_writes)
+    event.listen(Session, 'after_commit', invalidate_committed)
+    event.listen(Session, 'after_soft_rollback', discard_writes)
+
+
+def _touched_entities(session):
+    from app.models.course import Course
+    from app.models.instructor import Instructor
+    from app.models.review import Review
+    from app.models.user import User
+
+    names = {Course: 'course', Instructor: 'instructor', Review: 'review', User: 'user'}
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        name = names.get(type(obj))
+        if not name:
+            continue
+        # 用户登录会更新 updated_at，只有用户名变化才影响缓存的响应
+        if name == 'user' and obj in session.dirty and \
+                not inspect(obj).attrs.username.history.has_changes():
+            continue
+        touched.add(name)
+    return touched
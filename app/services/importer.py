@@ -0,0 +1,370 @@
+"""
+Streaming bulk import of instructors, courses, users and reviews
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.api.users import validate_email
+from app.models.course import Course
+from app.models.entity_version import bump_entity_versions, version_key
+from app.models.instructor import Instructor
+from app.models.review import Review
+from app.models.user import User
+from app.services.password_hasher import password_hasher
+
+
+STAGES = ('S1', 'S2', 'S3', 'S4')
+RATING_FIELDS = ('rating', 'learning_gain', 'workload', 'difficulty')
+MAX_ERRORS_REPORTED = 20
+
+
+class RecordError(ValueError):
+    """单条记录校验失败，该行被跳过"""
+
+
+def iter_records(path):
+    """按扩展名流式读取 JSONL 或 CSV 文件，逐行产出 (行号, 记录)
+
+    无法解析的 JSONL 行产出 RecordError 而不是中断整个导入。
+    """
+    with io.open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, {key: (value if value != '' else None) for key, value in row.items()}
+        else:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, RecordError('JSON格式不正确')
+
+
+def _int(value, field):
+    if value is None:
+        return None
+    # JSON 中的 true 和 4.5 也能被 int() 转换，与API一致地拒绝
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise RecordError(f'{field} 必须是整数')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RecordError(f'{field} 必须是整数')
+
+
+def _text(value):
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def _timestamp(value):
+    if not value:
+        return datetime.utcnow()
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise RecordError('时间格式不正确，应为ISO格式')
+
+
+class ImportReport:
+    """导入结果统计"""
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.inserted = 0
+        self.skipped = 0
+        self.errors = []
+
+    def error(self, path, line_no, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS_REPORTED:
+            self.errors.append(f'{path}:{line_no}: {message}')
+
+
+class BulkImporter:
+    """按 讲师 → 课程 → 用户 → 评价 的顺序导入
+
+    源文件中的 id 仅用于互相引用：讲师、课程、用户的新ID在导入前按当前最大ID
+    预先分配，源ID到新ID的映射保存在内存中；引用的ID不在映射里时视为数据库
+    中已存在的记录。导入期间应避免其他进程写入这些表。
+    """
+
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.id_maps = {'instructor': {}, 'course': {}, 'user': {}}
+        self.known_ids = {}
+        self.next_ids = {}
+        self.touched_courses = False
+
+    # ---------------------------- 通用 ----------------------------
+    def _load_ids(self, name, model):
+        self.known_ids[name] = set(db.session.execute(select(model.id)).scalars())
+        self.next_ids[name] = (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+    def _allocate(self, name, source_id):
+        new_id = self.next_ids[name]
+        self.next_ids[name] += 1
+        self.known_ids[name].add(new_id)
+        if source_id is not None:
+            self.id_maps[name][str(source_id)] = new_id
+        return new_id
+
+    def _resolve(self, name, source_id, label):
+        if source_id is None:
+            raise RecordError(f'{label} 不能为空')
+        mapped = self.id_maps[name].get(str(source_id))
+        if mapped is not None:
+            return mapped
+        try:
+            existing = int(source_id)
+        except (TypeError, ValueError):
+            existing = None
+        if existing not in self.known_ids[name]:
+            raise RecordError(f'{label} {source_id} 不存在')
+        return existing
+
+    def _flush(self, table, rows):
+        if rows:
+            db.session.execute(insert(table), rows)
+            rows.clear()
+
+    def _stream(self, path, report, build_row, table, before_flush=None):
+        """逐行校验并按块批量插入，整个文件一个事务"""
+        chunk = []
+        for line_no, record in iter_records(path):
+            try:
+                if isinstance(record, RecordError):
+                    raise record
+                row = build_row(record)
+            except RecordError as e:
+                report.error(path, line_no, str(e))
+                continue
+            chunk.append((line_no, row))
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(path, report, table, chunk, before_flush)
+        self._write_chunk(path, report, table, chunk, before_flush)
+        key = version_key(table.name)
+        if report.inserted and key:
+            # 批量 INSERT 不经过flush事件，条件请求的增删计数在同一事务中递增
+            bump_entity_versions(db.session.connection(), key)
+        db.session.commit()
+        return report
+
+    def _write_chunk(self, path, report, table, chunk, before_flush):
+        if before_flush is not None:
+            chunk[:] = before_flush(path, report, chunk)
+        rows = [row for _, row in chunk]
+        report.inserted += len(rows)
+        self._flush(table, rows)
+        chunk.clear()
+
+    # ---------------------------- 讲师 ----------------------------
+    def import_instructors(self, path):
+        self._load_ids('instructor', Instructor)
+        now = datetime.utcnow()
+
+        def build(record):
+            name = _text(record.get('name'))
+            if not name:
+                raise RecordError('讲师姓名不能为空')
+            return {
+                'id': self._allocate('instructor', record.get('id')),
+                'name': name,
+                'avatar_url': _text(record.get('avatar_url')),
+                'bio': _text(record.get('bio')),
+                'email': _text(record.get('email')),
+                'created_at': _timestamp(record.get('created_at')),
+                'updated_at': now
+            }
+
+        return self._stream(path, ImportReport('instructors'), build, Instructor.__table__)
+
+    # ---------------------------- 课程 ----------------------------
+    def import_courses(self, path):
+        if 'instructor' not in self.known_ids:
+            self._load_ids('instructor', Instructor)
+        self._load_ids('course', Course)
+        self.touched_courses = True
+        now = datetime.utcnow()
+
+        def build(record):
+            title = _text(record.get('title'))
+            if not title:
+                raise RecordError('title 不能为空')
+            stage = _text(record.get('stage'))
+            if stage not in STAGES:
+                raise RecordError('stage必须是S1、S2、S3或S4之一')
+            instructor_id = self._resolve('instructor', record.get('instructor_id'), 'instructor_id')
+            cover_images = record.get('cover_images')
+            if isinstance(cover_images, str):
+                try:
+                    cover_images = json.loads(cover_images)
+                except ValueError:
+                    raise RecordError('cover_images 必须是JSON数组')
+            return {
+                'id': self._allocate('course', record.get('id')),
+                'title': title,
+                'description': _text(record.get('description')),
+                'cover_images': cover_images,
+                'stage': stage,
+                'instructor_id': instructor_id,
+                'average_rating': 0,
+                'total_reviews': 0,
+                'created_at': _timestamp(record.get('created_at')),
+                'updated_at': now
+            }
+
+        return self._stream(path, ImportReport('courses'), build, Course.__table__)
+
+    # ---------------------------- 用户 ----------------------------
+    def import_users(self, path):
+        self._load_ids('user', User)
+        seen_usernames, seen_emails, seen_student_ids = set(), set(), set()
+        now = datetime.utcnow()
+
+        def build(record):
+            username = _text(record.get('username'))
+            email = (_text(record.get('email')) or '').lower()
+            if not username or len(username) < 3 or len(username) > 50:
+                raise RecordError('用户名长度必须在3-50个字符之间')
+            if not validate_email(email):
+                raise RecordError('邮箱格式不正确')
+            if username in seen_usernames:
+                raise RecordError('用户名已存在')
+            if email in seen_emails:
+                raise RecordError('邮箱已存在')
+            ucd_student_id = _text(record.get('ucd_student_id'))
+            if ucd_student_id and ucd_student_id in seen_student_ids:
+                raise RecordError('UCD 学号已存在')
+            password_hash = _text(record.get('password_hash'))
+            if not password_hash:
+                if not record.get('password'):
+                    raise RecordError('password 或 password_hash 不能为空')
+                password_hash = generate_password_hash(record['password'], password_hasher.method)
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            if ucd_student_id:
+                seen_student_ids.add(ucd_student_id)
+            return {
+                'source_id': record.get('id'),
+                'username': username,
+                'email': email,
+                'ucd_student_id': ucd_student_id,
+                'password_hash': password_hash,
+                'created_at': _timestamp(record.get('created_at')),
+                'updated_at': now
+            }
+
+        def drop_existing(path, report, chunk):
+            # 每块一次 IN 查询排除数据库中已存在的用户名/邮箱/学号（均有唯一约束，
+            # 任一冲突都会让整个文件的事务失败）
+            usernames = [row['username'] for _, row in chunk]
+            emails = [row['email'] for _, row in chunk]
+            student_ids = [row['ucd_student_id'] for _, row in chunk if row['ucd_student_id']]
+            taken = set(db.session.execute(
+                select(User.username).where(User.username.in_(usernames))
+            ).scalars())
+            taken_emails = set(db.session.execute(
+                select(User.email).where(User.email.in_(emails))
+            ).scalars())
+            taken_student_ids = set(db.session.execute(
+                select(User.ucd_student_id).where(User.ucd_student_id.in_(student_ids))
+            ).scalars()) if student_ids else set()
+            kept = []
+            for line_no, row in chunk:
+                if row['username'] in taken:
+                    report.error(path, line_no, '用户名已存在')
+                elif row['email'] in taken_emails:
+                    report.error(path, line_no, '邮箱已存在')
+                elif row['ucd_student_id'] in taken_student_ids:
+                    report.error(path, line_no, 'UCD 学号已存在')
+                else:
+                    row['id'] = self._allocate('user', row.pop('source_id'))
+                    kept.append((line_no, row))
+            return kept
+
+        return self._stream(path, ImportReport('users'), build, User.__table__, drop_existing)
+
+    # ---------------------------- 评价 ----------------------------
+    def import_reviews(self, path):
+        for name, model in (('course', Course), ('user', User)):
+            if name not in self.known_ids:
+                self._load_ids(name, model)
+        self.touched_courses = True
+        seen_pairs = set()
+        now = datetime.utcnow()
+
+        def build(record):
+            course_id = self._resolve('course', record.get('course_id'), 'course_id')
+            user_id = self._resolve('user', record.get('user_id'), 'user_id')
+            pair = (user_id << 32) | course_id
+            if pair in seen_pairs:
+                raise RecordError('该用户已经对此课程评价过了')
+            row = {'course_id': course_id, 'user_id': user_id}
+            for field in RATING_FIELDS:
+                value = _int(record.get(field), field)
+                if value is not None and (value < 1 or value > 5):
+                    raise RecordError(f'{field}必须是1-5之间的整数')
+                row[field] = value
+            seen_pairs.add(pair)
+            row.update({
+                'content': _text(record.get('content')),
+                'created_at': _timestamp(record.get('created_at')),
+                'updated_at': now
+            })
+            return row
+
+        def drop_existing(path, report, chunk):
+            # 每块一次 IN 查询对照 unique_user_course
+            user_ids = {row['user_id'] for _, row in chunk}
+            existing = {
+                (user_id << 32) | course_id
+                for user_id, course_id in db.session.execute(
+                    select(Review.user_id, Review.course_id).where(Review.user_id.in_(user_ids))
+                )
+            }
+            kept = []
+            for line_no, row in chunk:
+                if (row['user_id'] << 32) | row['course_id'] in existing:
+                    report.error(path, line_no, '该用户已经对此课程评价过了')
+                else:
+                    kept.append((line_no, row))
+            return kept
+
+        return self._stream(path, ImportReport('reviews'), build, Review.__table__, drop_existing)
+
+    def finish(self):
+        """导入结束后一次性重算课程、讲师和用户聚合，并让各进程内缓存和搜索索引失效
+
+        批量 INSERT 不经过ORM的flush事件，逐行维护的聚合与索引都需要在此补上。
+        这里的失效只作用于当前（命令行）进程，运行中的 worker 见 worker_cache_notice。
+        """
+        from app.services.cache import response_cache
+        from app.services.rating_stats import (
+            recompute_course_stats, recompute_instructor_stats, recompute_user_stats, recompute_signup_daily
+        )
+        from app.services.reviewed_courses import reviewed_courses
+        from app.services.search import course_search
+        from app.services.trending import trending_courses
+        from app.services.user_directory import user_directory
+
+        report = recompute_course_stats() if self.touched_courses else None
+        recompute_instructor_stats()
+        recompute_user_stats()
+        recompute_signup_daily()
+        response_cache.bump('instructor', 'course', 'review', 'user')
+        course_search.rebuild()
+        reviewed_courses.clear()
+        trending_courses.invalidate()
+        user_directory.invalidate()
+        return report
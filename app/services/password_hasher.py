@@ -0,0 +1,231 @@
+"""
+Password hashing and verification with host-wide admission control
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：只在进程内限流
+    fcntl = None
+
+
+class PasswordHasherBusy(Exception):
+    """哈希名额已满或等待超时，请求应立即失败（503）而不是占住请求进程"""
+
+
+class SlotLock:
+    """跨进程的计数信号量：count 个名额各对应一个锁文件，用 flock 占用
+
+    同一主机上的所有 gunicorn worker 共享同一目录下的锁文件，因此名额是全局的；
+    进程退出时内核自动释放其持有的锁。flock 属于打开的文件描述，fork 后需重新
+    打开；同一进程内的多个线程另用线程锁互斥。
+    """
+
+    def __init__(self, directory, name, count):
+        self.directory = directory
+        self.name = name
+        self.count = count
+        self._locals = [threading.Lock() for _ in range(count)]
+        self._files = None
+        self._pid = None
+        self._open_lock = threading.Lock()
+
+    def _handles(self):
+        with self._open_lock:
+            if self._files is None or self._pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                self._files = [
+                    open(os.path.join(self.directory, f'{self.name}-{index}.lock'), 'a+b')
+                    for index in range(self.count)
+                ] if fcntl else []
+                self._pid = os.getpid()
+            return self._files
+
+    def try_acquire(self):
+        """尝试占用任一名额，成功返回名额编号，全部被占用时返回 None"""
+        files = self._handles()
+        for index, local in enumerate(self._locals):
+            if not local.acquire(blocking=False):
+                continue
+            if not files:
+                return index
+            try:
+                fcntl.flock(files[index], fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return index
+            except BlockingIOError:
+                local.release()
+        return None
+
+    def acquire(self, timeout, interval=0.01):
+        """在 timeout 秒内轮询占用名额，超时返回 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            index = self.try_acquire()
+            if index is not None or time.monotonic() >= deadline:
+                return index
+            time.sleep(interval)
+
+    def release(self, index):
+        files = self._handles()
+        if files:
+            fcntl.flock(files[index], fcntl.LOCK_UN)
+        self._locals[index].release()
+
+
+class PasswordHasher:
+    """密码哈希与校验的准入控制
+
+    PBKDF2 是纯CPU计算。部署使用 2 个 sync worker，每个 worker 同时只处理一个
+    请求，把计算交给子进程也不能让等待中的 worker 去处理其他页面；真正要限制的
+    是同一时刻有多少个 worker 在做哈希。因此准入在整台主机范围内控制：
+
+    - concurrency：同时进行哈希的请求数（跨所有 worker，默认 1，保证总有
+      worker 可以服务其他页面）；
+    - queue_limit：名额被占满时允许等待的请求数，等待最多 timeout 秒，超出
+      排队名额的请求立即抛出 PasswordHasherBusy。sync worker 下等待同样占住
+      worker，默认 0，即不排队、直接失败。
+
+    workers > 0 时哈希在每个请求进程各自的进程池中执行，只适合 gthread/gevent
+    等一个进程同时处理多个请求的 worker；sync worker 下应保持 0（在请求进程内计算）。
+
+    method 为 Werkzeug 的哈希方法（如 pbkdf2:sha256:600000），存储的哈希参数与
+    之不同时由 User.check_password 在登录成功后重新哈希。
+    """
+
+    def __init__(self, concurrency=1, queue_limit=0, timeout=10.0, workers=0,
+                 method='pbkdf2:sha256:600000', lock_dir=None):
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.workers = workers
+        self.method = method
+        self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), 'bdic-se-password-hash')
+        self._executor = None
+        self._pid = None
+        self._prefix = None
+        self._lock = threading.Lock()
+        self._timings = {'hash': deque(maxlen=1000), 'check': deque(maxlen=1000)}
+        self.rejected = 0
+        self.timeouts = 0
+        self._build_slots()
+
+    def _build_slots(self):
+        self._slots = SlotLock(self.lock_dir, 'slot', self.concurrency)
+        # 排队名额 = 哈希名额 + 允许等待的数量
+        self._admission = SlotLock(self.lock_dir, 'admission', self.concurrency + self.queue_limit)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.concurrency = app.config.get('PASSWORD_HASH_CONCURRENCY', self.concurrency)
+        self.queue_limit = app.config.get('PASSWORD_HASH_QUEUE_LIMIT', self.queue_limit)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.lock_dir = app.config.get('PASSWORD_HASH_LOCK_DIR') or self.lock_dir
+        self._prefix = None
+        self._build_slots()
+
+    # ---------------------------- 进程池 ----------------------------
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # fork 出的子进程不能沿用父进程的进程池
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _execute(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        future = self._pool().submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self.timeouts += 1
+            raise PasswordHasherBusy('登录和注册请求较多，请稍后重试')
+        except BrokenProcessPool:
+            # 子进程异常退出：丢弃进程池，下次使用时重新创建
+            with self._lock:
+                self._executor = None
+            raise
+
+    def _run(self, operation, func, *args):
+        started = time.perf_counter()
+        ticket = self._admission.try_acquire()
+        if ticket is None:
+            self.rejected += 1
+            raise PasswordHasherBusy('登录和注册请求较多，请稍后重试')
+        try:
+            slot = self._slots.acquire(self.timeout)
+            if slot is None:
+                self.timeouts += 1
+                raise PasswordHasherBusy('登录和注册请求较多，请稍后重试')
+            try:
+                result = self._execute(func, *args)
+            finally:
+                self._slots.release(slot)
+        finally:
+            self._admission.release(ticket)
+        # 包含排队等待的时间，即请求实际花在哈希上的时间
+        self._timings[operation].append(time.perf_counter() - started)
+        return result
+
+    # ---------------------------- 哈希 ----------------------------
+    def hash(self, password):
+        """按当前配置的方法生成密码哈希"""
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        """校验密码"""
+        return self._run('check', check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """存储的哈希参数（$ 之前的部分）是否与当前配置不同"""
+        if self._prefix is None:
+            # 用一次计算得到配置对应的完整参数串（如 pbkdf2 会补上默认迭代次数）
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    # ---------------------------- 统计 ----------------------------
+    def stats(self):
+        data = {
+            'concurrency': self.concurrency,
+            'queue_limit': self.queue_limit,
+            'workers': self.workers,
+            'method': self.method,
+            'shared_slots': fcntl is not None,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
+        for operation, timings in self._timings.items():
+            samples = sorted(timings)
+            if not samples:
+                data[operation] = {'count': 0}
+                continue
+            data[operation] = {
+                'count': len(samples),
+                'avg_ms': round(sum(samples) / len(samples) * 1000, 2),
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 2),
+                'p95_ms': round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 2),
+                'max_ms': round(samples[-1] * 1000, 2)
+            }
+        return data
+
+
+password_hasher = PasswordHasher()
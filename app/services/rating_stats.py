@@ -0,0 +1,292 @@
+"""
+Batch reconciliation of course, instructor and user aggregates
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select, update, insert
+
+from app import db
+from app.models.course import Course
+from app.models.review import Review
+from app.models.course_rating_stats import (
+    CourseRatingStats, RATING_DIMENSIONS, aggregate_columns, aggregate_values, average_expression
+)
+from app.models.instructor import Instructor
+from app.models.instructor_rating_stats import InstructorRatingStats, SUMMED_COLUMNS
+from app.models.user import User
+from app.models.user_stats import UserStats, aggregate_columns as user_aggregate_columns
+from app.models.user_signup_daily import UserSignupDaily
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _as_decimal(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def recompute_course_stats(dry_run=False, batch_size=500):
+    """用一次 GROUP BY course_id 重新计算所有课程的评分聚合，并修复偏差
+
+    只写入与存储值不一致的行（分批 executemany），返回偏差报告。平均分与增量
+    更新使用同一个SQL表达式计算，比对和写入不会因舍入方式不同产生假偏差。
+    dry_run 时只做比对不写入，共三条只读查询。
+
+    写入时先用 SELECT ... FOR UPDATE 锁住聚合行和课程行再做分组聚合：正在写评价
+    的事务要么已提交（聚合能看到其评价），要么在更新聚合行时等待本事务提交后
+    再叠加增量，不会被本次的绝对值覆盖。因此应在新事务中调用（可重复读隔离级别
+    下，事务中的第一次普通读取决定快照）。
+    """
+    stats_table = CourseRatingStats.__table__
+    columns = [c.name for c in stats_table.columns if c.name not in ('course_id', 'updated_at')]
+
+    # 1. 读取（并锁定）已存储的聚合行和课程表冗余列
+    stats_query = select(stats_table)
+    courses_query = select(Course.id, Course.average_rating, Course.total_reviews)
+    if not dry_run:
+        stats_query = stats_query.with_for_update()
+        courses_query = courses_query.with_for_update()
+    stored_stats = {
+        row.course_id: row._mapping
+        for row in db.session.execute(stats_query)
+    }
+    stored_courses = db.session.execute(courses_query).all()
+
+    # 2. 单次分组聚合
+    expected = {
+        row.course_id: aggregate_values(row)
+        for row in db.session.execute(
+            select(Review.course_id, *aggregate_columns()).group_by(Review.course_id)
+        )
+    }
+
+    empty = {name: 0 for name in columns}
+    stats_updates, stats_inserts, course_updates = [], [], []
+    review_count_drift = 0
+    max_rating_drift = Decimal('0')
+
+    for course_id, average_rating, total_reviews in stored_courses:
+        values = expected.get(course_id, empty)
+        target_average = _as_decimal(values['average_rating'])
+
+        stored = stored_stats.get(course_id)
+        if stored is None:
+            stats_inserts.append(dict(values, course_id=course_id, average_rating=target_average))
+        elif any(
+            (_as_decimal(stored[name]) != target_average) if name == 'average_rating'
+            else (stored[name] != values[name])
+            for name in columns
+        ):
+            stats_updates.append(dict(values, course_id=course_id, average_rating=target_average))
+
+        if _as_decimal(average_rating) != target_average or (total_reviews or 0) != values['total_reviews']:
+            course_updates.append({
+                'id': course_id,
+                'average_rating': target_average,
+                'total_reviews': values['total_reviews']
+            })
+            review_count_drift += abs((total_reviews or 0) - values['total_reviews'])
+            max_rating_drift = max(max_rating_drift, abs(_as_decimal(average_rating) - target_average))
+
+    report = {
+        'courses_checked': len(stored_courses),
+        'stats_rows_missing': len(stats_inserts),
+        'stats_rows_drifted': len(stats_updates),
+        'course_rows_drifted': len(course_updates),
+        'review_count_drift': review_count_drift,
+        'max_rating_drift': float(max_rating_drift),
+        'dry_run': dry_run
+    }
+    if dry_run:
+        return report
+    if not (stats_inserts or stats_updates or course_updates):
+        # 没有需要修复的行，结束事务以释放行锁
+        db.session.commit()
+        return report
+
+    # 3. 只写入有偏差的行，分批提交
+    now = datetime.utcnow()
+    for batch in _chunks(stats_inserts, batch_size):
+        db.session.execute(insert(stats_table), [dict(row, updated_at=now) for row in batch])
+    for batch in _chunks(stats_updates, batch_size):
+        db.session.execute(update(CourseRatingStats), [dict(row, updated_at=now) for row in batch])
+    for batch in _chunks(course_updates, batch_size):
+        db.session.execute(update(Course), [dict(row, updated_at=now) for row in batch])
+    db.session.commit()
+
+    # 批量语句不经过flush事件，需手动让响应缓存失效
+    from app.services.cache import response_cache
+    response_cache.bump('course', 'review')
+    return report
+
+
+def recompute_instructor_stats(dry_run=False, batch_size=500):
+    """从课程表和评价表重新计算所有讲师的评分聚合，并修复偏差
+
+    不依赖课程聚合表，课程聚合本身有偏差时结果仍然正确。平均分与增量更新使用
+    同一个SQL表达式；写入时同样先锁定聚合行（见 recompute_course_stats）。
+    """
+    stats_table = InstructorRatingStats.__table__
+    columns = ('course_count', 'average_rating') + SUMMED_COLUMNS
+
+    # 1. 读取（并锁定）已存储的聚合行
+    stats_query = select(stats_table)
+    if not dry_run:
+        stats_query = stats_query.with_for_update()
+    stored_stats = {
+        row.instructor_id: row._mapping
+        for row in db.session.execute(stats_query)
+    }
+
+    # 2. 每位讲师的课程数，以及评价按讲师分组的各维度总分和计数
+    course_counts = dict(db.session.execute(
+        select(Course.instructor_id, func.count(Course.id)).group_by(Course.instructor_id)
+    ).all())
+    review_columns = [func.count(Review.id).label('total_reviews')]
+    for dimension in RATING_DIMENSIONS:
+        column = getattr(Review, dimension)
+        review_columns.append(func.coalesce(func.sum(column), 0).label(f'{dimension}_sum'))
+        review_columns.append(func.count(column).label(f'{dimension}_count'))
+    review_columns.append(
+        average_expression(func.sum(Review.rating), func.count(Review.rating)).label('average_rating')
+    )
+    review_totals = {
+        row.instructor_id: row._mapping
+        for row in db.session.execute(
+            select(Course.instructor_id, *review_columns)
+            .join(Course, Course.id == Review.course_id)
+            .group_by(Course.instructor_id)
+        )
+    }
+
+    instructor_ids = db.session.execute(select(Instructor.id)).scalars().all()
+
+    stats_updates, stats_inserts = [], []
+    for instructor_id in instructor_ids:
+        totals = review_totals.get(instructor_id, {})
+        values = {name: int(totals.get(name) or 0) for name in SUMMED_COLUMNS}
+        values['course_count'] = course_counts.get(instructor_id, 0)
+        values['average_rating'] = _as_decimal(totals.get('average_rating'))
+
+        stored = stored_stats.get(instructor_id)
+        if stored is None:
+            stats_inserts.append(dict(values, instructor_id=instructor_id))
+        elif any(
+            (_as_decimal(stored[name]) != values[name]) if name == 'average_rating'
+            else (stored[name] != values[name])
+            for name in columns
+        ):
+            stats_updates.append(dict(values, instructor_id=instructor_id))
+
+    report = {
+        'instructors_checked': len(instructor_ids),
+        'stats_rows_missing': len(stats_inserts),
+        'stats_rows_drifted': len(stats_updates),
+        'dry_run': dry_run
+    }
+    if dry_run:
+        return report
+    if not (stats_inserts or stats_updates):
+        db.session.commit()
+        return report
+
+    # 3. 只写入有偏差的行
+    now = datetime.utcnow()
+    for batch in _chunks(stats_inserts, batch_size):
+        db.session.execute(insert(stats_table), [dict(row, updated_at=now) for row in batch])
+    for batch in _chunks(stats_updates, batch_size):
+        db.session.execute(update(InstructorRatingStats), [dict(row, updated_at=now) for row in batch])
+    db.session.commit()
+
+    from app.services.cache import response_cache
+    response_cache.bump('instructor')
+    return report
+
+
+def recompute_user_stats(dry_run=False, batch_size=500):
+    """用一次 GROUP BY user_id 重新计算所有用户的评价统计，并修复偏差"""
+    stats_table = UserStats.__table__
+
+    # 1. 单次分组聚合
+    expected = {
+        row.user_id: row._mapping
+        for row in db.session.execute(
+            select(Review.user_id, *user_aggregate_columns()).group_by(Review.user_id)
+        )
+    }
+
+    # 2. 读取已存储的统计行
+    stored_stats = {
+        row.user_id: row._mapping
+        for row in db.session.execute(select(stats_table))
+    }
+    user_ids = db.session.execute(select(User.id)).scalars().all()
+
+    stats_updates, stats_inserts = [], []
+    for user_id in user_ids:
+        totals = expected.get(user_id, {})
+        values = {name: int(totals.get(name) or 0) for name in SUMMED_COLUMNS}
+
+        stored = stored_stats.get(user_id)
+        if stored is None:
+            stats_inserts.append(dict(values, user_id=user_id))
+        elif any(stored[name] != values[name] for name in SUMMED_COLUMNS):
+            stats_updates.append(dict(values, user_id=user_id))
+
+    report = {
+        'users_checked': len(user_ids),
+        'stats_rows_missing': len(stats_inserts),
+        'stats_rows_drifted': len(stats_updates),
+        'dry_run': dry_run
+    }
+    if dry_run or not (stats_inserts or stats_updates):
+        return report
+
+    # 3. 只写入有偏差的行
+    now = datetime.utcnow()
+    for batch in _chunks(stats_inserts, batch_size):
+        db.session.execute(insert(stats_table), [dict(row, updated_at=now) for row in batch])
+    for batch in _chunks(stats_updates, batch_size):
+        db.session.execute(update(UserStats), [dict(row, updated_at=now) for row in batch])
+    db.session.commit()
+
+    from app.services.cache import response_cache
+    response_cache.bump('user')
+    return report
+
+
+def recompute_signup_daily(dry_run=False):
+    """按注册日期分组重新计算每日注册数，并修复偏差"""
+    table = UserSignupDaily.__table__
+    expected = {}
+    for created_at, in db.session.execute(select(User.created_at)):
+        # 按 Python 日期分组，避免依赖各数据库的 DATE() 行为
+        day = created_at.date() if created_at else None
+        if day is not None:
+            expected[day] = expected.get(day, 0) + 1
+    stored = dict(db.session.execute(select(table.c.day, table.c.signups)).all())
+
+    inserts = [{'day': day, 'signups': count} for day, count in expected.items() if day not in stored]
+    updates = [
+        {'day': day, 'signups': expected.get(day, 0)}
+        for day, count in stored.items() if expected.get(day, 0) != count
+    ]
+    report = {
+        'days_checked': len(set(expected) | set(stored)),
+        'days_missing': len(inserts),
+        'days_drifted': len(updates),
+        'dry_run': dry_run
+    }
+    if dry_run or not (inserts or updates):
+        return report
+
+    if inserts:
+        db.session.execute(insert(table), inserts)
+    if updates:
+        db.session.execute(update(UserSignupDaily), updates)
+    db.session.commit()
+    return report
@@ -0,0 +1,189 @@
+"""
+Sync of the denormalised courses.average_rating / total_reviews columns
+"""
+
+import atexit
+import os
+import threading
+import time
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+
+def sync_course_columns(connection, course_ids):
+    """用一条 UPDATE 将聚合表的平均分和评价数同步到课程表"""
+    from app.models.course import Course
+    from app.models.course_rating_stats import CourseRatingStats
+
+    course_ids = sorted(course_ids)
+    if not course_ids:
+        return 0
+    stats = CourseRatingStats.__table__
+    courses = Course.__table__
+    result = connection.execute(
+        update(courses)
+        .where(courses.c.id.in_(course_ids))
+        .values(
+            average_rating=select(stats.c.average_rating)
+            .where(stats.c.course_id == courses.c.id).scalar_subquery(),
+            total_reviews=select(stats.c.total_reviews)
+            .where(stats.c.course_id == courses.c.id).scalar_subquery()
+        )
+    )
+    return result.rowcount
+
+
+class CourseRatingSync:
+    """课程表冗余评分列的同步
+
+    聚合表（course_rating_stats）始终与评价写入处于同一事务；课程表上的冗余列
+    有两种同步方式：
+
+    - immediate（默认）：在同一次flush中以一条 UPDATE 同步，评价、聚合和课程表
+      一起提交；
+    - coalesce：提交后只把课程ID记入脏集合，由后台线程合并写入。同一课程在
+      debounce 秒内没有新写入、或首次变脏已超过 max_delay 秒时写入，热门课程
+      的连续评价只更新一次课程行，冗余列最多落后 max_delay 秒。
+    """
+
+    def __init__(self):
+        self.app = None
+        self.mode = 'immediate'
+        self.debounce = 1.0
+        self.max_delay = 5.0
+        self._dirty = {}                 # course_id -> (首次变脏时间, 最近变脏时间)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.flushes = 0
+        self.courses_flushed = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('RATING_SYNC_MODE', self.mode)
+        self.debounce = app.config.get('RATING_SYNC_DEBOUNCE', self.debounce)
+        self.max_delay = app.config.get('RATING_SYNC_MAX_DELAY', self.max_delay)
+        if not event.contains(Session, 'after_flush_postexec', _sync_flushed):
+            event.listen(Session, 'after_flush_postexec', _sync_flushed)
+            event.listen(Session, 'after_commit', _queue_committed)
+            event.listen(Session, 'after_soft_rollback', _discard_pending)
+            atexit.register(self.flush)
+
+    @property
+    def coalescing(self):
+        return self.mode == 'coalesce'
+
+    # ---------------------------- 合并写入 ----------------------------
+    def mark_dirty(self, course_ids):
+        now = time.monotonic()
+        with self._lock:
+            for course_id in course_ids:
+                first, _ = self._dirty.get(course_id, (now, now))
+                self._dirty[course_id] = (first, now)
+        self._ensure_thread()
+
+    def _take_due(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                course_id for course_id, (first, last) in self._dirty.items()
+                if force or now - last >= self.debounce or now - first >= self.max_delay
+            ]
+            for course_id in due:
+                del self._dirty[course_id]
+        return due
+
+    def flush(self, force=True):
+        """写入到期（force 时为全部）的脏课程，返回写入的课程数"""
+        course_ids = self._take_due(force)
+        if not course_ids or self.app is None:
+            return 0
+        from app import db
+
+        with self.app.app_context():
+            try:
+                sync_course_columns(db.session.connection(), course_ids)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # 写入失败时放回脏集合，下一轮重试
+                self.mark_dirty(course_ids)
+                raise
+            finally:
+                db.session.remove()
+        self.flushes += 1
+        self.courses_flushed += len(course_ids)
+        return len(course_ids)
+
+    def _ensure_thread(self):
+        # gunicorn 等预先fork的进程中线程不会被继承，按进程号判断是否需要重新启动
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='rating-sync', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = max(min(self.debounce, self.max_delay) / 2, 0.05)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush(force=False)
+            except Exception as e:
+                if self.app is not None:
+                    self.app.logger.error(f'同步课程评分列失败: {str(e)}')
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._dirty)
+        return {
+            'mode': self.mode,
+            'pending': pending,
+            'flushes': self.flushes,
+            'courses_flushed': self.courses_flushed
+        }
+
+
+rating_sync = CourseRatingSync()
+
+
+def schedule_course_sync(session, touched):
+    """聚合表已更新的课程：立即模式下在当前事务中同步课程表，合并模式下提交后入队
+
+    ORM写入由flush事件自动调用；绕过ORM的批量写入需在提交前手动调用。
+    """
+    if rating_sync.coalescing:
+        session.info.setdefault('rating_sync_pending', set()).update(touched)
+        return
+
+    from app.models.course import Course
+
+    sync_course_columns(session.connection(), touched)
+    for course_id in touched:
+        course = session.identity_map.get(identity_key(Course, course_id))
+        if course is not None:
+            session.expire(course, ['average_rating', 'total_reviews', 'updated_at'])
+
+
+# ---------------------------- 会话事件 ----------------------------
+def _sync_flushed(session, flush_context):
+    """flush中评价写入已更新聚合表，随即同步课程表"""
+    touched = session.info.pop('rating_sync_touched', None)
+    if touched:
+        schedule_course_sync(session, touched)
+
+
+def _queue_committed(session):
+    pending = session.info.pop('rating_sync_pending', None)
+    if pending:
+        rating_sync.mark_dirty(pending)
+
+
+def _discard_pending(session, previous_transaction):
+    session.info.pop('rating_sync_pending', None)
+    session.info.pop('rating_sync_touched', None)
@@ -0,0 +1,118 @@
+"""
+Per-user cache of reviewed course ids for eligibility checks
+"""
+
+import threading
+
+from sqlalchemy import inspect, select
+
+from app.services.cache import LRUCache, track_session_writes
+
+
+class ReviewedCourses:
+    """每个用户已评价课程ID集合的进程内缓存
+
+    缓存未命中时用一条查询取回该用户评价过的全部课程（走 unique_user_course
+    索引）。本进程的评价写入在flush和commit时使对应用户的缓存失效；其他进程
+    的写入依赖TTL过期，因此结果最多落后 REVIEWED_CACHE_TTL 秒。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.ttl = 60
+        self.backend = LRUCache(10000)
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('REVIEWED_CACHE_ENABLED', True)
+        self.ttl = app.config.get('REVIEWED_CACHE_TTL', self.ttl)
+        self.backend = LRUCache(app.config.get('REVIEWED_CACHE_MAX_USERS', 10000))
+        track_session_writes('reviewed_courses_touched', _touched_users, self.invalidate)
+
+    def get(self, user_id):
+        """返回用户评价过的课程ID集合"""
+        if self.enabled:
+            reviewed = self.backend.get(user_id)
+            if reviewed is not None:
+                self.hits += 1
+                return reviewed
+            self.misses += 1
+
+        from app import db
+        from app.models.review import Review
+
+        generation = self._generations.get(user_id, 0)
+        reviewed = frozenset(db.session.execute(
+            select(Review.course_id).where(Review.user_id == user_id)
+        ).scalars())
+        # 查询期间发生写入时不缓存，避免把旧结果写回
+        if self.enabled and self._generations.get(user_id, 0) == generation:
+            self.backend.set(user_id, reviewed, self.ttl)
+        return reviewed
+
+    def check(self, user_id, course_ids):
+        """判断一组课程中哪些已被该用户评价，返回 (已评价, 未评价)"""
+        if self.enabled:
+            reviewed = self.get(user_id)
+        else:
+            from app import db
+            from app.models.review import Review
+
+            # 不使用缓存时只查询请求中的课程
+            reviewed = set(db.session.execute(
+                select(Review.course_id).where(
+                    Review.user_id == user_id, Review.course_id.in_(course_ids)
+                )
+            ).scalars()) if course_ids else set()
+        return ([course_id for course_id in course_ids if course_id in reviewed],
+                [course_id for course_id in course_ids if course_id not in reviewed])
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for user_id in user_ids:
+            self.backend.delete(user_id)
+
+    def clear(self):
+        with self._lock:
+            for user_id in list(self._generations):
+                self._generations[user_id] += 1
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        data = {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        data.update(self.backend.stats())
+        data.pop('versions', None)
+        return data
+
+
+reviewed_courses = ReviewedCourses()
+
+
+# ---------------------------- 会话事件 ----------------------------
+def _touched_users(session):
+    from app.models.review import Review
+
+    users = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Review):
+            users.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, Review):
+            state = inspect(obj)
+            if state.attrs.course_id.history.has_changes() or state.attrs.user_id.history.has_changes():
+                users.add(obj.user_id)
+                users.update(state.attrs.user_id.history.deleted)
+    users.discard(None)
+    return users
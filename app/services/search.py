@@ -0,0 +1,306 @@
+"""
+In-memory inverted index for course search with BM25 ranking
+"""
+
+import bisect
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+# 中文按字符二元组切分，英文/数字按单词切分
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+# 字段权重：标题 > 讲师姓名 > 描述
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'instructor': 2.0,
+    'description': 1.0,
+}
+
+_COURSE_FIELDS = ('title', 'description', 'instructor_id')
+
+
+def tokenize(text):
+    """将文本切分为索引词项：中文字符二元组 + 英文小写单词"""
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKEN_RE.findall(str(text).lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class CourseSearchIndex:
+    """课程倒排索引（标题、描述、讲师姓名），按BM25排序
+
+    索引在首次查询时从数据库构建，之后通过SQLAlchemy会话事件在事务提交后
+    增量更新。每个worker进程持有自己的索引，超过 SEARCH_INDEX_MAX_AGE 秒后
+    重建一次，以吸收其他进程写入的变更。
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)      # term -> {course_id: 加权词频}
+        self._doc_terms = {}                     # course_id -> {term: 加权词频}
+        self._doc_len = {}                       # course_id -> 加权文档长度
+        self._total_len = 0.0
+        self._courses = {}                       # course_id -> (title, description, instructor_id)
+        self._instructor_names = {}              # instructor_id -> name
+        self._instructor_courses = defaultdict(set)
+        self._sorted_terms = []                  # 英文词项有序表，用于前缀匹配
+        self._cjk_terms = defaultdict(set)       # 单个汉字 -> 包含它的二元组
+        self._built_at = None
+
+    def init_app(self, app):
+        """读取配置并注册会话事件"""
+        self.max_age = app.config.get('SEARCH_INDEX_MAX_AGE', self.max_age)
+        if not event.contains(Session, 'after_flush', _collect_changes):
+            event.listen(Session, 'after_flush', _collect_changes)
+            event.listen(Session, 'after_commit', _apply_changes)
+            event.listen(Session, 'after_soft_rollback', _discard_changes)
+
+    # ---------------------------- 构建 ----------------------------
+    @property
+    def is_stale(self):
+        if self._built_at is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self._built_at > self.max_age
+
+    def rebuild(self):
+        """从数据库全量构建索引（单条查询，只取需要的列）"""
+        from app import db
+        from app.models.course import Course
+        from app.models.instructor import Instructor
+
+        instructors = db.session.query(Instructor.id, Instructor.name).all()
+        courses = db.session.query(
+            Course.id, Course.title, Course.description, Course.instructor_id
+        ).all()
+
+        with self._lock:
+            self._reset()
+            for instructor_id, name in instructors:
+                self._instructor_names[instructor_id] = name
+            for course_id, title, description, instructor_id in courses:
+                self._index_course(course_id, title, description, instructor_id)
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self.is_stale:
+            self.rebuild()
+
+    # ---------------------------- 增量更新 ----------------------------
+    def upsert_course(self, course_id, title, description, instructor_id):
+        with self._lock:
+            self._remove_course(course_id)
+            self._index_course(course_id, title, description, instructor_id)
+
+    def remove_course(self, course_id):
+        with self._lock:
+            self._remove_course(course_id)
+
+    def upsert_instructor(self, instructor_id, name):
+        """讲师改名时重建其名下所有课程的文档"""
+        with self._lock:
+            if self._instructor_names.get(instructor_id) == name:
+                return
+            self._instructor_names[instructor_id] = name
+            for course_id in list(self._instructor_courses.get(instructor_id, ())):
+                title, description, _ = self._courses[course_id]
+                self._remove_course(course_id)
+                self._index_course(course_id, title, description, instructor_id)
+
+    def remove_instructor(self, instructor_id):
+        with self._lock:
+            self._instructor_names.pop(instructor_id, None)
+
+    def _index_course(self, course_id, title, description, instructor_id):
+        fields = {
+            'title': title,
+            'description': description,
+            'instructor': self._instructor_names.get(instructor_id),
+        }
+        terms = defaultdict(float)
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                terms[token] += weight
+
+        for term, tf in terms.items():
+            if not self._postings.get(term):
+                self._add_term(term)
+            self._postings[term][course_id] = tf
+
+        length = sum(terms.values())
+        self._doc_terms[course_id] = dict(terms)
+        self._doc_len[course_id] = length
+        self._total_len += length
+        self._courses[course_id] = (title, description, instructor_id)
+        self._instructor_courses[instructor_id].add(course_id)
+
+    def _remove_course(self, course_id):
+        terms = self._doc_terms.pop(course_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(course_id, None)
+            if not postings:
+                del self._postings[term]
+                self._drop_term(term)
+        self._total_len -= self._doc_len.pop(course_id, 0.0)
+        _, _, instructor_id = self._courses.pop(course_id)
+        self._instructor_courses[instructor_id].discard(course_id)
+
+    def _add_term(self, term):
+        if _CJK_RE.match(term):
+            for char in term:
+                self._cjk_terms[char].add(term)
+        else:
+            bisect.insort(self._sorted_terms, term)
+
+    def _drop_term(self, term):
+        if _CJK_RE.match(term):
+            for char in term:
+                self._cjk_terms[char].discard(term)
+        else:
+            i = bisect.bisect_left(self._sorted_terms, term)
+            if i < len(self._sorted_terms) and self._sorted_terms[i] == term:
+                del self._sorted_terms[i]
+
+    # ---------------------------- 查询 ----------------------------
+    def _expand(self, token, is_last):
+        """查询词扩展：单个汉字匹配包含它的二元组，最后一个英文词做前缀匹配（边输入边搜索）"""
+        if _CJK_RE.match(token):
+            if len(token) == 1:
+                return self._cjk_terms.get(token, set()) | ({token} if token in self._postings else set())
+            return {token}
+        if not is_last:
+            return {token}
+        terms = set()
+        i = bisect.bisect_left(self._sorted_terms, token)
+        while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(token):
+            terms.add(self._sorted_terms[i])
+            i += 1
+        return terms
+
+    def search(self, text, limit=None):
+        """返回 [(course_id, score), ...]，按BM25得分降序；所有查询词都必须命中"""
+        self.ensure_fresh()
+        tokens = list(dict.fromkeys(tokenize(text)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return []
+            avg_len = self._total_len / n_docs
+
+            scores = None
+            for i, token in enumerate(tokens):
+                token_scores = defaultdict(float)
+                for term in self._expand(token, i == len(tokens) - 1):
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    df = len(postings)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for course_id, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_len[course_id] / avg_len)
+                        token_scores[course_id] = max(
+                            token_scores[course_id],
+                            idf * tf * (self.k1 + 1) / (tf + norm)
+                        )
+                if not token_scores:
+                    return []
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        course_id: score + token_scores[course_id]
+                        for course_id, score in scores.items()
+                        if course_id in token_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+course_search = CourseSearchIndex()
+
+
+# ---------------------------- 会话事件 ----------------------------
+def _attrs_changed(obj, names):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+def _collect_changes(session, flush_context):
+    """flush后记录课程/讲师变更，等事务提交后再写入索引"""
+    from app.models.course import Course
+    from app.models.instructor import Instructor
+
+    pending = session.info.setdefault('course_search_pending', [])
+    for obj in session.new:
+        if isinstance(obj, Course):
+            pending.append(('course', obj.id, obj.title, obj.description, obj.instructor_id))
+        elif isinstance(obj, Instructor):
+            pending.append(('instructor', obj.id, obj.name))
+    for obj in session.dirty:
+        if isinstance(obj, Course) and _attrs_changed(obj, _COURSE_FIELDS):
+            pending.append(('course', obj.id, obj.title, obj.description, obj.instructor_id))
+        elif isinstance(obj, Instructor) and _attrs_changed(obj, ('name',)):
+            pending.append(('instructor', obj.id, obj.name))
+    for obj in session.deleted:
+        if isinstance(obj, Course):
+            pending.append(('course_deleted', obj.id))
+        elif isinstance(obj, Instructor):
+            pending.append(('instructor_deleted', obj.id))
+
+
+def _apply_changes(session):
+    pending = session.info.pop('course_search_pending', None)
+    if not pending or course_search.is_stale:
+        # 索引尚未构建（或即将重建）时无需增量维护
+        return
+    # 先处理讲师，保证同一事务中新建的课程能取到讲师姓名
+    pending.sort(key=lambda change: not change[0].startswith('instructor'))
+    for change in pending:
+        kind, args = change[0], change[1:]
+        if kind == 'course':
+            course_search.upsert_course(*args)
+        elif kind == 'course_deleted':
+            course_search.remove_course(*args)
+        elif kind == 'instructor':
+            course_search.upsert_instructor(*args)
+        elif kind == 'instructor_deleted':
+            course_search.remove_instructor(*args)
+
+
+def _discard_changes(session, previous_transaction):
+    session.info.pop('course_search_pending', None)
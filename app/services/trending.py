@@ -0,0 +1,213 @@
+"""
+Trending courses from exponentially time-decayed review counters
+"""
+
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _timestamp(value):
+    return (value - _EPOCH).total_seconds() if value else time.time()
+
+
+class TrendingCourses:
+    """按评价时间指数衰减的课程热度计数器，维护热度最高的 K 门课程
+
+    每条评价贡献 exp(λ·(t - t0))，t 为评价时间、t0 为基准时间，λ = ln2 / 半衰期。
+    这样计数只在写入时累加，不需要随时间逐个衰减：任意时刻的真实热度为
+    计数 × exp(-λ·(now - t0))，各课程的相对顺序与时间无关，前 K 名集合只在写入
+    时变化。读取热门列表只需对 K 个条目排序。
+
+    计数在进程内维护：首次使用时用一条按 created_at 的范围查询预热（只读取
+    衰减到可忽略之前的评价），之后随本进程的评价写入增量更新，并每隔
+    rebuild_interval 秒重建一次以纳入其他进程的写入。
+    """
+
+    def __init__(self, half_life_hours=72, top_k=50, rebuild_interval=300):
+        self.half_life_hours = half_life_hours
+        self.top_k = top_k
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._t0 = time.time()
+        self._reviews = {}          # course_id -> 衰减评价数（基准时间下）
+        self._rating_sum = {}       # course_id -> 衰减评分总和
+        self._rating_weight = {}    # course_id -> 衰减评分数量
+        self._top = {}              # 前 K 名 course_id -> 衰减评价数
+        self._built_at = None
+
+    def init_app(self, app):
+        self.half_life_hours = app.config.get('TRENDING_HALF_LIFE_HOURS', self.half_life_hours)
+        self.top_k = app.config.get('TRENDING_TOP_K', self.top_k)
+        self.rebuild_interval = app.config.get('TRENDING_REBUILD_INTERVAL', self.rebuild_interval)
+        if not event.contains(Session, 'after_flush', _collect_changes):
+            event.listen(Session, 'after_flush', _collect_changes)
+            event.listen(Session, 'after_commit', _apply_changes)
+            event.listen(Session, 'after_soft_rollback', _discard_changes)
+
+    @property
+    def decay_rate(self):
+        return math.log(2) / (self.half_life_hours * 3600)
+
+    # ---------------------------- 构建 ----------------------------
+    @property
+    def is_stale(self):
+        if self._built_at is None:
+            return True
+        return self.rebuild_interval is not None and \
+            time.monotonic() - self._built_at > self.rebuild_interval
+
+    def rebuild(self):
+        """从数据库重建计数（只读取最近约10个半衰期内的评价）"""
+        from app import db
+        from app.models.review import Review
+
+        cutoff = datetime.utcnow() - timedelta(hours=self.half_life_hours * 10)
+        rows = db.session.query(Review.course_id, Review.rating, Review.created_at)\
+            .filter(Review.created_at >= cutoff).all()
+
+        with self._lock:
+            self._reset()
+            for course_id, rating, created_at in rows:
+                self._add(course_id, rating, _timestamp(created_at), 1)
+            self._rebuild_top()
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self.is_stale:
+            self.rebuild()
+
+    def invalidate(self):
+        """标记为过期，下次读取时重建"""
+        with self._lock:
+            self._built_at = None
+
+    # ---------------------------- 增量更新 ----------------------------
+    def _add(self, course_id, rating, timestamp, sign):
+        weight = sign * math.exp(self.decay_rate * (timestamp - self._t0))
+        self._reviews[course_id] = self._reviews.get(course_id, 0.0) + weight
+        if rating is not None:
+            self._rating_sum[course_id] = self._rating_sum.get(course_id, 0.0) + weight * rating
+            self._rating_weight[course_id] = self._rating_weight.get(course_id, 0.0) + weight
+        if self._reviews[course_id] <= 1e-9:
+            self._drop(course_id)
+
+    def _drop(self, course_id):
+        self._reviews.pop(course_id, None)
+        self._rating_sum.pop(course_id, None)
+        self._rating_weight.pop(course_id, None)
+
+    def _rebuild_top(self):
+        self._top = dict(heapq.nlargest(self.top_k, self._reviews.items(), key=lambda item: item[1]))
+
+    def _update_top(self, course_id):
+        score = self._reviews.get(course_id)
+        if course_id in self._top:
+            if score is None or (len(self._reviews) > len(self._top) and score < self._top[course_id]):
+                # 前 K 名中的课程热度下降，可能被其他课程超过，重新选出前 K 名
+                self._rebuild_top()
+            else:
+                self._top[course_id] = score
+        elif score is not None:
+            if len(self._top) < self.top_k:
+                self._top[course_id] = score
+            else:
+                weakest = min(self._top, key=self._top.get)
+                if score > self._top[weakest]:
+                    del self._top[weakest]
+                    self._top[course_id] = score
+
+    def apply(self, changes):
+        """应用已提交的评价变更：[(course_id, rating, created_at, +1/-1), ...]"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            touched = set()
+            for course_id, rating, created_at, sign in changes:
+                self._add(course_id, rating, _timestamp(created_at), sign)
+                touched.add(course_id)
+            for course_id in touched:
+                self._update_top(course_id)
+
+    def remove_course(self, course_id):
+        with self._lock:
+            self._drop(course_id)
+            if course_id in self._top:
+                self._rebuild_top()
+
+    # ---------------------------- 查询 ----------------------------
+    def top(self, limit=10):
+        """热度最高的课程：[(course_id, 当前热度, 近期平均评分), ...]"""
+        self.ensure_fresh()
+        with self._lock:
+            scale = math.exp(-self.decay_rate * (time.time() - self._t0))
+            ranked = sorted(self._top.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [
+                (
+                    course_id,
+                    score * scale,
+                    self._rating_sum[course_id] / self._rating_weight[course_id]
+                    if self._rating_weight.get(course_id) else None
+                )
+                for course_id, score in ranked
+            ]
+
+
+trending_courses = TrendingCourses()
+
+
+# ---------------------------- 会话事件 ----------------------------
+def _collect_changes(session, flush_context):
+    """flush后记录评价的新增、删除和评分/课程变更，等事务提交后再计入"""
+    from app.models.course import Course
+    from app.models.review import Review
+
+    pending = session.info.setdefault('trending_pending', [])
+    for obj in session.new:
+        if isinstance(obj, Review):
+            pending.append((obj.course_id, obj.rating, obj.created_at, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Review):
+            history = inspect(obj).attrs.rating.history
+            rating = history.deleted[0] if history.deleted else obj.rating
+            pending.append((obj.course_id, rating, obj.created_at, -1))
+        elif isinstance(obj, Course):
+            pending.append((obj.id, None, None, 0))
+    for obj in session.dirty:
+        if not isinstance(obj, Review):
+            continue
+        state = inspect(obj)
+        rating_history = state.attrs.rating.history
+        course_history = state.attrs.course_id.history
+        if not (rating_history.has_changes() or course_history.has_changes()):
+            continue
+        old_rating = rating_history.deleted[0] if rating_history.deleted else obj.rating
+        old_course = course_history.deleted[0] if course_history.deleted else obj.course_id
+        pending.append((old_course, old_rating, obj.created_at, -1))
+        pending.append((obj.course_id, obj.rating, obj.created_at, 1))
+
+
+def _apply_changes(session):
+    pending = session.info.pop('trending_pending', None)
+    if not pending or trending_courses.is_stale:
+        # 计数尚未构建（或即将重建）时无需增量维护
+        return
+    for course_id, _, _, sign in pending:
+        if sign == 0:
+            trending_courses.remove_course(course_id)
+    trending_courses.apply([change for change in pending if change[3]])
+
+
+def _discard_changes(session, previous_transaction):
+    session.info.pop('trending_pending', None)
@@ -0,0 +1,252 @@
+"""
+In-process username/email membership index for availability checks
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+
+# 可索引的用户字段
+FIELDS = ('username', 'email')
+
+
+def _key(value):
+    # 线上 MySQL 使用不区分大小写的排序规则，唯一约束按小写判断
+    return value.strip().lower() if value else None
+
+
+class BloomFilter:
+    """定长位数组上的布隆过滤器：不在其中的值一定不存在，在其中的值可能存在
+
+    k 个位置由一次 blake2b 摘要的两半做双重哈希得到。
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class UserDirectory:
+    """用户名和邮箱的进程内成员索引（布隆过滤器 + 精确集合）
+
+    首次使用时用一条只读取两列的查询加载全部用户名和邮箱，之后随本进程已提交
+    的用户创建、改名/改邮箱和删除增量更新，并每隔 rebuild_interval 秒重建一次
+    以纳入其他进程的写入（布隆过滤器不支持删除，重建也会清掉已删除值留下的位）。
+
+    索引只用来确认"已被使用"：布隆过滤器判定不存在的值跳过精确集合，精确集合
+    命中的值直接回答已被使用（其他进程删除或改名后最多多占用 rebuild_interval
+    秒，只会让用户换一个名字）。索引中没有的值可能是其他 worker 或导入命令刚写入
+    的，一律用唯一索引查询数据库确认，查到后补入索引。写入路径用 taken()，总是
+    以数据库为准。
+    """
+
+    def __init__(self, error_rate=0.01, rebuild_interval=600):
+        self.enabled = True
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._reset()
+        self.bloom_negatives = 0
+        self.set_lookups = 0
+        self.db_lookups = 0
+
+    def _reset(self, capacity=1024):
+        self._blooms = {field: BloomFilter(capacity, self.error_rate) for field in FIELDS}
+        self._members = {field: set() for field in FIELDS}
+        self._built_at = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USER_DIRECTORY_ENABLED', True)
+        self.error_rate = app.config.get('USER_DIRECTORY_ERROR_RATE', self.error_rate)
+        self.rebuild_interval = app.config.get('USER_DIRECTORY_REBUILD_INTERVAL', self.rebuild_interval)
+        if not event.contains(Session, 'after_flush', _collect_changes):
+            event.listen(Session, 'after_flush', _collect_changes)
+            event.listen(Session, 'after_commit', _apply_changes)
+            event.listen(Session, 'after_soft_rollback', _discard_changes)
+
+    # ---------------------------- 构建 ----------------------------
+    @property
+    def is_stale(self):
+        if self._built_at is None:
+            return True
+        return self.rebuild_interval is not None and \
+            time.monotonic() - self._built_at > self.rebuild_interval
+
+    def rebuild(self):
+        """从数据库加载全部用户名和邮箱"""
+        from app import db
+        from app.models.user import User
+
+        rows = db.session.execute(select(User.username, User.email)).all()
+        with self._lock:
+            # 预留一倍容量给后续注册，超出后下次检查时重建
+            self._reset(capacity=max(len(rows) * 2, 1024))
+            for row in rows:
+                for field, value in zip(FIELDS, row):
+                    self._add(field, _key(value))
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self.is_stale or any(bloom.count > bloom.capacity for bloom in self._blooms.values()):
+            self.rebuild()
+
+    def invalidate(self):
+        """标记为过期，下次使用时重建"""
+        with self._lock:
+            self._built_at = None
+
+    # ---------------------------- 增量更新 ----------------------------
+    def _add(self, field, key):
+        if key and key not in self._members[field]:
+            self._members[field].add(key)
+            self._blooms[field].add(key)
+
+    def apply(self, changes):
+        """应用已提交的变更：[(字段, 旧值, 新值), ...]，新建时旧值为 None，删除时新值为 None"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            # 先移除再加入，同一事务中互换用户名时两个值都保留
+            for field, old, new in changes:
+                if old is not None:
+                    self._members[field].discard(_key(old))
+            for field, old, new in changes:
+                if new is not None:
+                    self._add(field, _key(new))
+
+    # ---------------------------- 查询 ----------------------------
+    def _in_memory(self, field, key):
+        with self._lock:
+            if key not in self._blooms[field]:
+                self.bloom_negatives += 1
+                return False
+            self.set_lookups += 1
+            return key in self._members[field]
+
+    def contains(self, field, value):
+        """值是否已被使用：索引命中时只读内存，否则查询数据库"""
+        return self.check_many(field, [value])[value]
+
+    def check_many(self, field, values):
+        """批量判断，返回 {值: 是否已被使用}；索引中没有的值合并为一条查询"""
+        result = {}
+        if self.enabled:
+            self.ensure_fresh()
+            for value in values:
+                if self._in_memory(field, _key(value)):
+                    result[value] = True
+        missing = [value for value in values if value not in result]
+        if missing:
+            found = self._existing_in_db(field, missing)
+            with self._lock:
+                for value in missing:
+                    result[value] = _key(value) in found
+                    if result[value] and self._built_at is not None:
+                        self._add(field, _key(value))
+        return result
+
+    def taken(self, field, value, exclude_id=None):
+        """写入前的唯一性检查：值是否已被 exclude_id 以外的用户使用（总是查询数据库）"""
+        user_id = self._exists_in_db(field, value)
+        return user_id is not None and user_id != exclude_id
+
+    def conflict(self, values, exclude_id=None):
+        """写入触发唯一约束冲突（回滚）后确认被占用的字段：values 为 {字段: 值}，
+        都未被占用时返回 None，说明冲突来自其他约束"""
+        for field in FIELDS:
+            if values.get(field) is not None and self.taken(field, values[field], exclude_id=exclude_id):
+                return field
+        return None
+
+    def _existing_in_db(self, field, values):
+        """数据库中已存在的值（按索引键返回）"""
+        from app import db
+        from app.models.user import User
+
+        self.db_lookups += 1
+        column = getattr(User, field)
+        return {
+            _key(value) for value in db.session.execute(select(column).where(column.in_(values))).scalars()
+        }
+
+    def _exists_in_db(self, field, value):
+        from app import db
+        from app.models.user import User
+
+        self.db_lookups += 1
+        return db.session.execute(
+            select(User.id).where(getattr(User, field) == value).limit(1)
+        ).scalar()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'built': self._built_at is not None,
+                'sizes': {field: len(members) for field, members in self._members.items()},
+                'bloom_bits': {field: bloom.size for field, bloom in self._blooms.items()},
+                'bloom_negatives': self.bloom_negatives,
+                'set_lookups': self.set_lookups,
+                'db_lookups': self.db_lookups
+            }
+
+
+user_directory = UserDirectory()
+
+
+# ---------------------------- 会话事件 ----------------------------
+def _collect_changes(session, flush_context):
+    """flush后记录用户名和邮箱的变更，等事务提交后再应用"""
+    from app.models.user import User
+
+    pending = session.info.setdefault('user_directory_pending', [])
+    for obj in session.new:
+        if isinstance(obj, User):
+            pending.extend((field, None, getattr(obj, field)) for field in FIELDS)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            for field in FIELDS:
+                history = state.attrs[field].history
+                pending.append((field, history.deleted[0] if history.deleted else getattr(obj, field), None))
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        for field in FIELDS:
+            history = state.attrs[field].history
+            if history.deleted and history.deleted[0] != getattr(obj, field):
+                pending.append((field, history.deleted[0], getattr(obj, field)))
+
+
+def _apply_changes(session):
+    pending = session.info.pop('user_directory_pending', None)
+    if pending:
+        user_directory.apply(pending)
+
+
+def _discard_changes(session, previous_transaction):
+    session.info.pop('user_directory_pending', None)
@@ -0,0 +1,152 @@
+"""
+Cached Flask-Login user loader backed by lightweight user snapshots
+"""
+
+import threading
+
+from flask_login import UserMixin
+from sqlalchemy import inspect, select
+
+from app.models.user import User
+from app.services.cache import LRUCache, track_session_writes
+
+
+# 快照中保存的用户列：User 映射的全部列（密码哈希除外），新增列后自动纳入快照
+SNAPSHOT_EXCLUDED = ('password_hash',)
+SNAPSHOT_COLUMNS = tuple(
+    column.key for column in inspect(User).column_attrs if column.key not in SNAPSHOT_EXCLUDED
+)
+
+
+class UserSnapshot(UserMixin):
+    """current_user 的轻量快照
+
+    快照字段直接从内存读取；统计信息按主键读取统计行；其余属性和方法（如
+    reviews、set_password）在首次访问时才加载完整的 User 对象并转发，User 上
+    也没有的属性照常抛出 AttributeError。
+    每个请求使用各自的快照实例，缓存中只保存不可变的字段值。
+    """
+
+    # 只依赖快照字段的方法直接复用 User 的实现
+    FIELD_GETTERS = User.FIELD_GETTERS
+    to_dict = User.to_dict
+    get_stats = User.get_stats
+    get_full_name = User.get_full_name
+    get_initials = User.get_initials
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+    @property
+    def stats(self):
+        from app import db
+        from app.models.user_stats import UserStats
+        return db.session.get(UserStats, self.id)
+
+    def _load(self):
+        user = self.__dict__.get('_user')
+        if user is None:
+            from app import db
+            user = self.__dict__['_user'] = db.session.get(User, self.id)
+        return user
+
+    def __getattr__(self, name):
+        # 只在快照中没有该属性时调用
+        if name.startswith('__') or name == '_user':
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+class UserLoader:
+    """Flask-Login user_loader 的进程内快照缓存
+
+    缓存未命中时只查询快照所需的列。本进程对用户的更新和删除在flush和
+    commit时使对应快照失效；其他进程的写入依赖TTL过期，因此快照最多落后
+    USER_CACHE_TTL 秒（权限判断等需要最新数据的地方应自行查询）。
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.ttl = 60
+        self.backend = LRUCache(10000)
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USER_CACHE_ENABLED', True)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.backend = LRUCache(app.config.get('USER_CACHE_MAX_USERS', 10000))
+        track_session_writes('user_loader_touched', _touched_users, self.invalidate)
+
+    def load(self, user_id):
+        """返回用户快照；用户不存在时返回 None"""
+        from app import db
+
+        if not self.enabled:
+            return db.session.get(User, user_id)
+
+        values = self.backend.get(user_id)
+        if values is not None:
+            self.hits += 1
+            return UserSnapshot(values)
+        self.misses += 1
+
+        generation = self._generations.get(user_id, 0)
+        row = db.session.execute(
+            select(*[getattr(User, name) for name in SNAPSHOT_COLUMNS]).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        values = dict(row._mapping)
+        # 查询期间发生写入时不缓存，避免把旧结果写回
+        if self._generations.get(user_id, 0) == generation:
+            self.backend.set(user_id, values, self.ttl)
+        return UserSnapshot(values)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for user_id in user_ids:
+            self.backend.delete(user_id)
+
+    def clear(self):
+        with self._lock:
+            for user_id in list(self._generations):
+                self._generations[user_id] += 1
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        data = {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        data.update(self.backend.stats())
+        data.pop('versions', None)
+        return data
+
+
+user_loader = UserLoader()
+
+
+# ---------------------------- 会话事件 ----------------------------
+def _touched_users(session):
+    users = set()
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            users.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj, include_collections=False):
+            users.add(obj.id)
+            users.update(inspect(obj).attrs.id.history.deleted)
+    users.discard(None)
+    return users
@@ -145,12 +145,22 @@ const API = {
         }
     },
 
+    // Run several GET requests in one round trip; paths are relative to API_BASE
+    batch: async function(paths) {
+        const result = await API.post('/batch', {
+            requests: paths.map(path => CONFIG.API_BASE + path)
+        });
+        return result.data;
+    },
+
     // Courses API
     courses: {
         getAll: (params = {}) => API.get('/courses', params),
         getById: (id) => API.get(`/courses/${id}`),
+        getByIds: (ids) => API.get('/courses', { ids: ids.join(',') }),
         getByStage: (stage) => API.get(`/courses/by-stage/${stage}`),
         getStats: () => API.get('/courses/stats'),
+        getTrending: (limit = 10) => API.get('/courses/trending', { limit }),
         search: (query) => API.get('/courses/search', { q: query })
     },
 
@@ -158,6 +168,9 @@ const API = {
     instructors: {
         getAll: () => API.get('/instructors'),
         getById: (id) => API.get(`/instructors/${id}`),
+        getByIds: (ids) => API.get('/instructors', { ids: ids.join(',') }),
+        getLeaderboard: (sortBy = 'average_rating', order = 'desc', limit = 10) =>
+            API.get('/instructors/leaderboard', { sort_by: sortBy, order, limit }),
         getCourses: (id, params = {}) => API.get(`/instructors/${id}/courses`, params)
     },
 
@@ -166,7 +179,9 @@ const API = {
         getByCourse: (courseId, params = {}) => API.get(`/courses/${courseId}/reviews`, params),
         getByUser: (userId, params = {}) => API.get(`/users/${userId}/reviews`, params),
         create: (data) => API.post('/reviews', data),
-        checkEligibility: (data) => API.post('/reviews/check', data)
+        createBulk: (reviews) => API.post('/reviews/bulk', { reviews }),
+        checkEligibility: (data) => API.post('/reviews/check', data),
+        checkEligibilityBulk: (courseIds) => API.post('/reviews/check/bulk', { course_ids: courseIds })
     },
 
     // Users API
@@ -174,6 +189,7 @@ const API = {
         login: (data) => API.post('/users/login', data),
         register: (data) => API.post('/users', data),
         checkUsername: (username) => API.get(`/users/check-username/${username}`),
+        checkUsernames: (usernames) => API.get('/users/check-usernames', { usernames: usernames.join(',') }),
         checkEmail: (email) => API.get(`/users/check-email/${email}`)
     }
 };
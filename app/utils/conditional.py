@@ -0,0 +1,89 @@
+"""
+ETag / Last-Modified conditional GET support for JSON endpoints
+"""
+
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import func, select
+
+
+def entity_state(specs):
+    """用一条SQL取回各实体范围的 (最大updated_at, 行数或增删计数)
+
+    specs 为 [(Model, 条件...), ...]；每个范围编译为两个标量子查询，
+    因此校验只需一次数据库往返，且可走 updated_at / 外键索引。不带条件的
+    整表范围不做 COUNT(*)（InnoDB 上是全索引扫描），改读 entity_versions
+    中该表的增删计数（主键查找）。
+    """
+    from app import db
+    from app.models.entity_version import EntityVersion, version_key
+
+    columns = []
+    for model, *criteria in specs:
+        columns.append(select(func.max(model.updated_at)).where(*criteria).scalar_subquery())
+        key = None if criteria else version_key(model.__table__.name)
+        if key:
+            columns.append(func.coalesce(
+                select(EntityVersion.version).where(EntityVersion.entity == key).scalar_subquery(), 0
+            ))
+        else:
+            columns.append(select(func.count()).select_from(model).where(*criteria).scalar_subquery())
+    row = db.session.execute(select(*columns)).one()
+    return [(row[i], row[i + 1]) for i in range(0, len(row), 2)]
+
+
+def _validators(states):
+    """由实体状态生成强ETag和Last-Modified"""
+    digest = hashlib.sha1()
+    digest.update(request.full_path.encode('utf-8'))
+    for updated_at, count in states:
+        digest.update(f'|{updated_at.isoformat() if updated_at else ""}:{count}'.encode('utf-8'))
+    timestamps = [updated_at for updated_at, _ in states if updated_at is not None]
+    last_modified = max(timestamps).replace(tzinfo=timezone.utc, microsecond=0) if timestamps else None
+    return digest.hexdigest(), last_modified
+
+
+def _not_modified(etag, last_modified):
+    # 同时提供两种校验头时以 If-None-Match 为准
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # 每次使用前都向服务器校验，避免浏览器按Last-Modified启发式缓存旧数据
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(spec_factory):
+    """为GET接口加上条件请求支持
+
+    spec_factory 接收视图的路径参数，返回 entity_state 所需的实体范围列表。
+    校验命中时直接返回304，不执行视图，也不做序列化。
+    配置 CONDITIONAL_GET_ENABLED 为 False 时直接执行视图。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or not current_app.config.get('CONDITIONAL_GET_ENABLED', True):
+                return view(*args, **kwargs)
+
+            etag, last_modified = _validators(entity_state(spec_factory(**kwargs)))
+            if _not_modified(etag, last_modified):
+                return _set_validators(current_app.response_class(status=304), etag, last_modified)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
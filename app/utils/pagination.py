@@ -0,0 +1,171 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints
+"""
+
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+class CursorError(ValueError):
+    """游标无效或与当前排序方式不匹配"""
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def encode_cursor(values, direction, sort_key):
+    """将排序键编码为不透明游标"""
+    payload = {'k': [_dump_value(v) for v in values], 'd': direction, 's': sort_key}
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort_key):
+    """解码游标，返回 (排序键值列表, 方向)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        values = [_load_value(v) for v in payload['k']]
+        direction = payload['d']
+    except (ValueError, KeyError, TypeError):
+        raise CursorError('无效的分页游标')
+    if payload.get('s') != sort_key or direction not in ('next', 'prev'):
+        raise CursorError('分页游标与当前排序方式不匹配')
+    return values, direction
+
+
+def _seek_condition(columns, values, descending):
+    """展开为 (a < v1) OR (a = v1 AND id < v2)，便于MySQL在索引上做范围扫描"""
+    clauses = []
+    for i, column in enumerate(columns):
+        compare = column < values[i] if descending else column > values[i]
+        equals = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equals, compare) if equals else compare)
+    return or_(*clauses)
+
+
+# ---------------------------- 总数缓存 ----------------------------
+_count_cache = {}
+_count_lock = threading.Lock()
+_COUNT_CACHE_SIZE = 1024
+
+
+def cached_count(query, cache_key):
+    """带TTL的总数缓存，避免每翻一页都执行 COUNT(*)"""
+    ttl = current_app.config.get('PAGINATION_COUNT_TTL', 60)
+    now = time.monotonic()
+    with _count_lock:
+        entry = _count_cache.get(cache_key)
+        if entry and entry[1] > now:
+            return entry[0]
+
+    total = query.order_by(None).count()
+
+    with _count_lock:
+        if len(_count_cache) >= _COUNT_CACHE_SIZE:
+            _count_cache.pop(next(iter(_count_cache)))
+        _count_cache[cache_key] = (total, now + ttl)
+    return total
+
+
+def count_cache_key():
+    """由端点、路径参数和筛选参数生成总数缓存键（不含分页参数）"""
+    args = tuple(sorted(
+        (key, value) for key, value in request.args.items(multi=True)
+        if key not in ('cursor', 'page', 'per_page', 'order', 'sort', 'sort_by')
+    ))
+    return (request.endpoint, tuple(sorted((request.view_args or {}).items())), args)
+
+
+def wants_cursor():
+    """请求是否启用游标分页（传入 cursor 参数即启用，首页传空值）"""
+    return 'cursor' in request.args
+
+
+class KeysetPage:
+    """游标分页结果"""
+
+    def __init__(self, items, total, has_next, has_prev, next_cursor, prev_cursor):
+        self.items = items
+        self.total = total
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def pagination_dict(self, per_page):
+        return {
+            'mode': 'cursor',
+            'per_page': per_page,
+            'total': self.total,
+            'total_is_cached': True,
+            'has_prev': self.has_prev,
+            'has_next': self.has_next,
+            'prev_cursor': self.prev_cursor,
+            'next_cursor': self.next_cursor
+        }
+
+
+def keyset_paginate(query, columns, per_page, cursor, descending=True, sort_key='', key_of=None,
+                    total=None):
+    """按 columns（最后一列须为唯一的主键）做游标分页
+
+    cursor 为空表示第一页；每次多取一行用来判断是否还有下一页。
+    排序列不是结果对象自身的属性时，通过 key_of(item) 取排序键值。
+    调用方已知总数（如来自聚合表）时传入 total，省去 COUNT 查询。
+    """
+    direction = 'next'
+    base_query = query
+    if cursor:
+        values, direction = decode_cursor(cursor, sort_key)
+        if len(values) != len(columns):
+            raise CursorError('无效的分页游标')
+        # 向前翻页时反向扫描，取回后再倒序
+        seek_desc = descending if direction == 'next' else not descending
+        query = query.filter(_seek_condition(columns, values, seek_desc))
+    else:
+        seek_desc = descending
+
+    query = query.order_by(*[c.desc() if seek_desc else c.asc() for c in columns])
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    if key_of is None:
+        def key_of(item):
+            return [getattr(item, column.key) for column in columns]
+
+    if direction == 'next':
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(key_of(rows[-1]), 'next', sort_key) if rows and has_next else None
+    prev_cursor = encode_cursor(key_of(rows[0]), 'prev', sort_key) if rows and has_prev else None
+
+    if total is None:
+        total = cached_count(base_query, count_cache_key())
+    return KeysetPage(rows, total, has_next, has_prev, next_cursor, prev_cursor)
@@ -0,0 +1,90 @@
+"""
+Query parameter parsing helpers shared by API endpoints
+"""
+
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import lazyload, load_only
+
+
+# 单次多ID查询的最大ID数量
+MAX_IDS = 100
+
+# 评价内容片段的最大长度
+MAX_SNIPPET = 500
+
+
+def parse_ids(name='ids', limit=MAX_IDS):
+    """解析逗号分隔的ID列表（去重并保持顺序），格式错误时抛出 ValueError"""
+    ids = []
+    for part in request.args.get(name, '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError(f'{name}必须是逗号分隔的整数ID')
+        value = int(part)
+        if value not in ids:
+            ids.append(value)
+    if not ids:
+        raise ValueError(f'{name}不能为空')
+    if len(ids) > limit:
+        raise ValueError(f'{name}最多包含{limit}个ID')
+    return ids
+
+
+def ordered_by_ids(items, ids):
+    """按请求中的ID顺序排列查询结果，并返回未找到的ID"""
+    by_id = {item.id: item for item in items}
+    return [by_id[i] for i in ids if i in by_id], [i for i in ids if i not in by_id]
+
+
+def parse_fields(allowed, name='fields'):
+    """解析逗号分隔的字段列表；未传入时返回 None（输出全部字段），含未知字段时抛出 ValueError"""
+    if name not in request.args:
+        return None
+    fields = []
+    for part in request.args.get(name, '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if part not in allowed:
+            raise ValueError(f'{name}包含未知字段 {part}，可选字段: {", ".join(allowed)}')
+        if part not in fields:
+            fields.append(part)
+    if not fields:
+        raise ValueError(f'{name}不能为空')
+    return fields
+
+
+def parse_snippet(name='snippet', limit=MAX_SNIPPET):
+    """解析内容片段长度；未传入时返回 None（输出完整内容）"""
+    if name not in request.args:
+        return None
+    length = request.args.get(name, type=int)
+    if length is None or not 1 <= length <= limit:
+        raise ValueError(f'{name}必须是1到{limit}之间的整数')
+    return length
+
+
+def field_options(model, fields, *always):
+    """与 fields 对应的加载选项：只从数据库取回需要的列
+
+    主键和 always 中的列（如游标分页的排序列）总是加载；字段全部来自某个一对一
+    聚合关系（model.FIELD_RELATIONSHIPS）而该字段未被请求时，不再连接该关系。
+    """
+    if fields is None:
+        return []
+    mapper = inspect(model)
+    relationships = getattr(model, 'FIELD_RELATIONSHIPS', {})
+    columns = [getattr(model, mapper.get_property_by_column(column).key) for column in mapper.primary_key]
+    columns += [
+        getattr(model, attr.key) for attr in mapper.column_attrs
+        if attr.key in fields and attr.key not in relationships
+    ]
+    columns += list(always)
+    options = [load_only(*columns)]
+    for relationship in set(relationships.values()):
+        if not any(relationships.get(field) == relationship for field in fields):
+            options.append(lazyload(getattr(model, relationship)))
+    return options
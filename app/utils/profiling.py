@@ -0,0 +1,79 @@
+"""
+Query counting and query plan helpers for checking N+1 and index regressions
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """记录代码块内执行的SQL语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """在 with 块内统计 engine 执行的SQL数量"""
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+
+
+# ---------------------------- 执行计划检查 ----------------------------
+@contextmanager
+def capture_selects(engine):
+    """在 with 块内记录 engine 执行的 SELECT 语句及参数"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def explain_problems(connection, statement, parameters):
+    """对一条SQL执行EXPLAIN，返回发现的问题（filesort 或全表扫描）
+
+    全表扫描只在语句带 WHERE 条件（MySQL 还包括 ORDER BY）时视为问题，不带条件
+    的整表读取（如讲师列表）本就需要扫描全表。有可用索引而优化器仍选择全表扫描
+    同样报告，并列出 possible_keys。支持 MySQL 与 SQLite。
+    """
+    upper = statement.upper()
+    filtered = ' WHERE ' in upper
+    ordered = ' ORDER BY ' in upper
+    problems = []
+    if connection.dialect.name == 'mysql':
+        rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings().all()
+        for row in rows:
+            extra = row.get('Extra') or ''
+            if 'Using filesort' in extra:
+                problems.append(f"{row['table']}: filesort")
+            if row['type'] == 'ALL' and (filtered or ordered):
+                problems.append(f"{row['table']}: 全表扫描（possible_keys: {row.get('possible_keys') or '无'}）")
+    elif connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        for row in rows:
+            detail = row[-1]
+            if 'TEMP B-TREE FOR' in detail and 'ORDER BY' in detail:
+                problems.append(detail)
+            if detail.startswith('SCAN ') and ' USING ' not in detail and filtered:
+                problems.append(detail)
+    return problems
@@ -0,0 +1,300 @@
+"""
+Compiled row serializers: encode column-only query rows straight to JSON
+"""
+
+import json
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from flask import current_app
+
+from app import db
+from app.models.course import Course
+from app.models.course_rating_stats import CourseRatingStats
+from app.models.instructor import Instructor
+from app.models.instructor_rating_stats import InstructorRatingStats, STATS_DICT_COLUMNS, stats_dict
+from app.models.review import Review, content_snippet
+from app.models.user import User
+
+
+class RawJSON(str):
+    """已编码好的JSON片段，json_response 会原样嵌入"""
+
+
+# 各类取值的编码表达式模板（{v} 为行内取值表达式），与 to_dict + jsonify 的输出逐字节一致
+_TEMPLATES = {
+    'int': "('null' if {v} is None else str({v}))",
+    'str': "('null' if {v} is None else _str({v}))",
+    'datetime': "('null' if {v} is None else '\"' + {v}.isoformat() + '\"')",
+    # 聚合关系缺失时 to_dict 输出 0 / 0.0
+    'int0': "('0' if {v} is None else str({v}))",
+    'float0': "('0.0' if not {v} else repr(float({v})))",
+    'json': "_dumps({v})",
+}
+
+
+class Field:
+    """输出字段：kind 为 _TEMPLATES 中的类型；kind='call' 时由 func(*列值) 计算后按JSON编码"""
+
+    def __init__(self, name, columns, kind, func=None):
+        self.name = name
+        self.columns = columns if isinstance(columns, (list, tuple)) else [columns]
+        self.kind = kind
+        self.func = func
+
+
+class Nested:
+    """嵌套对象字段（如课程中的讲师信息），其列与外层在同一行中"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+
+class Shape:
+    """一种输出形状：选取哪些列、需要哪些连接，以及把一行编码为JSON对象的函数
+
+    编码函数在首次使用时按形状生成源码并编译：字段名和分隔符预先拼好，
+    每个字段的取值直接按下标读取并按类型编码，不构造ORM对象，也不经过
+    中间字典。
+    """
+
+    def __init__(self, entity, fields, joins=()):
+        self.entity = entity
+        self.fields = fields
+        # 可选连接：(表, 连接条件, 是否外连接)，只在选取的列用到该表时加入
+        self.joins = joins
+        self.columns = []
+        self._collect(fields, '')
+        self._encoders = {}
+
+    def _collect(self, fields, prefix):
+        for field in fields:
+            if isinstance(field, Nested):
+                self._collect(field.fields, f'{prefix}{field.name}__')
+                continue
+            field.indexes = []
+            for position, column in enumerate(field.columns):
+                label = f'{prefix}{field.name}' if position == 0 else f'{prefix}{field.name}__{position}'
+                field.indexes.append(len(self.columns))
+                self.columns.append(column.label(label))
+
+    # ---------------------------- 查询 ----------------------------
+    def query(self, *extra, tables=()):
+        """构造列查询；extra 为额外选取的列（如游标分页的排序列），tables 为筛选条件需要连接的表"""
+        labels = {column.key for column in self.columns}
+        columns = list(self.columns)
+        for column in extra:
+            if column.key not in labels:
+                labels.add(column.key)
+                columns.append(column.label(column.key))
+        used = {table for column in columns for table in _tables(column)} | {
+            getattr(table, '__table__', table) for table in tables
+        }
+        query = db.session.query(*columns).select_from(self.entity)
+        for table, onclause, isouter in self.joins:
+            if table in used:
+                query = query.join(table, onclause, isouter=isouter)
+        return query
+
+    # ---------------------------- 编码 ----------------------------
+    def _compile(self, ensure_ascii, sort_keys):
+        namespace = {
+            '_str': encode_basestring_ascii if ensure_ascii else encode_basestring,
+            '_dumps': lambda value: current_app.json.dumps(value, separators=(',', ':')),
+        }
+
+        def build(fields):
+            if sort_keys:
+                fields = sorted(fields, key=lambda field: field.name)
+            parts = []
+            for field in fields:
+                key = json.dumps(field.name, ensure_ascii=ensure_ascii)
+                if isinstance(field, Nested):
+                    parts.append((key, build(field.fields)))
+                elif field.kind == 'call':
+                    name = f'_f{len(namespace)}'
+                    namespace[name] = field.func
+                    arguments = ', '.join(f'row[{index}]' for index in field.indexes)
+                    parts.append((key, f'_dumps({name}({arguments}))'))
+                else:
+                    parts.append((key, _TEMPLATES[field.kind].format(v=f'row[{field.indexes[0]}]')))
+            pieces = []
+            for position, (key, expression) in enumerate(parts):
+                pieces.append(repr(('{' if position == 0 else ',') + key + ':'))
+                pieces.append(expression)
+            pieces.append(repr('}' if parts else '{}'))
+            return '(' + ' + '.join(pieces) + ')'
+
+        source = f'def encode(row):\n    return {build(self.fields)}\n'
+        exec(compile(source, f'<shape {self.entity.__name__}>', 'exec'), namespace)
+        return namespace['encode']
+
+    def encoder(self):
+        provider = current_app.json
+        key = (provider.ensure_ascii, provider.sort_keys)
+        encode = self._encoders.get(key)
+        if encode is None:
+            encode = self._encoders[key] = self._compile(*key)
+        return encode
+
+    def encode_rows(self, rows):
+        """将查询结果行编码为JSON数组"""
+        encode = self.encoder()
+        return RawJSON('[' + ','.join([encode(row) for row in rows]) + ']')
+
+
+def _tables(column):
+    return {getattr(c, 'table', None) for c in column.base_columns}
+
+
+# ---------------------------- 响应 ----------------------------
+def _encode(value, dumps):
+    if isinstance(value, RawJSON):
+        return value
+    if isinstance(value, dict):
+        items = sorted(value.items()) if current_app.json.sort_keys else value.items()
+        return '{' + ','.join(f'{dumps(str(key))}:{_encode(item, dumps)}' for key, item in items) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_encode(item, dumps) for item in value) + ']'
+    return dumps(value)
+
+
+def json_response(payload, status=200):
+    """与 jsonify(payload) 输出相同的响应，payload 中的 RawJSON 片段原样嵌入"""
+    provider = current_app.json
+    dumps = lambda value: provider.dumps(value, separators=(',', ':'))
+    body = _encode(payload, dumps)
+    if provider.compact is False or (provider.compact is None and current_app.debug):
+        # 调试模式下 jsonify 输出缩进格式，重新解析后按同样方式输出
+        return provider.response(json.loads(body)), status
+    return current_app.response_class(f'{body}\n', status=status, mimetype=provider.mimetype)
+
+
+# ---------------------------- 各实体的形状 ----------------------------
+_shapes = {}
+
+
+def _cached(key, build):
+    shape = _shapes.get(key)
+    if shape is None:
+        shape = _shapes[key] = build()
+    return shape
+
+
+def _select(fields, wanted):
+    return [field for field in fields if wanted is None or field.name in wanted]
+
+
+def course_shape(fields=None, include_instructor=True):
+    """与 Course.to_dict(include_instructor, fields) 一致的形状"""
+    def build():
+        selected = _select([
+            Field('id', Course.id, 'int'),
+            Field('title', Course.title, 'str'),
+            Field('description', Course.description, 'str'),
+            Field('cover_images', Course.cover_images, 'json'),
+            Field('stage', Course.stage, 'str'),
+            Field('instructor_id', Course.instructor_id, 'int'),
+            Field('average_rating', CourseRatingStats.average_rating, 'float0'),
+            Field('total_reviews', CourseRatingStats.total_reviews, 'int0'),
+            Field('created_at', Course.created_at, 'datetime'),
+            Field('updated_at', Course.updated_at, 'datetime'),
+        ], fields)
+        if include_instructor:
+            selected.append(Nested('instructor', [
+                Field('id', Instructor.id, 'int'),
+                Field('name', Instructor.name, 'str'),
+                Field('avatar_url', Instructor.avatar_url, 'str'),
+                Field('bio', Instructor.bio, 'str'),
+            ]))
+        return Shape(Course, selected, joins=[
+            (CourseRatingStats.__table__, CourseRatingStats.course_id == Course.id, True),
+            (Instructor.__table__, Instructor.id == Course.instructor_id, False),
+        ])
+    return _cached(('course', tuple(fields or ()), include_instructor), build)
+
+
+def review_shape(fields=None, include_user=True, include_course=False, snippet=None):
+    """与 Review.to_dict(include_user, include_course, fields, snippet) 一致的形状"""
+    def build():
+        if snippet:
+            prefix = db.func.substr(Review.content, 1, snippet + 1)
+            content = [
+                Field('content', prefix, 'call', lambda text: content_snippet(text, snippet)[0]),
+                Field('content_truncated', prefix, 'call', lambda text: content_snippet(text, snippet)[1]),
+            ]
+        else:
+            content = [Field('content', Review.content, 'str')]
+        selected = [
+            Field('id', Review.id, 'int'),
+            Field('user_id', Review.user_id, 'int'),
+            Field('course_id', Review.course_id, 'int'),
+            Field('rating', Review.rating, 'int'),
+            Field('learning_gain', Review.learning_gain, 'int'),
+            Field('workload', Review.workload, 'int'),
+            Field('difficulty', Review.difficulty, 'int'),
+        ] + content + [
+            Field('created_at', Review.created_at, 'datetime'),
+            Field('updated_at', Review.updated_at, 'datetime'),
+        ]
+        if fields is not None:
+            # 片段模式下 content_truncated 随 content 一起输出
+            selected = [field for field in selected
+                        if field.name in fields or (field.name == 'content_truncated' and 'content' in fields)]
+        if include_user:
+            selected.append(Nested('user', [
+                Field('id', Review.user_id, 'int'),
+                Field('username', User.username, 'str'),
+            ]))
+        if include_course:
+            selected.append(Nested('course', [
+                Field('id', Review.course_id, 'int'),
+                Field('title', Course.title, 'str'),
+            ]))
+        return Shape(Review, selected, joins=[
+            (User.__table__, User.id == Review.user_id, False),
+            (Course.__table__, Course.id == Review.course_id, False),
+        ])
+    return _cached(('review', tuple(fields or ()), include_user, include_course, snippet), build)
+
+
+def instructor_shape(fields=None):
+    """与 Instructor.to_dict(fields) 一致的形状"""
+    def build():
+        stats_columns = [InstructorRatingStats.instructor_id] + [
+            getattr(InstructorRatingStats, name) for name in STATS_DICT_COLUMNS
+        ]
+
+        def stats(instructor_id, *values):
+            if instructor_id is None:
+                return None
+            return stats_dict(dict(zip(STATS_DICT_COLUMNS, values)))
+
+        selected = _select([
+            Field('id', Instructor.id, 'int'),
+            Field('name', Instructor.name, 'str'),
+            Field('avatar_url', Instructor.avatar_url, 'str'),
+            Field('bio', Instructor.bio, 'str'),
+            Field('email', Instructor.email, 'str'),
+            Field('created_at', Instructor.created_at, 'datetime'),
+            Field('updated_at', Instructor.updated_at, 'datetime'),
+            Field('stats', stats_columns, 'call', stats),
+        ], fields)
+        return Shape(Instructor, selected, joins=[
+            (InstructorRatingStats.__table__, InstructorRatingStats.instructor_id == Instructor.id, True),
+        ])
+    return _cached(('instructor', tuple(fields or ())), build)
+
+
+def user_shape(fields=None):
+    """与 User.to_dict(fields) 一致的形状"""
+    def build():
+        return Shape(User, _select([
+            Field('id', User.id, 'int'),
+            Field('username', User.username, 'str'),
+            Field('email', User.email, 'str'),
+            Field('ucd_student_id', User.ucd_student_id, 'str'),
+            Field('created_at', User.created_at, 'datetime'),
+            Field('updated_at', User.updated_at, 'datetime'),
+        ], fields))
+    return _cached(('user', tuple(fields or ())), build)
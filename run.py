@@ -5,6 +5,7 @@ BDIC-SE Knowledge Base Portal
 
 from app import create_app, db
 from app.models import Instructor, Course, User, Review
+import click
 import os
 from dotenv import load_dotenv
 
@@ -45,6 +46,295 @@ def reset_db():
         db.create_all()
         print("数据库重置完成！请使用MySQL脚本重新导入数据。")
 
+@app.cli.command('recompute-stats')
+@click.option('--dry-run', is_flag=True, help='只比对不写入')
+@click.option('--batch-size', default=500, show_default=True, help='每批更新的行数')
+def recompute_stats(dry_run, batch_size):
+    """一次分组聚合重算所有课程、讲师和用户统计及每日注册数，修复偏差"""
+    from app.services.rating_stats import (
+        recompute_course_stats, recompute_instructor_stats, recompute_user_stats, recompute_signup_daily
+    )
+    from app.services.cache import worker_cache_notice
+    
+    report = recompute_course_stats(dry_run=dry_run, batch_size=batch_size)
+    
+    print(f"检查课程: {report['courses_checked']}")
+    print(f"缺失的聚合行: {report['stats_rows_missing']}")
+    print(f"偏差的聚合行: {report['stats_rows_drifted']}")
+    print(f"偏差的课程行: {report['course_rows_drifted']}"
+          f"（评价数偏差合计 {report['review_count_drift']}，平均分最大偏差 {report['max_rating_drift']:.2f}）")
+    drifted = report['stats_rows_missing'] + report['stats_rows_drifted'] + report['course_rows_drifted']
+    if not drifted:
+        print("统计数据一致，无需修复")
+    elif dry_run:
+        print("试运行：未写入任何修改")
+    else:
+        print(f"已修复 {drifted} 行")
+    
+    report = recompute_instructor_stats(dry_run=dry_run, batch_size=batch_size)
+    drifted = report['stats_rows_missing'] + report['stats_rows_drifted']
+    print(f"检查讲师: {report['instructors_checked']}，"
+          f"缺失的聚合行: {report['stats_rows_missing']}，偏差的聚合行: {report['stats_rows_drifted']}")
+    if drifted and not dry_run:
+        print(f"已修复 {drifted} 行讲师聚合")
+    
+    report = recompute_user_stats(dry_run=dry_run, batch_size=batch_size)
+    drifted = report['stats_rows_missing'] + report['stats_rows_drifted']
+    print(f"检查用户: {report['users_checked']}，"
+          f"缺失的统计行: {report['stats_rows_missing']}，偏差的统计行: {report['stats_rows_drifted']}")
+    if drifted and not dry_run:
+        print(f"已修复 {drifted} 行用户统计")
+    
+    report = recompute_signup_daily(dry_run=dry_run)
+    drifted = report['days_missing'] + report['days_drifted']
+    print(f"检查注册日期: {report['days_checked']}，"
+          f"缺失的天数: {report['days_missing']}，偏差的天数: {report['days_drifted']}")
+    if drifted and not dry_run:
+        print(f"已修复 {drifted} 天的注册计数")
+    if not dry_run:
+        print(worker_cache_notice(app.config))
+
+@app.cli.command('import-data')
+@click.option('--instructors', type=click.Path(exists=True, dir_okay=False), help='讲师文件（JSONL/CSV）')
+@click.option('--courses', type=click.Path(exists=True, dir_okay=False), help='课程文件（JSONL/CSV）')
+@click.option('--users', type=click.Path(exists=True, dir_okay=False), help='用户文件（JSONL/CSV）')
+@click.option('--reviews', type=click.Path(exists=True, dir_okay=False), help='评价文件（JSONL/CSV）')
+@click.option('--chunk-size', default=5000, show_default=True, help='每批插入的行数')
+def import_data(instructors, courses, users, reviews, chunk_size):
+    """流式批量导入讲师、课程、用户和评价，结束后一次性重算课程统计"""
+    import time
+    from app.services.cache import worker_cache_notice
+    from app.services.importer import BulkImporter
+
+    importer = BulkImporter(chunk_size=chunk_size)
+    steps = [
+        (instructors, importer.import_instructors),
+        (courses, importer.import_courses),
+        (users, importer.import_users),
+        (reviews, importer.import_reviews),
+    ]
+    if not any(path for path, _ in steps):
+        print("请至少指定一个导入文件")
+        raise SystemExit(1)
+
+    started = time.perf_counter()
+    for path, step in steps:
+        if not path:
+            continue
+        report = step(path)
+        print(f"{report.entity}: 导入 {report.inserted} 行，跳过 {report.skipped} 行")
+        for message in report.errors:
+            print(f"  {message}")
+        if report.skipped > len(report.errors):
+            print(f"  ……其余 {report.skipped - len(report.errors)} 条错误未显示")
+
+    stats = importer.finish()
+    if stats is not None:
+        print(f"已重算 {stats['courses_checked']} 门课程的评分统计")
+    print(f"导入完成，用时 {time.perf_counter() - started:.1f} 秒")
+    print(worker_cache_notice(app.config))
+
+def _payload_size(body):
+    """响应中的数据行数：列表接口为 data 的长度，详情接口为其中嵌套的评价或课程数"""
+    data = (body or {}).get('data')
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        return max([len(data[key]) for key in ('reviews', 'courses') if isinstance(data.get(key), list)], default=0)
+    return 0
+
+@app.cli.command('query-budget')
+def query_budget():
+    """检查接口的SQL查询数不随返回的数据量增长（N+1回归检查）
+
+    分页接口比较 per_page=1 与最大每页条数；不分页的接口比较关联行最少和最多的
+    实体（或命中课程少与多的搜索词）。测量期间关闭响应缓存和条件请求，统计的是视图本身执行的查询。
+    """
+    from urllib.parse import quote
+    from app.services.cache import response_cache
+    from app.utils.profiling import count_queries
+    
+    course_id = db.session.query(db.func.min(Course.id)).scalar()
+    user_id = db.session.query(db.func.min(User.id)).scalar()
+    instructor_id = db.session.query(db.func.min(Instructor.id)).scalar()
+    
+    # 不分页的接口：取关联行最少和最多的实体分别请求
+    review_counts = db.session.query(Course.id, db.func.count(Review.id))\
+        .outerjoin(Review, Review.course_id == Course.id)\
+        .group_by(Course.id).order_by(db.func.count(Review.id), Course.id).all()
+    course_counts = db.session.query(Instructor.id, db.func.count(Course.id))\
+        .outerjoin(Course, Course.instructor_id == Instructor.id)\
+        .group_by(Instructor.id).order_by(db.func.count(Course.id), Instructor.id).all()
+    instructor_ids = [row[0] for row in course_counts][:50]
+    # 完整课程标题只命中少数课程，单个字母按前缀命中大多数课程
+    course_title = db.session.query(Course.title).filter_by(id=course_id).scalar() or 'a'
+    
+    def paged(url, max_per_page):
+        separator = '&' if '?' in url else '?'
+        return url, [f'{url}{separator}per_page=1', f'{url}{separator}per_page={max_per_page}']
+    
+    # (接口, [小数据量请求, 大数据量请求])
+    endpoints = [
+        paged('/api/v1/courses', 100),
+        paged('/api/v1/courses?cursor=', 100),
+        ('/api/v1/courses/search', [f'/api/v1/courses/search?q={quote(course_title)}',
+                                    '/api/v1/courses/search?q=a']),
+        paged('/api/v1/reviews', 50),
+        paged('/api/v1/reviews?cursor=', 50),
+        ('/api/v1/courses/<id>', [f'/api/v1/courses/{review_counts[0][0]}',
+                                  f'/api/v1/courses/{review_counts[-1][0]}']),
+        paged(f'/api/v1/courses/{course_id}/reviews', 50),
+        paged(f'/api/v1/users/{user_id}/reviews', 50),
+        paged('/api/v1/users', 100),
+        ('/api/v1/instructors', [f'/api/v1/instructors?ids={instructor_ids[0]}',
+                                 f'/api/v1/instructors?ids={",".join(map(str, instructor_ids))}']),
+        ('/api/v1/instructors/<id>', [f'/api/v1/instructors/{course_counts[0][0]}',
+                                      f'/api/v1/instructors/{course_counts[-1][0]}']),
+        paged(f'/api/v1/instructors/{instructor_id}/courses', 50),
+    ]
+    
+    client = app.test_client()
+    failures = unverified = 0
+    cache_enabled = response_cache.enabled
+    conditional_enabled = app.config.get('CONDITIONAL_GET_ENABLED', True)
+    response_cache.enabled = False
+    app.config['CONDITIONAL_GET_ENABLED'] = False
+    try:
+        for url, targets in endpoints:
+            counts, sizes = [], []
+            for target in targets:
+                # 预热一次（搜索索引、总数缓存等），之后每次请求都使用新的会话
+                client.get(target)
+                db.session.remove()
+                with count_queries(db.engine) as counter:
+                    response = client.get(target)
+                counts.append(counter.count)
+                sizes.append(_payload_size(response.get_json(silent=True)))
+            stable = len(set(counts)) == 1
+            failures += 0 if stable else 1
+            print(f"{'OK  ' if stable else 'FAIL'} {response.status_code} {url}: "
+                  f"{' -> '.join(map(str, counts))} 条查询（{' -> '.join(map(str, sizes))} 行）")
+            if len(set(sizes)) == 1:
+                # 两次请求返回的行数相同，结果不能说明查询数与数据量无关
+                unverified += 1
+                print("     两次请求返回的数据量相同，未能验证")
+    finally:
+        response_cache.enabled = cache_enabled
+        app.config['CONDITIONAL_GET_ENABLED'] = conditional_enabled
+    
+    if failures:
+        print(f"{failures} 个接口的查询数随分页大小增长（可能存在N+1查询）")
+        raise SystemExit(1)
+    if unverified:
+        print(f"{unverified} 个接口的测试数据量不足，请在关联行数不同的数据上运行")
+    print("所有接口查询数固定")
+
+@app.cli.command('query-plans')
+def query_plans():
+    """对热点接口执行的SQL做EXPLAIN，出现filesort或无索引全表扫描时失败
+
+    应在接近生产规模的数据上运行（数据量过小时优化器可能放弃使用索引）。
+    """
+    from app.utils.profiling import capture_selects, explain_problems
+    
+    course_id = db.session.query(db.func.min(Course.id)).scalar()
+    user_id = db.session.query(db.func.min(User.id)).scalar()
+    instructor_id = db.session.query(db.func.min(Instructor.id)).scalar()
+    
+    endpoints = [
+        f'/api/v1/courses/{course_id}/reviews',
+        f'/api/v1/courses/{course_id}/reviews?cursor=',
+        f'/api/v1/reviews?course_id={course_id}',
+        f'/api/v1/reviews?course_id={course_id}&sort=highest',
+        '/api/v1/reviews?cursor=',
+        f'/api/v1/users/{user_id}/reviews',
+        f'/api/v1/users/{user_id}/reviews?cursor=',
+        '/api/v1/courses/by-stage/S1',
+        '/api/v1/courses?cursor=&sort_by=title',
+        f'/api/v1/instructors/{instructor_id}/courses?cursor=',
+        '/api/v1/instructors/leaderboard?sort_by=average_rating',
+        '/api/v1/instructors/leaderboard?sort_by=total_reviews&order=asc',
+        '/api/v1/users/stats',
+    ]
+    
+    client = app.test_client()
+    failures = 0
+    for url in endpoints:
+        db.session.remove()
+        with capture_selects(db.engine) as captured:
+            response = client.get(url)
+        problems = []
+        with db.engine.connect() as connection:
+            for statement, parameters in captured:
+                for problem in explain_problems(connection, statement, parameters):
+                    problems.append((problem, statement))
+        failures += 1 if problems else 0
+        print(f"{'FAIL' if problems else 'OK  '} {response.status_code} {url}: {len(captured)} 条查询")
+        for problem, statement in problems:
+            print(f"    {problem}")
+            print(f"    {' '.join(statement.split())[:200]}")
+    
+    if failures:
+        print(f"{failures} 个接口的查询未能使用索引")
+        raise SystemExit(1)
+    print("所有接口的查询均使用索引")
+
+@app.cli.command('bench-serializers')
+@click.option('--rows', default=100, show_default=True, help='每种实体序列化的行数')
+@click.option('--repeat', default=50, show_default=True, help='重复次数')
+def bench_serializers(rows, repeat):
+    """对比 ORM + to_dict + jsonify 与列查询 + 编译序列化器的耗时，并校验输出逐字节一致"""
+    import time
+    from app.utils.serializers import course_shape, instructor_shape, review_shape, user_shape
+    
+    cases = [
+        ('课程', lambda: Course.query.options(*Course.eager_options(include_instructor=True))
+            .order_by(Course.id).limit(rows).all(),
+         lambda item: item.to_dict(include_instructor=True),
+         lambda: course_shape(include_instructor=True), Course.id),
+        ('评价', lambda: Review.query.options(*Review.eager_options(include_user=True, include_course=True))
+            .order_by(Review.id).limit(rows).all(),
+         lambda item: item.to_dict(include_user=True, include_course=True),
+         lambda: review_shape(include_user=True, include_course=True), Review.id),
+        ('讲师', lambda: Instructor.query.order_by(Instructor.id).limit(rows).all(),
+         lambda item: item.to_dict(),
+         lambda: instructor_shape(), Instructor.id),
+        ('用户', lambda: User.query.order_by(User.id).limit(rows).all(),
+         lambda item: item.to_dict(),
+         lambda: user_shape(), User.id),
+    ]
+    
+    failures = 0
+    with app.test_request_context():
+        dumps = lambda value: app.json.dumps(value, separators=(',', ':'))
+        for label, load, to_dict, make_shape, key in cases:
+            shape = make_shape()
+            
+            def run_orm():
+                db.session.expunge_all()
+                return dumps([to_dict(item) for item in load()])
+            
+            def run_compiled():
+                return shape.encode_rows(shape.query().order_by(key).limit(rows).all())
+            
+            expected, actual = run_orm(), run_compiled()
+            same = expected == actual
+            failures += 0 if same else 1
+            
+            timings = []
+            for run in (run_orm, run_compiled):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    run()
+                timings.append((time.perf_counter() - started) / repeat * 1000)
+            print(f"{'OK  ' if same else 'DIFF'} {label} {len(load())} 行: ORM {timings[0]:.2f} ms，"
+                  f"编译序列化器 {timings[1]:.2f} ms（{timings[0] / timings[1]:.1f}x）")
+    
+    if failures:
+        print(f"{failures} 种实体的输出不一致")
+        raise SystemExit(1)
+    print("所有实体输出逐字节一致")
+
 if __name__ == '__main__':
     # 开发环境配置
     debug_mode = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'